@@ -0,0 +1,289 @@
+"""Benchmarks of the detector construction and of the geometry queries.
+
+Every detector class built by :func:`pygeomhpges.make_hpge` is benchmarked:
+the construction of the object, the computation of its volume and mass, and
+the distance and containment queries on uniformly distributed points, for
+point counts from :math:`10^2` to :math:`10^7`. The distance to the surface is
+computed with the reference kernel (closest of all the profile segments), the
+default one (candidate segments of a grid) and the ``optimised`` one.
+
+For each benchmark the best wall time of a few calls and the peak memory
+allocated by one call (as measured by :mod:`tracemalloc`, which also
+tracks the arrays allocated by the numba kernels) are written to a JSON file,
+together with the versions of the packages and the machine, to track the
+performance across releases. The kernels are compiled before the timing.
+
+Run from the root of the repository:
+
+.. code-block:: console
+
+    $ python benchmarks/run_benchmarks.py --output benchmarks.json
+    $ python benchmarks/run_benchmarks.py --detectors V07646A --max-points 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import UTC, datetime
+from importlib.metadata import version
+from pathlib import Path
+
+import numba
+import numpy as np
+from dbetto import AttrsDict, TextDB
+from pyg4ometry import geant4
+
+import pygeomhpges
+from pygeomhpges import HPGe, make_hpge, utils
+
+log = logging.getLogger(__name__)
+
+# a detector of each generic type, and the special detectors of the tests
+_CONFIG_DIRS = (
+    Path(__file__).parent / "configs",
+    Path(__file__).parents[1] / "tests" / "configs",
+)
+
+BENCHMARKS = (
+    "make_hpge",
+    "volume",
+    "mass",
+    "distance_to_surface",
+    "is_inside",
+    "is_inside_borehole",
+)
+
+
+def load_configs() -> dict[str, AttrsDict]:
+    """Metadata of the benchmarked detectors, by name."""
+    configs = {}
+    for path in _CONFIG_DIRS:
+        db = TextDB(path)
+        configs |= {name: db[name] for name in sorted(db.keys())}
+    return configs
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict:
+    """Best wall time of `repeat` calls of `func` and peak memory of one call."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    # tracing slows down the allocations, the memory is measured separately
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"time_s": min(times), "times_s": times, "peak_memory_bytes": peak}
+
+
+def random_points(hpge: HPGe, n: int, rng: np.random.Generator) -> np.ndarray:
+    """Points uniformly distributed in a box 5 mm larger than the detector."""
+    r, z = hpge.get_profile()
+    r_max = max(r) + 5
+    return rng.uniform([-r_max, -r_max, min(z) - 5], [r_max, r_max, max(z) + 5], (n, 3))
+
+
+def queries(hpge: HPGe, coords: np.ndarray) -> dict[tuple[str, str], Callable]:
+    """The geometry queries on `coords`, by benchmark and kernel."""
+    all_segments = np.arange(len(hpge.get_profile_segments().s1))
+
+    return {
+        ("distance_to_surface", "reference"): lambda: hpge.distance_to_surface(
+            coords, surface_indices=all_segments
+        ),
+        ("distance_to_surface", "default"): lambda: hpge.distance_to_surface(coords),
+        ("distance_to_surface", "optimised"): lambda: hpge.distance_to_surface(
+            coords, optimised=True
+        ),
+        ("is_inside", "default"): lambda: hpge.is_inside(coords),
+        ("is_inside_borehole", "default"): lambda: hpge.is_inside_borehole(coords),
+    }
+
+
+def run(
+    detectors: list[str] | None = None,
+    benchmarks: list[str] | None = None,
+    sizes: list[int] | None = None,
+    repeat: int = 3,
+    seed: int = 0,
+) -> dict:
+    """Run the benchmarks.
+
+    Parameters
+    ----------
+    detectors
+        names of the detectors to benchmark, all by default.
+    benchmarks
+        benchmarks to run, see :data:`BENCHMARKS`, all by default.
+    sizes
+        numbers of points of the geometry queries.
+    repeat
+        number of timed calls of each benchmark.
+    seed
+        seed of the random points.
+
+    Returns
+    -------
+        the results, one entry for each detector, benchmark, kernel and
+        number of points. Queries which are not supported by a detector
+        (e.g. ``is_inside_borehole`` for detectors without a borehole) are
+        skipped.
+    """
+    configs = load_configs()
+    detectors = list(configs) if detectors is None else detectors
+    benchmarks = list(BENCHMARKS) if benchmarks is None else benchmarks
+    sizes = [10**k for k in range(2, 8)] if sizes is None else sizes
+
+    rng = np.random.default_rng(seed)
+    results = []
+
+    for name in detectors:
+        hpge = make_hpge(configs[name], registry=geant4.Registry())
+
+        def record(benchmark, kernel, n_points, func, _name=name, _hpge=hpge):
+            try:
+                # compile the kernels and fill the caches of the detector
+                func()
+            except NotImplementedError:
+                msg = f"{_name}: {benchmark} ({kernel}) is not supported, skipped"
+                log.info(msg)
+                return
+
+            result = measure(func, repeat)
+            results.append(
+                {
+                    "detector": _name,
+                    "class": type(_hpge).__name__,
+                    "benchmark": benchmark,
+                    "kernel": kernel,
+                    "n_points": n_points,
+                    **result,
+                }
+            )
+            msg = (
+                f"{_name}: {benchmark} ({kernel}, {n_points} points) "
+                f"{result['time_s']:.3g} s, {result['peak_memory_bytes'] / 1e6:.3g} MB"
+            )
+            log.info(msg)
+
+        if "make_hpge" in benchmarks:
+            record(
+                "make_hpge",
+                "default",
+                None,
+                lambda _name=name: make_hpge(
+                    configs[_name], registry=geant4.Registry()
+                ),
+            )
+
+        for prop in ("volume", "mass"):
+            if prop in benchmarks:
+                # the properties are computed again on each access
+                record(
+                    prop,
+                    "default",
+                    None,
+                    lambda _prop=prop, _hpge=hpge: getattr(_hpge, _prop),
+                )
+
+        for n in sizes:
+            coords = random_points(hpge, n, rng)
+
+            for (benchmark, kernel), func in queries(hpge, coords).items():
+                if benchmark in benchmarks:
+                    record(benchmark, kernel, n, func)
+
+    return {
+        "metadata": {
+            "date": datetime.now(UTC).isoformat(timespec="seconds"),
+            "pygeomhpges": pygeomhpges.__version__,
+            "numpy": np.__version__,
+            "numba": numba.__version__,
+            "pyg4ometry": version("pyg4ometry"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "system": platform.platform(),
+            "num_threads": utils.get_num_threads(),
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def main(args: list[str] | None = None) -> None:
+    """Command line interface of :func:`run`."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the construction and the geometry queries of pygeomhpges."
+    )
+    parser.add_argument(
+        "-o", "--output", default="benchmarks.json", help="output JSON file"
+    )
+    parser.add_argument(
+        "--detectors", nargs="+", help="detectors to benchmark (all by default)"
+    )
+    parser.add_argument(
+        "--benchmarks",
+        nargs="+",
+        choices=BENCHMARKS,
+        help="benchmarks to run (all by default)",
+    )
+    parser.add_argument(
+        "--min-points",
+        type=float,
+        default=1e2,
+        help="smallest number of points, a power of ten",
+    )
+    parser.add_argument(
+        "--max-points",
+        type=float,
+        default=1e7,
+        help="largest number of points, a power of ten",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="number of timed calls of each benchmark"
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help="number of threads of the kernels, see pygeomhpges.set_num_threads",
+    )
+    parsed = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # silence the warnings of the optimised kernel on each call
+    logging.getLogger("pygeomhpges").setLevel(logging.ERROR)
+
+    utils.set_num_threads(parsed.threads)
+
+    sizes = [
+        10**k
+        for k in range(
+            round(np.log10(parsed.min_points)), round(np.log10(parsed.max_points)) + 1
+        )
+    ]
+    results = run(parsed.detectors, parsed.benchmarks, sizes, parsed.repeat)
+
+    with Path(parsed.output).open("w") as f:
+        json.dump(results, f, indent=2)
+
+    msg = f"{len(results['results'])} results written to {parsed.output}"
+    log.info(msg)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,103 @@
 from __future__ import annotations
 
+import importlib
+import sys
+import types
+from typing import TYPE_CHECKING, Any
+
 from ._version import version as __version__
-from .base import HPGe
-from .bege import BEGe
-from .invcoax import InvertedCoax
-from .make_hpge import make_hpge
-from .p00664b import P00664B
-from .ppc import PPC
-from .semicoax import SemiCoax
-from .v02160a import V02160A
-from .v02162b import V02162B
-from .v06649 import V06649
-from .v07646a import V07646A
+
+if TYPE_CHECKING:
+    from . import utils
+    from .base import SURFACE_TYPES, HPGe
+    from .bege import BEGe
+    from .distance_table import DistanceTable
+    from .instrumentation import instrument
+    from .invcoax import InvertedCoax
+    from .make_hpge import make_hpge
+    from .p00664b import P00664B
+    from .ppc import PPC
+    from .precompilation import precompile
+    from .segment_table import SegmentTable
+    from .semicoax import SemiCoax
+    from .utils import get_num_threads, set_num_threads
+    from .v02160a import V02160A
+    from .v02162b import V02162B
+    from .v06649 import V06649
+    from .v07646a import V07646A
 
 __all__ = [
     "P00664B",
     "PPC",
+    "SURFACE_TYPES",
     "V02160A",
     "V02162B",
     "V06649",
     "V07646A",
     "BEGe",
+    "DistanceTable",
     "HPGe",
     "InvertedCoax",
+    "SegmentTable",
     "SemiCoax",
     "__version__",
+    "get_num_threads",
+    "instrument",
     "make_hpge",
+    "precompile",
+    "set_num_threads",
     "utils",
 ]
+
+# the submodule defining each public name. They are imported on first access,
+# as the detector classes pull in pyg4ometry, numba and awkward, which take
+# seconds to import
+_SUBMODULES = {
+    "P00664B": "p00664b",
+    "PPC": "ppc",
+    "SURFACE_TYPES": "base",
+    "V02160A": "v02160a",
+    "V02162B": "v02162b",
+    "V06649": "v06649",
+    "V07646A": "v07646a",
+    "BEGe": "bege",
+    "DistanceTable": "distance_table",
+    "HPGe": "base",
+    "InvertedCoax": "invcoax",
+    "SegmentTable": "segment_table",
+    "SemiCoax": "semicoax",
+    "get_num_threads": "utils",
+    "instrument": "instrumentation",
+    "make_hpge": "make_hpge",
+    "precompile": "precompilation",
+    "set_num_threads": "utils",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name == "utils":
+        return importlib.import_module(".utils", __name__)
+
+    if name not in _SUBMODULES:
+        msg = f"module {__name__!r} has no attribute {name!r}"
+        raise AttributeError(msg)
+
+    value = getattr(importlib.import_module(f".{_SUBMODULES[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name: str, value: Any) -> None:
+        # the import system binds each imported submodule to the package, do
+        # not let the make_hpge submodule shadow the function of the same name
+        if name == "make_hpge" and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
@@ -1,17 +1,23 @@
 from __future__ import annotations
 
+import itertools
 import logging
 import math
 from abc import ABC, abstractmethod
-from itertools import pairwise
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import Literal, overload
 
+import awkward as ak
+import numba
 import numpy as np
 from dbetto import AttrsDict
-from numpy.typing import ArrayLike, NDArray
+from numpy.typing import ArrayLike, DTypeLike, NDArray
 from pint import Quantity, get_application_registry
 from pyg4ometry import geant4
 
-from . import utils
+from . import instrumentation, offset, sampling, utils
+from .distance_table import DistanceTable
 from .materials import make_natural_germanium
 
 u = get_application_registry()
@@ -19,6 +25,131 @@ u = get_application_registry()
 
 log = logging.getLogger(__name__)
 
+SURFACE_TYPES = ("nplus", "pplus", "passive")
+"""Names of the types of surfaces, see :attr:`HPGe.surface_type_codes`."""
+
+# default tolerance of the distance calculations for each floating point type
+_DEFAULT_TOL = {np.dtype(np.float64): 1e-11, np.dtype(np.float32): 1e-4}
+
+
+def _resolve_tol(tol: float | None, dtype: DTypeLike) -> tuple[float, np.dtype]:
+    """Check the floating point type and get the default tolerance for it."""
+    dtype = np.dtype(dtype)
+    if dtype not in _DEFAULT_TOL:
+        msg = f"dtype must be float32 or float64, not {dtype}"
+        raise ValueError(msg)
+
+    return (_DEFAULT_TOL[dtype] if tol is None else tol), dtype
+
+
+def _response_model(
+    model: str | Callable[[float, float, float], float],
+) -> tuple[int, Callable | None]:
+    """Index of a built-in response model, or -1 and the user response function."""
+    if isinstance(model, str):
+        if model not in utils.RESPONSE_MODELS:
+            msg = f"model must be one of {utils.RESPONSE_MODELS} or a numba function, not {model!r}"
+            raise ValueError(msg)
+        return utils.RESPONSE_MODELS.index(model), None
+
+    if not isinstance(model, numba.core.dispatcher.Dispatcher):
+        msg = f"model must be a function compiled with numba.njit, not {type(model)}"
+        raise TypeError(msg)
+
+    return -1, model
+
+
+def _response_params(fccd: Mapping[str, float | tuple[float, float]]) -> NDArray:
+    """FCCD and transition layer thickness of each of the :data:`SURFACE_TYPES`."""
+    params = np.zeros((len(SURFACE_TYPES), 2))
+    for name, value in fccd.items():
+        if name not in SURFACE_TYPES:
+            msg = f"unknown surface type {name}, must be in {SURFACE_TYPES}"
+            raise ValueError(msg)
+
+        params[SURFACE_TYPES.index(name)] = (value, 0) if np.ndim(value) == 0 else value
+
+    if np.any(params < 0) or np.any(params[:, 1] > params[:, 0]):
+        msg = f"the FCCD and transition layers must satisfy 0 <= transition <= fccd, not {fccd}"
+        raise ValueError(msg)
+
+    return params
+
+
+def _active_energy(
+    rows: NDArray,
+    x: NDArray,
+    y: NDArray,
+    z: NDArray,
+    edep: NDArray,
+    event_offsets: NDArray,
+    seg_offsets: NDArray,
+    segments: tuple[NDArray, ...],
+    cuts: tuple[NDArray, NDArray, NDArray],
+    params: NDArray,
+    model: int,
+    response: Callable | None,
+    tol: float,
+) -> NDArray:
+    """Sum of the energy times the activeness of the hits of each event and detector.
+
+    The segments (`s1`, `s2`, directions, lengths and surface codes) and the
+    cuts (whether there is one, normals and offsets) of the detectors are
+    packed as in :class:`.SegmentTable`, hit ``i`` belongs to the detector in
+    row ``rows[i]`` whose response parameters are ``params[rows[i]]``, see
+    :func:`_response_params` and :func:`_response_model`.
+
+    Returns
+    -------
+        ``(n_events, n_rows)`` array.
+    """
+    s1, s2 = segments[:2]
+    bounds = np.array(
+        [
+            utils._profile_bounds(s1[lo:hi], s2[lo:hi], tol)
+            for lo, hi in itertools.pairwise(seg_offsets)
+        ]
+    )
+    energy = np.zeros((len(event_offsets) - 1, len(seg_offsets) - 1))
+
+    with instrumentation.section("active_energy_kernel", len(x)):
+        if response is None:
+            utils._dispatch(utils._active_energy)(
+                rows,
+                x,
+                y,
+                z,
+                edep,
+                event_offsets,
+                seg_offsets,
+                *segments,
+                params,
+                bounds,
+                *cuts,
+                model,
+                tol,
+                energy,
+            )
+        else:
+            utils._dispatch(utils._active_energy_user)(
+                rows,
+                x,
+                y,
+                z,
+                edep,
+                event_offsets,
+                seg_offsets,
+                *segments,
+                params,
+                bounds,
+                *cuts,
+                response,
+                tol,
+                energy,
+            )
+
+    return energy
+
 
 class HPGe(ABC, geant4.LogicalVolume):
     """An High-Purity Germanium detector.
@@ -73,6 +204,23 @@ class HPGe(ABC, geant4.LogicalVolume):
 
         self.surfaces: list[str] = []
 
+        # outline of the borehole in (r, z), filled by the detectors with one
+        self.borehole_r: Sequence[float] = []
+        self.borehole_z: Sequence[float] = []
+
+        # lazily built acceleration structures for the distance queries
+        self._profile_segments: tuple[tuple, utils.ProfileSegments] | None = None
+        self._segment_grid: (
+            tuple[utils.ProfileSegments, utils.SegmentGrid | None] | None
+        ) = None
+        self._distance_table: DistanceTable | None = None
+        self._volume_slices: (
+            tuple[utils.ProfileSegments, sampling.VolumeSlices] | None
+        ) = None
+        self._active_region: (
+            tuple[utils.ProfileSegments, tuple, offset.ActiveRegion] | None
+        ) = None
+
         # build logical volume, default [mm]
         super().__init__(self._g4_solid(), material, self.name, self.registry)
 
@@ -125,6 +273,21 @@ class HPGe(ABC, geant4.LogicalVolume):
         msg = "_decode_polycone_coord must be implemented by a subclass"
         raise NotImplementedError(msg)
 
+    def _cut_plane(self) -> tuple[NDArray, float] | None:
+        """Half-space removed from the polycone, for detectors with a cut.
+
+        Returns
+        -------
+            ``None`` if the detector has no cut, else the unit normal vector
+            `n` and offset `d` of the plane, such that the points with
+            :math:`n \\cdot x > d` are removed.
+
+        Note
+        ----
+        Must be overloaded by derived classes with a cut.
+        """
+        return None
+
     def get_profile(self) -> tuple[list[float], list[float]]:
         """Get the profile of the HPGe detector.
 
@@ -150,58 +313,291 @@ class HPGe(ABC, geant4.LogicalVolume):
 
         return r, z
 
+    def get_profile_segments(self) -> utils.ProfileSegments:
+        """Get the line segments of the profile, with their properties.
+
+        The arrays are built on the first call and cached, they are rebuilt
+        only if the profile (see :meth:`get_profile`) or the :attr:`surfaces`
+        change. They are read-only, as they are shared between calls.
+        """
+        r, z = self.get_profile()
+        key = (tuple(r), tuple(z), tuple(self.surfaces))
+
+        if self._profile_segments is None or self._profile_segments[0] != key:
+            r_arr = np.array(r, dtype=np.float64)
+            z_arr = np.array(z, dtype=np.float64)
+            s1 = np.ascontiguousarray(np.column_stack((r_arr[:-1], z_arr[:-1])))
+            s2 = np.ascontiguousarray(np.column_stack((r_arr[1:], z_arr[1:])))
+            directions, lengths = utils._segment_properties(s1, s2)
+
+            profile = utils.ProfileSegments(
+                r_arr, z_arr, s1, s2, directions, lengths, self._surface_type_codes()
+            )
+            for array in profile:
+                array.setflags(write=False)
+
+            self._profile_segments = (key, profile)
+
+        return self._profile_segments[1]
+
+    @instrumentation.instrumented("is_inside")
     def is_inside(self, coords: ArrayLike, tol: float = 1e-11) -> NDArray[np.bool_]:
         """Compute whether each point is inside the volume.
 
+        Points inside the solid, or outside it at a distance of at most `tol`
+        from its surface, are inside. No distance is computed for most
+        points: points outside the bounding cylinder are rejected first, the
+        others are classified with a crossing number test on the profile (see
+        :func:`.utils.is_inside_profile`).
+
+        Parameters
+        ----------
+        coords
+            2D array of shape `(n,3)` of `(x,y,z)` coordinates for each of `n`
+            points, second index corresponds to `(x,y,z)`. Can also be a
+            (jagged) awkward array with fields `xloc`, `yloc` and `zloc`, then
+            the result has the same structure.
+        tol
+            distance outside the surface which is considered inside. Should be
+            on the order of numerical precision of the floating point representation.
+
+        Note
+        ----
+        With the default `tol` the result is the same as the sign of
+        :meth:`distance_to_surface`. For larger values it can differ:
+        :meth:`distance_to_surface` pushes inside the points within `tol` of
+        the line through their closest segment, so that points several mm
+        outside, beyond the end of this segment, can get a positive distance.
+        Such points were inside when this method used the sign of the
+        distance, they are now outside.
+        """
+        if isinstance(coords, ak.Array):
+            x, y, z = utils.flatten_columns(coords)
+            inside = self.is_inside_xyz(x, y, z, tol=tol)
+            return utils.unflatten_like(inside, coords)
+
+        if not isinstance(coords, np.ndarray):
+            coords = np.array(coords)
+
+        if np.shape(coords)[1] != 3:
+            msg = "coords must be provided as a 2D array with x,y,z coordinates for each point."
+            raise ValueError(msg)
+
+        return self.is_inside_xyz(coords[:, 0], coords[:, 1], coords[:, 2], tol=tol)
+
+    def is_inside_xyz(
+        self, x: ArrayLike, y: ArrayLike, z: ArrayLike, tol: float = 1e-11
+    ) -> NDArray[np.bool_]:
+        """Compute whether each point is inside the volume, from separate coordinate arrays.
+
+        Same as :meth:`is_inside` for data stored column-wise.
+
+        Parameters
+        ----------
+        x, y, z
+            1D arrays with the coordinates of each point.
+        tol
+            see :meth:`is_inside`.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        z = np.asarray(z, dtype=np.float64)
+
+        if x.shape != y.shape:
+            msg = "x and y must have the same shape."
+            raise ValueError(msg)
+
+        cut = self._cut_plane()
+        if cut is None and not isinstance(self.solid, geant4.solid.GenericPolycone):
+            msg = f"is_inside is not implemented for {type(self.solid)}"
+            raise NotImplementedError(msg)
+
+        profile = self.get_profile_segments()
+        r = utils.radius(x, y)
+
+        with instrumentation.section("inside_kernel", len(r)):
+            inside = utils._dispatch(utils._is_inside_profile)(
+                profile.s1, profile.s2, r, z, tol
+            )
+
+        if cut is not None:
+            normal, offset = cut
+            inside &= normal[0] * x + normal[1] * y + normal[2] * z <= offset + tol
+
+        return inside
+
+    def is_inside_borehole(
+        self, coords: ArrayLike, tol: float = 1e-11
+    ) -> NDArray[np.bool_]:
+        """Check if a point is inside the borehole.
+
+        The borehole is the region enclosed by :attr:`borehole_r` and
+        :attr:`borehole_z` and the symmetry axis, points are classified with
+        :func:`.utils.is_inside_profile`.
+
         Parameters
         ----------
         coords
             2D array of shape `(n,3)` of `(x,y,z)` coordinates for each of `n`
-            points, second index corresponds to `(x,y,z)`.
+            points, second index corresponds to `(x,y,z)`. Can also be a
+            (jagged) awkward array with fields `xloc`, `yloc` and `zloc`, then
+            the result has the same structure.
         tol
             distance outside the surface which is considered inside. Should be
             on the order of numerical precision of the floating point representation.
         """
+        if len(self.borehole_r) == 0:
+            msg = f"{type(self).__name__} does not have a borehole"
+            raise NotImplementedError(msg)
 
-        dists = self.distance_to_surface(coords, tol=tol, signed=True)
-        return np.where(dists >= 0, True, False)
+        if isinstance(coords, ak.Array):
+            x, y, z = utils.flatten_columns(coords)
+        else:
+            if not isinstance(coords, np.ndarray):
+                coords = np.array(coords)
+
+            if np.shape(coords)[1] != 3:
+                msg = "coords must be provided as a 2D array with x,y,z coordinates for each point."
+                raise ValueError(msg)
+
+            x, y, z = coords[:, 0], coords[:, 1], coords[:, 2]
+
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        z = np.asarray(z, dtype=np.float64)
+
+        s1, s2 = utils.get_line_segments(
+            np.array(self.borehole_r), np.array(self.borehole_z)
+        )
+        inside = utils._dispatch(utils._is_inside_profile)(
+            s1, s2, utils.radius(x, y), z, tol
+        )
+
+        if isinstance(coords, ak.Array):
+            return utils.unflatten_like(inside, coords)
+        return inside
 
+    @overload
+    def distance_to_surface(
+        self,
+        coords: ArrayLike,
+        surface_indices: NDArray | None = ...,
+        tol: float | None = ...,
+        signed: bool = ...,
+        optimised: bool = ...,
+        max_error: float | None = ...,
+        dtype: DTypeLike = ...,
+        return_indices: Literal[False] = ...,
+    ) -> NDArray: ...
+
+    @overload
+    def distance_to_surface(
+        self,
+        coords: ArrayLike,
+        surface_indices: NDArray | None = ...,
+        tol: float | None = ...,
+        signed: bool = ...,
+        optimised: bool = ...,
+        max_error: float | None = ...,
+        dtype: DTypeLike = ...,
+        *,
+        return_indices: Literal[True],
+    ) -> tuple[NDArray, NDArray]: ...
+
+    @overload
+    def distance_to_surface(
+        self,
+        coords: ArrayLike,
+        surface_indices: NDArray | None = ...,
+        tol: float | None = ...,
+        signed: bool = ...,
+        optimised: bool = ...,
+        max_error: float | None = ...,
+        dtype: DTypeLike = ...,
+        return_indices: bool = ...,
+    ) -> NDArray | tuple[NDArray, NDArray]: ...
+
+    @instrumentation.instrumented("distance_to_surface")
     def distance_to_surface(
         self,
         coords: ArrayLike,
         surface_indices: NDArray | None = None,
-        tol: float = 1e-11,
+        tol: float | None = None,
         signed: bool = False,
         optimised: bool = False,
-    ) -> NDArray:
+        max_error: float | None = None,
+        dtype: DTypeLike = np.float64,
+        return_indices: bool = False,
+    ) -> NDArray | tuple[NDArray, NDArray]:
         """Compute the distance of a set of points to the nearest detector surface.
 
         Parameters
         ----------
         coords
             2D array of shape `(n,3)` of `(x,y,z)` coordinates for each of `n`
-            points, second index corresponds to `(x,y,z)`.
+            points, second index corresponds to `(x,y,z)`. Can also be a
+            (jagged) awkward array with fields `xloc`, `yloc` and `zloc`, then
+            the result has the same structure.
         surface_indices
             list of indices of surfaces to consider. If ``None`` (the default)
             all surfaces used.
         tol
             distance outside the surface which is considered inside. Should be
-            on the order of numerical precision of the floating point representation.
+            on the order of numerical precision of the floating point
+            representation, by default ``1e-11`` for ``float64`` and ``1e-4``
+            for ``float32``.
         signed
             whether to return signed distanced (inside the HPGe is positive,
             outside is negative).
         optimised
             boolean flag to use a faster calculation.
+        max_error
+            if not ``None``, interpolate the distances from a precomputed
+            :class:`.DistanceTable` with at most this absolute error (in mm),
+            see :meth:`get_distance_table`. Only supported if all surfaces are
+            considered.
+        dtype
+            floating point type of the calculation and of the result, either
+            ``float64`` or ``float32``. Single precision halves the memory
+            traffic, with an accuracy of about 0.1 µm.
+        return_indices
+            if ``True``, also return the index of the closest surface for each
+            point, in the list of :attr:`surfaces` (also if `surface_indices`
+            is given). The surface type of each point can then be obtained
+            with ``hpge.surface_type_codes[indices]``. Not supported with
+            `max_error` or `optimised`.
+
+        Returns
+        -------
+            the distances, and the indices of the closest surfaces if
+            `return_indices` is ``True``.
 
         Note
         ----
         - Only implemented for solids based on :class:`geant4.solid.GenericPolycone`
         - Coordinates should be relative to the origin of the polycone.
         """
-        # check type of the solid
-        if not isinstance(self.solid, geant4.solid.GenericPolycone):
-            msg = f"distance_to_surface is not implemented for {type(self.solid)} yet"
-            raise NotImplementedError(msg)
+        if isinstance(coords, ak.Array):
+            x, y, z = utils.flatten_columns(coords)
+            dists = self.distance_to_surface_xyz(
+                x,
+                y,
+                z,
+                surface_indices=surface_indices,
+                tol=tol,
+                signed=signed,
+                optimised=optimised,
+                max_error=max_error,
+                dtype=dtype,
+                return_indices=return_indices,
+            )
+            if isinstance(dists, tuple):
+                dists, indices = dists
+                return (
+                    utils.unflatten_like(dists, coords),
+                    utils.unflatten_like(indices, coords),
+                )
+            return utils.unflatten_like(dists, coords)
 
         if not isinstance(coords, np.ndarray):
             coords = np.array(coords)
@@ -210,23 +606,1036 @@ class HPGe(ABC, geant4.LogicalVolume):
             msg = "coords must be provided as a 2D array with x,y,z coordinates for each point."
             raise ValueError(msg)
 
-        # get the coordinates
-        r, z = self.get_profile()
-        s1, s2 = utils.get_line_segments(
-            np.array(r), np.array(z), surface_indices=surface_indices
+        return self.distance_to_surface_xyz(
+            coords[:, 0],
+            coords[:, 1],
+            coords[:, 2],
+            surface_indices=surface_indices,
+            tol=tol,
+            signed=signed,
+            optimised=optimised,
+            max_error=max_error,
+            dtype=dtype,
+            return_indices=return_indices,
+        )
+
+    @overload
+    def distance_to_surface_xyz(
+        self,
+        x: ArrayLike,
+        y: ArrayLike,
+        z: ArrayLike,
+        surface_indices: NDArray | None = ...,
+        tol: float | None = ...,
+        signed: bool = ...,
+        optimised: bool = ...,
+        max_error: float | None = ...,
+        dtype: DTypeLike = ...,
+        return_indices: Literal[False] = ...,
+    ) -> NDArray: ...
+
+    @overload
+    def distance_to_surface_xyz(
+        self,
+        x: ArrayLike,
+        y: ArrayLike,
+        z: ArrayLike,
+        surface_indices: NDArray | None = ...,
+        tol: float | None = ...,
+        signed: bool = ...,
+        optimised: bool = ...,
+        max_error: float | None = ...,
+        dtype: DTypeLike = ...,
+        *,
+        return_indices: Literal[True],
+    ) -> tuple[NDArray, NDArray]: ...
+
+    @overload
+    def distance_to_surface_xyz(
+        self,
+        x: ArrayLike,
+        y: ArrayLike,
+        z: ArrayLike,
+        surface_indices: NDArray | None = ...,
+        tol: float | None = ...,
+        signed: bool = ...,
+        optimised: bool = ...,
+        max_error: float | None = ...,
+        dtype: DTypeLike = ...,
+        return_indices: bool = ...,
+    ) -> NDArray | tuple[NDArray, NDArray]: ...
+
+    def distance_to_surface_xyz(
+        self,
+        x: ArrayLike,
+        y: ArrayLike,
+        z: ArrayLike,
+        surface_indices: NDArray | None = None,
+        tol: float | None = None,
+        signed: bool = False,
+        optimised: bool = False,
+        max_error: float | None = None,
+        dtype: DTypeLike = np.float64,
+        return_indices: bool = False,
+    ) -> NDArray | tuple[NDArray, NDArray]:
+        """Compute the distance to the surface from separate coordinate arrays.
+
+        Same as :meth:`distance_to_surface` for data stored column-wise, the
+        coordinates are never packed into a 2D array.
+
+        Parameters
+        ----------
+        x, y, z
+            1D arrays with the coordinates of each point.
+        surface_indices, tol, signed, optimised, max_error, dtype, return_indices
+            see :meth:`distance_to_surface`.
+        """
+        tol, dtype = _resolve_tol(tol, dtype)
+
+        x = np.asarray(x, dtype=dtype)
+        y = np.asarray(y, dtype=dtype)
+        z = np.asarray(z, dtype=dtype)
+
+        if x.shape != y.shape:
+            msg = "x and y must have the same shape."
+            raise ValueError(msg)
+
+        r = utils.radius(x, y)
+
+        cut = self._cut_plane()
+        if cut is None:
+            return self.distance_to_surface_rz(
+                r,
+                z,
+                surface_indices=surface_indices,
+                tol=tol,
+                signed=signed,
+                optimised=optimised,
+                max_error=max_error,
+                dtype=dtype,
+                return_indices=return_indices,
+            )
+
+        if (
+            surface_indices is not None
+            or optimised
+            or max_error is not None
+            or return_indices
+        ):
+            msg = (
+                "surface_indices, optimised, max_error and return_indices are not "
+                f"supported for {type(self).__name__}, which has a cut"
+            )
+            raise NotImplementedError(msg)
+
+        dists, indices = self._profile_distance(
+            r, z, tol=tol, signed=True, dtype=dtype, return_indices=True
         )
 
-        # convert coords
-        coords_rz = utils.convert_coords(coords)
+        profile = self.get_profile_segments()
+        normal, offset = cut
+
+        with instrumentation.section("cut_kernel", len(r)):
+            utils._dispatch(utils._cut_distance)(
+                profile.s1, profile.s2, x, y, z, r, dists, indices, normal, offset, tol
+            )
+
+        return dists if signed else np.abs(dists)
+
+    @overload
+    def distance_to_surface_rz(
+        self,
+        r: ArrayLike,
+        z: ArrayLike,
+        surface_indices: NDArray | None = ...,
+        tol: float | None = ...,
+        signed: bool = ...,
+        optimised: bool = ...,
+        max_error: float | None = ...,
+        dtype: DTypeLike = ...,
+        return_indices: Literal[False] = ...,
+    ) -> NDArray: ...
+
+    @overload
+    def distance_to_surface_rz(
+        self,
+        r: ArrayLike,
+        z: ArrayLike,
+        surface_indices: NDArray | None = ...,
+        tol: float | None = ...,
+        signed: bool = ...,
+        optimised: bool = ...,
+        max_error: float | None = ...,
+        dtype: DTypeLike = ...,
+        *,
+        return_indices: Literal[True],
+    ) -> tuple[NDArray, NDArray]: ...
+
+    @overload
+    def distance_to_surface_rz(
+        self,
+        r: ArrayLike,
+        z: ArrayLike,
+        surface_indices: NDArray | None = ...,
+        tol: float | None = ...,
+        signed: bool = ...,
+        optimised: bool = ...,
+        max_error: float | None = ...,
+        dtype: DTypeLike = ...,
+        return_indices: bool = ...,
+    ) -> NDArray | tuple[NDArray, NDArray]: ...
+
+    def distance_to_surface_rz(
+        self,
+        r: ArrayLike,
+        z: ArrayLike,
+        surface_indices: NDArray | None = None,
+        tol: float | None = None,
+        signed: bool = False,
+        optimised: bool = False,
+        max_error: float | None = None,
+        dtype: DTypeLike = np.float64,
+        return_indices: bool = False,
+    ) -> NDArray | tuple[NDArray, NDArray]:
+        """Compute the distance to the surface from cylindrical coordinates.
+
+        Same as :meth:`distance_to_surface` with the radial coordinate
+        :math:`r = \\sqrt{x^2 + y^2}` of each point already computed.
+
+        Parameters
+        ----------
+        r
+            1D array of radial coordinates.
+        z
+            1D array of vertical coordinates, same length as `r`.
+        surface_indices, tol, signed, optimised, max_error, dtype, return_indices
+            see :meth:`distance_to_surface`.
+
+        Note
+        ----
+        Not available for detectors with a cut, which are not rotationally
+        symmetric, use :meth:`distance_to_surface_xyz` instead.
+        """
+        # check type of the solid
+        if not isinstance(self.solid, geant4.solid.GenericPolycone):
+            msg = f"distance_to_surface_rz is not implemented for {type(self.solid)}"
+            raise NotImplementedError(msg)
+
+        return self._profile_distance(
+            r,
+            z,
+            surface_indices=surface_indices,
+            tol=tol,
+            signed=signed,
+            optimised=optimised,
+            max_error=max_error,
+            dtype=dtype,
+            return_indices=return_indices,
+        )
+
+    def _profile_distance(
+        self,
+        r: ArrayLike,
+        z: ArrayLike,
+        surface_indices: NDArray | None = None,
+        tol: float | None = None,
+        signed: bool = False,
+        optimised: bool = False,
+        max_error: float | None = None,
+        dtype: DTypeLike = np.float64,
+        return_indices: bool = False,
+    ) -> NDArray | tuple[NDArray, NDArray]:
+        """Distance to the surface of the (uncut) polycone of :meth:`get_profile`."""
+        tol, dtype = _resolve_tol(tol, dtype)
+
+        r = np.asarray(r, dtype=dtype)
+        z = np.asarray(z, dtype=dtype)
+
+        if r.ndim != 1 or r.shape != z.shape:
+            msg = "r and z must be 1D arrays of the same length."
+            raise ValueError(msg)
+
+        # get the coordinates
+        profile = self.get_profile_segments()
+        s1, s2 = profile.s1, profile.s2
+        if surface_indices is not None:
+            s1 = s1[surface_indices]
+            s2 = s2[surface_indices]
+
+        if return_indices and (max_error is not None or optimised):
+            msg = "return_indices is not supported with max_error or optimised"
+            raise ValueError(msg)
+
+        if max_error is not None:
+            if surface_indices is not None:
+                msg = "max_error can only be used if all surfaces are considered"
+                raise ValueError(msg)
+
+            return self.get_distance_table(max_error).evaluate_rz(
+                r, z, signed=signed, tol=tol
+            )
 
         if not optimised:
-            dists = utils.shortest_distance(s1, s2, coords_rz, tol=tol, signed=signed)
-            idx = np.abs(dists).argmin(axis=1)
-            return dists[np.arange(dists.shape[0]), idx]
+            if len(s1) == 0:
+                msg = "at least one surface must be selected"
+                raise ValueError(msg)
+
+            grid = self._get_segment_grid() if surface_indices is None else None
+
+            if grid is not None:
+                with instrumentation.section("distance_kernel", len(r)):
+                    dists, indices = utils._dispatch(
+                        utils._nearest_segment_distance_grid
+                    )(
+                        s1,
+                        s2,
+                        r,
+                        z,
+                        grid.origin,
+                        grid.cell_size,
+                        grid.shape,
+                        grid.offsets,
+                        grid.segments,
+                        tol,
+                        signed,
+                    )
+
+                if instrumentation.enabled():
+                    n_evaluated = utils._grid_candidate_count(
+                        r,
+                        z,
+                        grid.origin,
+                        grid.cell_size,
+                        grid.shape,
+                        grid.offsets,
+                        grid.segments,
+                        len(s1),
+                    )
+                    instrumentation.count(
+                        "distance_kernel",
+                        segments_evaluated=n_evaluated,
+                        segments_pruned=len(r) * len(s1) - n_evaluated,
+                    )
+            else:
+                with instrumentation.section("distance_kernel", len(r)):
+                    dists, indices = utils._dispatch(utils._nearest_segment_distance)(
+                        s1, s2, r, z, tol, signed
+                    )
+
+                instrumentation.count(
+                    "distance_kernel", segments_evaluated=len(r) * len(s1)
+                )
+
+            if not return_indices:
+                return dists
+
+            if surface_indices is not None:
+                indices = np.arange(len(profile.s1))[surface_indices][indices]
+
+            return dists, indices
         msg = "Optimised version is not fully tested in all cases"
         log.warning(msg)
 
-        return utils.iterate_segments(s1, s2, coords_rz, tol, signed)
+        n_evaluated = np.zeros(1, dtype=np.int64)
+        with instrumentation.section("distance_kernel", len(r)):
+            dists = utils._dispatch(utils._iterate_segments)(
+                s1,
+                s2,
+                np.column_stack((r, z)),
+                tol,
+                signed,
+                n_evaluated,
+                utils.get_num_threads(),
+            )
+
+        instrumentation.count(
+            "distance_kernel",
+            segments_evaluated=n_evaluated[0],
+            segments_pruned=len(r) * len(s1) - n_evaluated[0],
+        )
+
+        return dists.astype(dtype, copy=False)
+
+    @instrumentation.instrumented("distance_to_surface_types")
+    def distance_to_surface_types(
+        self,
+        coords: ArrayLike,
+        surface_types: Sequence[str] = SURFACE_TYPES,
+        tol: float | None = None,
+        signed: bool = False,
+        dtype: DTypeLike = np.float64,
+    ) -> NDArray:
+        """Compute the distance of each point to the nearest surface of each type.
+
+        All the types are computed in a single pass over the surfaces, the
+        result for each type is identical to calling
+        :meth:`distance_to_surface` with the `surface_indices` of that type.
+
+        Parameters
+        ----------
+        coords
+            coordinates of the points, as in :meth:`distance_to_surface`.
+        surface_types
+            names of the surface types, see :data:`SURFACE_TYPES`.
+        tol, signed, dtype
+            see :meth:`distance_to_surface`.
+
+        Returns
+        -------
+            ``(n_points, len(surface_types))`` array of distances, the
+            column of a type without surfaces is ``NaN``. For awkward input
+            the last dimension is added to the jagged structure.
+
+        Note
+        ----
+        Not implemented for detectors with a cut (e.g.
+        :class:`~.v02160a.V02160A`), as :meth:`distance_to_surface` does not
+        support `surface_indices` for them: the surfaces of each type would
+        have to be clipped by the cut, whose face is an additional passive
+        surface.
+        """
+        if isinstance(coords, ak.Array):
+            x, y, z = utils.flatten_columns(coords)
+        else:
+            coords = np.asarray(coords)
+            if np.shape(coords)[1] != 3:
+                msg = "coords must be provided as a 2D array with x,y,z coordinates for each point."
+                raise ValueError(msg)
+            x, y, z = coords[:, 0], coords[:, 1], coords[:, 2]
+
+        if not isinstance(self.solid, geant4.solid.GenericPolycone):
+            msg = (
+                f"distance_to_surface_types is not implemented for "
+                f"{type(self.solid)}, for example for detectors with a cut"
+            )
+            raise NotImplementedError(msg)
+
+        tol, dtype = _resolve_tol(tol, dtype)
+
+        surface_types = list(surface_types)
+        groups = np.array(
+            [
+                surface_types.index(name) if name in surface_types else -1
+                for name in self.surfaces
+            ],
+            dtype=np.int64,
+        )
+
+        n_segments = sum(group >= 0 for group in groups)
+
+        profile = self.get_profile_segments()
+        r = utils.radius(np.asarray(x, dtype=dtype), np.asarray(y, dtype=dtype))
+
+        with instrumentation.section("distance_kernel", len(r)):
+            dists = utils._dispatch(utils._nearest_segment_distance_by_group)(
+                profile.s1,
+                profile.s2,
+                groups,
+                len(surface_types),
+                r,
+                np.asarray(z, dtype=dtype),
+                tol,
+                signed,
+            )
+
+        instrumentation.count("distance_kernel", segments_evaluated=len(r) * n_segments)
+
+        if isinstance(coords, ak.Array):
+            return utils.unflatten_like(dists, coords)
+        return dists
+
+    @instrumentation.instrumented("activeness")
+    def activeness(
+        self,
+        coords: ArrayLike,
+        fccd: Mapping[str, float | tuple[float, float]],
+        model: str | Callable[[float, float, float], float] = "step",
+        tol: float | None = None,
+    ) -> NDArray:
+        """Compute the charge collection efficiency (activeness) of each point.
+
+        The response of each surface type is a function of the distance to the
+        surface, its full charge collection depth (FCCD) and the thickness of
+        its transition layer. The activeness of a point is the smallest
+        response of the surfaces (zero outside the detector), which is computed
+        in the same pass over the segments as the distances, without storing
+        them.
+
+        Parameters
+        ----------
+        coords
+            coordinates of the points, as in :meth:`distance_to_surface`.
+        fccd
+            mapping of the surface types (see :data:`SURFACE_TYPES`) to their
+            FCCD, or to a tuple of FCCD and thickness of the transition layer
+            (by default zero), in mm. Surfaces of the other types are fully
+            active.
+        model
+            response model, ``step`` (see :func:`.utils.step_response`),
+            ``linear`` (see :func:`.utils.linear_response`), or a function
+            with the same signature compiled with :func:`numba.njit`,
+            increasing with the distance.
+        tol
+            see :meth:`distance_to_surface`.
+
+        Returns
+        -------
+            the activeness of each point, between zero and one. For awkward
+            input it has the same structure.
+
+        Examples
+        --------
+        >>> hpge.activeness(coords, {"nplus": (1.0, 0.5)}, model="linear")
+
+        Note
+        ----
+        For detectors with a cut, the face of the cut is a passive surface
+        and its distance is computed as in :meth:`distance_to_surface`.
+        """
+        cut = self._cut_plane()
+        if cut is None and not isinstance(self.solid, geant4.solid.GenericPolycone):
+            msg = f"activeness is not implemented for {type(self.solid)}"
+            raise NotImplementedError(msg)
+
+        model_index, response = _response_model(model)
+        params = _response_params(fccd)
+
+        if isinstance(coords, ak.Array):
+            x, y, z = utils.flatten_columns(coords)
+        else:
+            coords = np.asarray(coords)
+            if np.shape(coords)[1] != 3:
+                msg = "coords must be provided as a 2D array with x,y,z coordinates for each point."
+                raise ValueError(msg)
+            x, y, z = coords[:, 0], coords[:, 1], coords[:, 2]
+
+        tol, dtype = _resolve_tol(tol, np.float64)
+        x = np.asarray(x, dtype=dtype)
+        y = np.asarray(y, dtype=dtype)
+        z = np.asarray(z, dtype=dtype)
+        r = utils.radius(x, y)
+
+        heights = None
+        if cut is not None:
+            normal, offset = cut
+            heights = offset - (normal[0] * x + normal[1] * y + normal[2] * z)
+
+        profile = self.get_profile_segments()
+        segments = (
+            profile.s1,
+            profile.s2,
+            profile.directions,
+            profile.lengths,
+            profile.surface_codes,
+            params,
+        )
+
+        with instrumentation.section("activeness_kernel", len(r)):
+            if response is None:
+                activeness = utils._dispatch(utils._activeness)(
+                    *segments, model_index, r, z, heights, tol
+                )
+            else:
+                activeness = utils._dispatch(utils._activeness_user)(
+                    *segments, response, r, z, heights, tol
+                )
+
+        if isinstance(coords, ak.Array):
+            return utils.unflatten_like(activeness, coords)
+        return activeness
+
+    @instrumentation.instrumented("active_energy")
+    def active_energy(
+        self,
+        hits: ak.Array,
+        fccd: Mapping[str, float | tuple[float, float]],
+        model: str | Callable[[float, float, float], float] = "step",
+        energy_field: str = "edep",
+        tol: float | None = None,
+    ) -> NDArray:
+        """Compute the sum of the energy times the activeness of the hits of each event.
+
+        Same as summing ``edep * activeness`` over the hits of each event with
+        :meth:`activeness`, in a single compiled pass over the events which
+        allocates only the result.
+
+        Parameters
+        ----------
+        hits
+            awkward array with a list of hits for each event, with fields
+            `xloc`, `yloc` and `zloc` (coordinates relative to the detector)
+            and `energy_field`.
+        fccd, model, tol
+            see :meth:`activeness`.
+        energy_field
+            name of the field with the energy of the hits.
+
+        Returns
+        -------
+            the active energy of each event, in the units of `energy_field`.
+
+        See Also
+        --------
+        .SegmentTable.active_energy
+        """
+        cut = self._cut_plane()
+        if cut is None and not isinstance(self.solid, geant4.solid.GenericPolycone):
+            msg = f"active_energy is not implemented for {type(self.solid)}"
+            raise NotImplementedError(msg)
+
+        normal, offset = (np.zeros(3), 0.0) if cut is None else cut
+
+        model_index, response = _response_model(model)
+        params = _response_params(fccd)
+        tol, _ = _resolve_tol(tol, np.float64)
+
+        event_offsets = utils.event_offsets(hits, energy_field)
+        x, y, z, edep = utils.flatten_columns(
+            hits, ("xloc", "yloc", "zloc", energy_field)
+        )
+
+        profile = self.get_profile_segments()
+        energy = _active_energy(
+            np.broadcast_to(np.int64(0), len(x)),
+            x,
+            y,
+            z,
+            edep,
+            event_offsets,
+            np.array([0, len(profile.s1)]),
+            (
+                profile.s1,
+                profile.s2,
+                profile.directions,
+                profile.lengths,
+                profile.surface_codes,
+            ),
+            (np.array([cut is not None]), normal[np.newaxis], np.array([offset])),
+            params[np.newaxis],
+            model_index,
+            response,
+            tol,
+        )
+
+        return energy[:, 0]
+
+    @instrumentation.instrumented("is_active")
+    def is_active(
+        self,
+        coords: ArrayLike,
+        fccd: Mapping[str, float | tuple[float, float]],
+    ) -> NDArray[np.bool_]:
+        """Compute whether each point is in the fully active volume.
+
+        Same as checking that :meth:`activeness` is one, but the points are
+        classified against the inward offset of the profile (see
+        :meth:`get_active_region`), which is built once for each `fccd`, in
+        logarithmic time in the number of vertices of the profile and without
+        computing any distance.
+
+        Parameters
+        ----------
+        coords
+            coordinates of the points, as in :meth:`distance_to_surface`.
+        fccd
+            see :meth:`activeness`, the thickness of the transition layers is
+            ignored.
+
+        Returns
+        -------
+            boolean array, for awkward input with the same structure.
+
+        Note
+        ----
+        For detectors with a cut, the points must also be farther than the
+        FCCD of the passive surfaces from the plane of the cut.
+        """
+        region = self.get_active_region(fccd)
+
+        if isinstance(coords, ak.Array):
+            x, y, z = utils.flatten_columns(coords)
+        else:
+            coords = np.asarray(coords)
+            if np.shape(coords)[1] != 3:
+                msg = "coords must be provided as a 2D array with x,y,z coordinates for each point."
+                raise ValueError(msg)
+            x, y, z = coords[:, 0], coords[:, 1], coords[:, 2]
+
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        z = np.asarray(z, dtype=np.float64)
+        r = utils.radius(x, y)
+
+        with instrumentation.section("active_region_kernel", len(r)):
+            active = region.contains_rz(r, z)
+
+        cut = self._cut_plane()
+        if cut is not None:
+            # as in the activeness, the face of the cut is a passive surface
+            normal, plane = cut
+            tol = _DEFAULT_TOL[np.dtype(np.float64)]
+            height = plane - (normal[0] * x + normal[1] * y + normal[2] * z)
+            depth = _response_params(fccd)[SURFACE_TYPES.index("passive"), 0]
+            active &= (
+                (np.maximum(height, tol) >= depth) if depth > 0 else height >= -tol
+            )
+
+        if isinstance(coords, ak.Array):
+            return utils.unflatten_like(active, coords)
+        return active
+
+    def get_active_region(
+        self, fccd: Mapping[str, float | tuple[float, float]]
+    ) -> offset.ActiveRegion:
+        """Region of the profile farther than the FCCD of each surface type from it.
+
+        The region is built on first use and cached, it is rebuilt only if
+        the profile or `fccd` change.
+
+        Parameters
+        ----------
+        fccd
+            see :meth:`activeness`, the thickness of the transition layers is
+            ignored.
+
+        Note
+        ----
+        For detectors with a cut, this is the region of the uncut profile,
+        as :meth:`get_profile`. The FCCD must be small enough that the offset
+        surfaces do not vanish or cross each other, else a
+        :class:`ValueError` is raised.
+        """
+        if self._cut_plane() is None and not isinstance(
+            self.solid, geant4.solid.GenericPolycone
+        ):
+            msg = f"the active region is not implemented for {type(self.solid)}"
+            raise NotImplementedError(msg)
+
+        key = tuple(_response_params(fccd)[:, 0])
+        profile = self.get_profile_segments()
+
+        if (
+            self._active_region is None
+            or self._active_region[0] is not profile
+            or self._active_region[1] != key
+        ):
+            distances = np.array(key)[profile.surface_codes]
+
+            # the closing edge along the axis is not a surface
+            boundary = offset.offset_profile(
+                profile.r, profile.z, np.append(distances, 0)
+            )
+            if not offset.is_valid_offset(boundary, profile.s1, profile.s2, distances):
+                msg = (
+                    f"FCCD {fccd} too large for {self.name}, the offset surfaces "
+                    "vanish or cross each other"
+                )
+                raise ValueError(msg)
+
+            self._active_region = (profile, key, offset.ActiveRegion(boundary))
+
+        return self._active_region[2]
+
+    def sample_volume(
+        self, n: int, rng: np.random.Generator | int | None = None
+    ) -> NDArray:
+        """Sample points uniformly in the volume of the detector.
+
+        The solid of revolution of the profile (see :meth:`get_profile`) is
+        decomposed into conical frustum slices, see
+        :func:`.sampling.volume_slices`. The points are sampled exactly in
+        :math:`(r, z)` within a slice drawn with probability proportional to
+        its volume and uniformly in :math:`\\phi`, with no rejection except
+        for the detectors with a cut, whose points beyond the cut are sampled
+        again.
+
+        Parameters
+        ----------
+        n
+            number of points.
+        rng
+            random number generator, or seed of a new one (see
+            :func:`numpy.random.default_rng`).
+
+        Returns
+        -------
+            `(n,3)` array of the `x`, `y` and `z` coordinates of the points, in mm.
+
+        Examples
+        --------
+        >>> coords = hpge.sample_volume(10_000, rng=np.random.default_rng(42))
+        """
+        rng = np.random.default_rng(rng)
+        slices = self._get_volume_slices()
+
+        return self._sample_points(
+            lambda size: sampling.sample_slices(slices, size, rng), n, rng
+        )
+
+    def sample_surface(
+        self,
+        n: int,
+        surface_type: str | None = None,
+        rng: np.random.Generator | int | None = None,
+    ) -> NDArray:
+        """Sample points uniformly on the surface of the detector.
+
+        A segment of the profile is drawn with probability proportional to
+        the area of its surface (see :meth:`surface_area`), and the point
+        uniformly on this cone, annulus or cylinder, see
+        :func:`.sampling.sample_segments`.
+
+        Parameters
+        ----------
+        n
+            number of points.
+        surface_type
+            type of the surfaces to sample (see :data:`SURFACE_TYPES`), all
+            the surfaces if ``None``.
+        rng
+            random number generator, or seed of a new one (see
+            :func:`numpy.random.default_rng`).
+
+        Returns
+        -------
+            `(n,3)` array of the `x`, `y` and `z` coordinates of the points, in mm.
+
+        Examples
+        --------
+        >>> coords = hpge.sample_surface(10_000, "nplus", rng=42)
+
+        Note
+        ----
+        For the detectors with a cut, the points beyond the cut are sampled
+        again and the face of the cut, which has no surface type, is not
+        sampled.
+        """
+        rng = np.random.default_rng(rng)
+        profile = self.get_profile_segments()
+        areas = self._segment_areas()
+
+        if surface_type is not None:
+            if surface_type not in SURFACE_TYPES:
+                msg = f"unknown surface type {surface_type}, must be in {SURFACE_TYPES}"
+                raise ValueError(msg)
+            code = SURFACE_TYPES.index(surface_type)
+            areas = np.where(profile.surface_codes == code, areas, 0)
+
+        if not np.any(areas > 0):
+            msg = f"{self.name} has no {surface_type or ''} surface to sample"
+            raise ValueError(msg)
+
+        return self._sample_points(
+            lambda size: sampling.sample_segments(
+                profile.s1, profile.s2, areas, size, rng
+            ),
+            n,
+            rng,
+        )
+
+    def _sample_points(
+        self,
+        sample_rz: Callable[[int], tuple[NDArray, NDArray]],
+        n: int,
+        rng: np.random.Generator,
+    ) -> NDArray:
+        """Points from `(r, z)` samples and a uniform azimuth, without the cut.
+
+        The points beyond the cut are rejected and drawn again, in batches
+        scaled by the fraction of the points accepted so far.
+        """
+        cut = self._cut_plane()
+
+        chunks = []
+        accepted, drawn = 0, 0
+        while accepted < n:
+            missing = n - accepted
+            size = (
+                missing
+                if drawn == 0
+                else max(math.ceil(missing * drawn / max(accepted, 1)), 1000)
+            )
+
+            r, z = sample_rz(size)
+            phi = rng.uniform(0, 2 * math.pi, size)
+            points = np.column_stack((r * np.cos(phi), r * np.sin(phi), z))
+
+            if cut is not None:
+                normal, offset = cut
+                points = points[points @ normal <= offset]
+
+            drawn += size
+            accepted += len(points)
+            chunks.append(points)
+
+            if accepted == 0 and drawn >= 1_000_000:
+                msg = "all the sampled points are beyond the cut"
+                raise ValueError(msg)
+
+        coords = chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+        return coords[:n]
+
+    def iter_distance_to_surface(
+        self,
+        coords: NDArray | str | Path | Iterable[NDArray],
+        chunk_size: int = 1_000_000,
+        **kwargs,
+    ) -> Iterator[NDArray]:
+        """Compute the distance to the surface chunk by chunk.
+
+        The coordinates are processed in chunks of at most `chunk_size`
+        points, so that the memory usage is bounded independently of the
+        total number of points.
+
+        Parameters
+        ----------
+        coords
+            coordinates in the format of :meth:`distance_to_surface`: an
+            array (for example a :class:`numpy.memmap`), name of a ``.npy``
+            file, or iterable of arrays, see :func:`.utils.iterate_chunks`.
+        chunk_size
+            maximum number of points processed at once.
+        **kwargs
+            keyword arguments passed to :meth:`distance_to_surface`.
+
+        Yields
+        ------
+            the distances for each chunk.
+
+        Examples
+        --------
+        Write the distances of the points stored in a large file to disk:
+
+        >>> coords = np.load("hits.npy", mmap_mode="r")
+        >>> out = np.lib.format.open_memmap("dist.npy", mode="w+", shape=len(coords))
+        >>> start = 0
+        >>> for dists in hpge.iter_distance_to_surface(coords, chunk_size=10**6):
+        ...     out[start : start + len(dists)] = dists
+        ...     start += len(dists)
+        """
+        dtype = kwargs.get("dtype", np.float64)
+        for chunk in utils.iterate_chunks(coords, chunk_size, dtype=dtype):
+            yield self.distance_to_surface(chunk, **kwargs)
+
+    def iter_is_inside(
+        self,
+        coords: NDArray | str | Path | Iterable[NDArray],
+        chunk_size: int = 1_000_000,
+        tol: float = 1e-11,
+    ) -> Iterator[NDArray[np.bool_]]:
+        """Compute whether each point is inside the volume, chunk by chunk.
+
+        See :meth:`iter_distance_to_surface` for the description of the
+        parameters and :meth:`is_inside` for `tol`.
+        """
+        for chunk in utils.iterate_chunks(coords, chunk_size):
+            yield self.is_inside(chunk, tol=tol)
+
+    def _get_segment_grid(self) -> utils.SegmentGrid | None:
+        """Spatial index of the profile segments, built on first use.
+
+        The grid is rebuilt if the segments change. ``None`` is returned if
+        the profile contains degenerate segments.
+        """
+        profile = self.get_profile_segments()
+
+        if self._segment_grid is None or self._segment_grid[0] is not profile:
+            try:
+                grid = utils.build_segment_grid(profile.s1, profile.s2)
+            except ValueError:
+                grid = None
+            self._segment_grid = (profile, grid)
+
+        return self._segment_grid[1]
+
+    def _get_volume_slices(self) -> sampling.VolumeSlices:
+        """Slices of the volume of the profile, rebuilt if the profile changes."""
+        profile = self.get_profile_segments()
+
+        if self._volume_slices is None or self._volume_slices[0] is not profile:
+            self._volume_slices = (
+                profile,
+                sampling.volume_slices(profile.r, profile.z),
+            )
+
+        return self._volume_slices[1]
+
+    def get_distance_table(self, max_error: float = 1e-3, **kwargs) -> DistanceTable:
+        """Table of the signed distance to the surface, for fast approximate queries.
+
+        The table is built on the first call and cached, it is rebuilt only
+        if a smaller `max_error` is requested or if the profile changed.
+
+        Parameters
+        ----------
+        max_error
+            maximum absolute error on the interpolated distance, in mm.
+        **kwargs
+            other keyword arguments passed to :class:`.DistanceTable`.
+
+        Examples
+        --------
+        Build the table once and share it with other processes:
+
+        >>> hpge.get_distance_table(max_error=1e-3).save("table.npz")
+
+        >>> hpge.set_distance_table(DistanceTable.load("table.npz"))
+        >>> hpge.distance_to_surface(coords, max_error=1e-3)
+        """
+        profile = self.get_profile_segments()
+
+        table = self._distance_table
+        if (
+            table is None
+            or table.max_error > max_error
+            or not table.matches(profile.s1, profile.s2)
+        ):
+            table = DistanceTable(profile.s1, profile.s2, max_error=max_error, **kwargs)
+            self._distance_table = table
+
+        return table
+
+    def set_distance_table(self, table: DistanceTable) -> None:
+        """Use a previously built :class:`.DistanceTable` for this detector.
+
+        Raises
+        ------
+        ValueError
+            if the table was built for a different profile.
+        """
+        profile = self.get_profile_segments()
+
+        if not table.matches(profile.s1, profile.s2):
+            msg = f"the distance table was not built for the profile of {self.name}"
+            raise ValueError(msg)
+
+        self._distance_table = table
+
+    @property
+    def surface_type_codes(self) -> NDArray[np.int8]:
+        """Integer code of the type of each surface.
+
+        The code is the index of the surface name (see :attr:`surfaces`) in
+        :data:`SURFACE_TYPES`.
+
+        Examples
+        --------
+        >>> dists, indices = hpge.distance_to_surface(coords, return_indices=True)
+        >>> codes = hpge.surface_type_codes[indices]
+        >>> is_nplus = codes == SURFACE_TYPES.index("nplus")
+        """
+        return self.get_profile_segments().surface_codes
+
+    def _surface_type_codes(self) -> NDArray[np.int8]:
+        """Build the array of :attr:`surface_type_codes`."""
+        unknown = set(self.surfaces) - set(SURFACE_TYPES)
+        if unknown:
+            msg = f"unknown surface types {unknown}, must be in {SURFACE_TYPES}"
+            raise ValueError(msg)
+
+        return np.array(
+            [SURFACE_TYPES.index(name) for name in self.surfaces], dtype=np.int8
+        )
 
     @property
     def volume(self) -> Quantity:
@@ -248,6 +1657,90 @@ class HPGe(ABC, geant4.LogicalVolume):
         """Mass of the HPGe."""
         return (self.volume * (self.material.density * u.g / u.cm**3)).to(u.g)
 
+    def active_volume(
+        self, fccd: ArrayLike, surface_types: str | Sequence[str] = "nplus"
+    ) -> tuple[Quantity, Quantity]:
+        """Active volume and mass for many full charge collection depths.
+
+        The active volume is that of the points farther than the FCCD from
+        the surfaces of the given types, computed exactly from the inward
+        offset of the profile (see :mod:`.offset`), for all the FCCD at once.
+        The dead layer volume is the difference with :attr:`volume`. For
+        detectors with a cut, whose face is a passive surface, the volume is
+        integrated numerically with :func:`.offset.cut_offset_volume`.
+
+        Parameters
+        ----------
+        fccd
+            full charge collection depths, in mm.
+        surface_types
+            types of the surfaces with a dead layer, see :data:`SURFACE_TYPES`.
+
+        Returns
+        -------
+            the active volume and mass, with the shape of `fccd`.
+
+        Examples
+        --------
+        >>> volume, mass = hpge.active_volume(np.linspace(0, 2, 1000))
+
+        Note
+        ----
+        The FCCD must be small enough that the offset surfaces do not vanish
+        or cross each other, else a :class:`ValueError` is raised.
+        """
+        cut = self._cut_plane()
+        if cut is None and not isinstance(self.solid, geant4.solid.GenericPolycone):
+            msg = f"active_volume is not implemented for {type(self.solid)}"
+            raise NotImplementedError(msg)
+
+        if isinstance(surface_types, str):
+            surface_types = [surface_types]
+        unknown = set(surface_types) - set(SURFACE_TYPES)
+        if unknown:
+            msg = f"unknown surface types {unknown}, must be in {SURFACE_TYPES}"
+            raise ValueError(msg)
+
+        fccd = np.asarray(fccd, dtype=np.float64)
+        if np.any(fccd < 0):
+            msg = "the FCCD must be positive"
+            raise ValueError(msg)
+
+        profile = self.get_profile_segments()
+        codes = [SURFACE_TYPES.index(name) for name in surface_types]
+        distances = np.isin(profile.surface_codes, codes).astype(np.float64)
+
+        # the closing edge along the axis is not a surface
+        boundary = offset.offset_profile(profile.r, profile.z, np.append(distances, 0))
+
+        valid = offset.is_valid_offset(
+            boundary, profile.s1, profile.s2, distances, scale=fccd
+        )
+        if not np.all(valid):
+            msg = (
+                f"FCCD of {np.min(fccd[~valid])} mm and more are too large for "
+                f"{self.name}, the offset surfaces vanish or cross each other"
+            )
+            raise ValueError(msg)
+
+        if cut is None:
+            volume = offset.offset_volume(boundary, fccd) * u.mm**3
+        else:
+            normal, plane = cut
+            volume = (
+                offset.cut_offset_volume(
+                    boundary,
+                    normal,
+                    plane,
+                    distance=float("passive" in surface_types),
+                    scale=fccd,
+                )
+                * u.mm**3
+            )
+        mass = (volume * (self.material.density * u.g / u.cm**3)).to(u.g)
+
+        return volume, mass
+
     def surface_area(self, surface_indices: NDArray | None = None) -> NDArray:
         """Surface area of the HPGe.
 
@@ -268,26 +1761,23 @@ class HPGe(ABC, geant4.LogicalVolume):
         if not isinstance(self.solid, geant4.solid.GenericPolycone):
             log.warning("The area is that of the solid without cut")
 
-        r_profile, z_profile = self.get_profile()
+        areas = self._segment_areas()
+        if surface_indices is not None:
+            areas = areas[surface_indices]
 
-        r = np.array(r_profile)
-        z = np.array(z_profile)
+        return areas * u.mm**2
 
-        dr = np.array([r2 - r1 for r1, r2 in pairwise(r)])
-        sr = np.array([r2 + r1 for r1, r2 in pairwise(r)])
-        dz = np.array([z2 - z1 for z1, z2 in pairwise(z)])
-        dl = np.sqrt(np.power(dr, 2) + np.power(dz, 2))
-        r0 = r[:-1]
+    def _segment_areas(self) -> NDArray:
+        """Area of the surface of revolution of each profile segment, in mm²."""
+        profile = self.get_profile_segments()
 
-        if surface_indices is not None:
-            dr = dr[surface_indices]
-            dz = dz[surface_indices]
-            dl = dl[surface_indices]
-            r0 = r0[surface_indices]
-            sr = sr[surface_indices]
+        dr = profile.s2[:, 0] - profile.s1[:, 0]
+        sr = profile.s2[:, 0] + profile.s1[:, 0]
+        dz = profile.s2[:, 1] - profile.s1[:, 1]
+        r0 = profile.s1[:, 0]
 
         return np.where(
             dr == 0,
-            abs(dz) * r0 * 2 * np.pi * u.mm**2,
-            abs(sr) * dl * np.pi * u.mm**2,
+            abs(dz) * r0 * 2 * np.pi,
+            abs(sr) * profile.lengths * np.pi,
         )
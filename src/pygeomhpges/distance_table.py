@@ -0,0 +1,447 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+import numba
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+from . import utils
+
+log = logging.getLogger(__name__)
+
+
+@numba.njit(cache=True)
+def _projection(point_r, point_z, a_r, a_z, b_r, b_z):
+    """Position of the projection of a point on the line `a-b`, in units of the segment length."""
+    diff_r = b_r - a_r
+    diff_z = b_z - a_z
+    return ((point_r - a_r) * diff_r + (point_z - a_z) * diff_z) / (
+        diff_r**2 + diff_z**2
+    )
+
+
+@numba.njit(cache=True)
+def _outside_wedge(corners, u_r, u_z, v_r, v_z, w_r, w_z):
+    """Check if a box is outside the wedge formed by the corner `u-v-w`.
+
+    The wedge is the region on the side of both lines `u-v` and `v-w` where
+    the angle is smaller than 180 degrees. Outside of it the closest point of
+    the two segments is unique.
+    """
+    for a_r, a_z, b_r, b_z, c_r, c_z in (
+        (u_r, u_z, v_r, v_z, w_r, w_z),
+        (v_r, v_z, w_r, w_z, u_r, u_z),
+    ):
+        # side of the line a-b where the third point (and the wedge) lies
+        wedge_side = (b_r - a_r) * (c_z - a_z) - (b_z - a_z) * (c_r - a_r)
+
+        # straight corner, no wedge
+        if wedge_side == 0:
+            return (v_r - u_r) * (w_r - v_r) + (v_z - u_z) * (w_z - v_z) > 0
+
+        separated = True
+        for corner_r, corner_z in corners:
+            side = (b_r - a_r) * (corner_z - a_z) - (b_z - a_z) * (corner_r - a_r)
+            if side * wedge_side >= 0:
+                separated = False
+        if separated:
+            return True
+
+    return False
+
+
+@numba.njit(cache=True)
+def _interpolation_error(s1_list, s2_list, r_lo, r_hi, z_lo, z_hi, pad, is_candidate):
+    """Upper bound on the error of the bilinear interpolation in a cell.
+
+    The signed distance is a 1-Lipschitz function, so the interpolation error
+    is at most half of the cell diagonal. Tighter bounds are available if the
+    closest point of the surface is unique for all points of the cell, which
+    is the case if there is a single candidate segment or if the two
+    candidates are adjacent and the cell is outside of the wedge between them:
+
+    - if all points project inside the segment the distance is an affine
+      function and the interpolation is exact.
+    - otherwise the second derivatives of the distance are bounded by the
+      inverse of the distance between the cell and the segments, and so is
+      the interpolation error (times the squared diagonal over eight).
+    """
+    corners = ((r_lo, z_lo), (r_lo, z_hi), (r_hi, z_lo), (r_hi, z_hi))
+    diag_sq = (r_hi - r_lo) ** 2 + (z_hi - z_lo) ** 2
+    lipschitz = 0.5 * np.sqrt(diag_sq)
+
+    is_candidate[:] = False
+    utils._box_candidates(s1_list, s2_list, r_lo, r_hi, z_lo, z_hi, pad, is_candidate)
+    candidates = np.nonzero(is_candidate)[0]
+
+    if len(candidates) == 1:
+        j = candidates[0]
+
+        inside = True
+        for corner_r, corner_z in corners:
+            t = _projection(
+                corner_r,
+                corner_z,
+                s1_list[j, 0],
+                s1_list[j, 1],
+                s2_list[j, 0],
+                s2_list[j, 1],
+            )
+            if t < 0 or t > 1:
+                inside = False
+        if inside:
+            return 0.0
+
+    elif len(candidates) == 2:
+        first, second = candidates
+        if np.all(s2_list[first] == s1_list[second]):
+            u, v, w = s1_list[first], s2_list[first], s2_list[second]
+        elif np.all(s2_list[second] == s1_list[first]):
+            u, v, w = s1_list[second], s2_list[second], s2_list[first]
+        else:
+            return lipschitz
+
+        if not _outside_wedge(corners, u[0], u[1], v[0], v[1], w[0], w[1]):
+            return lipschitz
+
+    else:
+        return lipschitz
+
+    dist = np.inf
+    for j in candidates:
+        dist = min(
+            dist,
+            utils._box_segment_distance(
+                s1_list[j, 0],
+                s1_list[j, 1],
+                s2_list[j, 0],
+                s2_list[j, 1],
+                r_lo,
+                r_hi,
+                z_lo,
+                z_hi,
+            ),
+        )
+
+    if dist > 0:
+        return min(lipschitz, diag_sq / (8 * dist))
+
+    return lipschitz
+
+
+@numba.njit(cache=True)
+def _signed_distance(s1_list, s2_list, seg_n, seg_length, candidates, point_r, point_z):
+    """Distance to the closest segment, positive if inside the polygon.
+
+    No tolerance is applied, it is applied when the table is evaluated.
+    """
+    dist, _ = utils._nearest_of_candidates(
+        s1_list, s2_list, seg_n, seg_length, candidates, point_r, point_z, 0.0, False
+    )
+    if dist > 0 and not utils._point_in_polygon(s1_list, s2_list, point_r, point_z):
+        return -dist
+    return dist
+
+
+@numba.njit(cache=True)
+def _build_tree(s1_list, s2_list, origin, size, max_error, pad, max_depth):
+    n_segments = len(s1_list)
+    seg_n, seg_length = utils._segment_properties(s1_list, s2_list)
+    all_segments = np.arange(n_segments)
+    is_candidate = np.zeros(n_segments, dtype=np.bool_)
+
+    # leaves are flagged by negative values, -1 - (index in values)
+    capacity = 1024
+    children = np.empty(capacity, dtype=np.int32)
+    boxes = np.empty((capacity, 4))
+    depths = np.empty(capacity, dtype=np.int64)
+    values = np.empty((capacity, 4))
+    n_leaves = 0
+
+    boxes[0] = (origin[0], origin[0] + size[0], origin[1], origin[1] + size[1])
+    depths[0] = 0
+    n_nodes = 1
+    error_bound = 0.0
+
+    # breadth-first refinement, the children of a node are stored contiguously
+    node = 0
+    while node < n_nodes:
+        r_lo, r_hi, z_lo, z_hi = boxes[node]
+
+        error = _interpolation_error(
+            s1_list, s2_list, r_lo, r_hi, z_lo, z_hi, pad, is_candidate
+        )
+
+        if error <= max_error or depths[node] >= max_depth:
+            error_bound = max(error_bound, error)
+
+            if n_leaves == len(values):
+                values = np.concatenate((values, np.empty((len(values), 4))))
+
+            children[node] = -1 - n_leaves
+            for k, (corner_r, corner_z) in enumerate(
+                ((r_lo, z_lo), (r_lo, z_hi), (r_hi, z_lo), (r_hi, z_hi))
+            ):
+                values[n_leaves, k] = _signed_distance(
+                    s1_list,
+                    s2_list,
+                    seg_n,
+                    seg_length,
+                    all_segments,
+                    corner_r,
+                    corner_z,
+                )
+            n_leaves += 1
+        else:
+            if n_nodes + 4 > capacity:
+                capacity *= 2
+                children = np.concatenate(
+                    (children, np.empty(capacity - len(children), dtype=np.int32))
+                )
+                boxes = np.concatenate((boxes, np.empty((capacity - len(boxes), 4))))
+                depths = np.concatenate(
+                    (depths, np.empty(capacity - len(depths), dtype=np.int64))
+                )
+
+            mid_r = 0.5 * (r_lo + r_hi)
+            mid_z = 0.5 * (z_lo + z_hi)
+
+            children[node] = n_nodes
+            boxes[n_nodes] = (r_lo, mid_r, z_lo, mid_z)
+            boxes[n_nodes + 1] = (r_lo, mid_r, mid_z, z_hi)
+            boxes[n_nodes + 2] = (mid_r, r_hi, z_lo, mid_z)
+            boxes[n_nodes + 3] = (mid_r, r_hi, mid_z, z_hi)
+            depths[n_nodes : n_nodes + 4] = depths[node] + 1
+            n_nodes += 4
+
+        node += 1
+
+    return children[:n_nodes].copy(), values[:n_leaves].copy(), error_bound
+
+
+@numba.njit(cache=True, nogil=True)
+def _evaluate_tree(points_r, points_z, origin, size, children, values, dists, found):
+    for i in range(len(points_r)):
+        point_r = points_r[i]
+        point_z = points_z[i]
+
+        r_lo = origin[0]
+        r_hi = origin[0] + size[0]
+        z_lo = origin[1]
+        z_hi = origin[1] + size[1]
+
+        if not (r_lo <= point_r <= r_hi and z_lo <= point_z <= z_hi):
+            found[i] = False
+            continue
+
+        node = 0
+        while children[node] >= 0:
+            # must be consistent with the splitting in _build_tree
+            mid_r = 0.5 * (r_lo + r_hi)
+            mid_z = 0.5 * (z_lo + z_hi)
+
+            quadrant = 0
+            if point_r >= mid_r:
+                quadrant += 2
+                r_lo = mid_r
+            else:
+                r_hi = mid_r
+            if point_z >= mid_z:
+                quadrant += 1
+                z_lo = mid_z
+            else:
+                z_hi = mid_z
+
+            node = children[node] + quadrant
+
+        leaf = -1 - children[node]
+        t_r = (point_r - r_lo) / (r_hi - r_lo)
+        t_z = (point_z - z_lo) / (z_hi - z_lo)
+
+        dists[i] = (1 - t_r) * (
+            (1 - t_z) * values[leaf, 0] + t_z * values[leaf, 1]
+        ) + t_r * ((1 - t_z) * values[leaf, 2] + t_z * values[leaf, 3])
+        found[i] = True
+
+
+class DistanceTable:
+    """Precomputed signed distance to the surface of a polycone profile.
+
+    The signed distance (positive inside) is tabulated on an adaptive
+    quadtree in `(r,z)` and evaluated by bilinear interpolation inside the
+    leaf containing each point. Cells are refined until a rigorous upper
+    bound on the interpolation error is below `max_error`: regions where the
+    closest surface is a single straight segment are tabulated with large
+    cells, while the cells are small only close to the vertices and to the
+    points equidistant from different surfaces. The memory usage therefore
+    scales as the inverse of `max_error`, about 100 MB for 1 µm.
+
+    Points outside of the tabulated region are computed exactly with
+    :func:`.utils.nearest_segment_distance`.
+
+    The table can be written to disk with :meth:`save` and read back with
+    :meth:`load` (or pickled), so that it is built only once and then shared
+    between processes.
+
+    Parameters
+    ----------
+    s1_list
+        `(n_segments,2)` np.array of the first points in the line segments of
+        the profile, for the second axis indices `0,1` correspond to `r,z`.
+    s2_list
+        second points, same format as `s1_list`.
+    max_error
+        maximum absolute error on the distance, in mm.
+    margin
+        fraction of the largest extent of the profile by which the
+        tabulated region is enlarged on each side.
+    max_depth
+        maximum number of subdivisions of the tabulated region.
+
+    Note
+    ----
+    The segments must form the full profile of a solid (as returned by
+    :meth:`.HPGe.get_profile`). The tabulated sign is given by the position
+    of the point relative to the polygon closed along the symmetry axis, it
+    can differ from that of :func:`.utils.nearest_segment_distance` only for
+    points at the same distance from different segments.
+    """
+
+    def __init__(
+        self,
+        s1_list: ArrayLike,
+        s2_list: ArrayLike,
+        max_error: float = 1e-3,
+        margin: float = 0.1,
+        max_depth: int = 40,
+    ) -> None:
+        if max_error <= 0:
+            msg = "max_error must be positive"
+            raise ValueError(msg)
+
+        self.s1 = np.ascontiguousarray(s1_list, dtype=np.float64)
+        self.s2 = np.ascontiguousarray(s2_list, dtype=np.float64)
+
+        if len(self.s1) == 0 or np.any(np.all(self.s1 == self.s2, axis=1)):
+            msg = (
+                "the profile must contain at least one segment, and none of zero length"
+            )
+            raise ValueError(msg)
+
+        lo, hi = utils._segments_bounds(self.s1, self.s2, margin)
+        self.origin = lo
+        self.size = hi - lo
+
+        # protect the candidate selection against rounding errors
+        pad = 1e-9 * max(self.size)
+
+        self.children, self.values, self.error_bound = _build_tree(
+            self.s1, self.s2, self.origin, self.size, max_error, pad, max_depth
+        )
+        self.max_error = max_error
+
+        if self.error_bound > max_error:
+            msg = (
+                f"maximum depth reached, the interpolation error is only guaranteed "
+                f"to be below {self.error_bound} mm"
+            )
+            log.warning(msg)
+
+        msg = f"built distance table with {len(self.children)} nodes"
+        log.debug(msg)
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(max_error={self.max_error}, "
+            f"n_nodes={len(self.children)})"
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the table, in bytes."""
+        return self.children.nbytes + self.values.nbytes
+
+    def evaluate(
+        self, points: NDArray, signed: bool = True, tol: float = 1e-11
+    ) -> NDArray:
+        """Distance of each point to the profile.
+
+        Parameters
+        ----------
+        points
+            `(n_points,2)` array of points, first axis corresponds to the
+            point index and the second to `(r,z)`.
+        signed
+            boolean flag to attach a sign to the distance (positive if inside).
+        tol
+            points within this distance to the surface are pushed inside, the
+            distance of these points is `tol` (as in
+            :func:`.utils.nearest_segment_distance`).
+        """
+        points = np.asarray(points)
+        return self.evaluate_rz(points[:, 0], points[:, 1], signed=signed, tol=tol)
+
+    def evaluate_rz(
+        self, r: NDArray, z: NDArray, signed: bool = True, tol: float = 1e-11
+    ) -> NDArray:
+        """Distance of each point to the profile, from separate coordinate arrays.
+
+        Parameters
+        ----------
+        r
+            `(n_points,)` array of radial coordinates.
+        z
+            `(n_points,)` array of vertical coordinates.
+        signed, tol
+            see :meth:`evaluate`.
+        """
+        dists = np.empty(len(r), dtype=np.result_type(r, z, np.float32))
+        found = np.empty(len(r), dtype=np.bool_)
+        _evaluate_tree(
+            r, z, self.origin, self.size, self.children, self.values, dists, found
+        )
+        dists[found & (np.abs(dists) < tol)] = tol
+
+        if not np.all(found):
+            dists[~found], _ = utils._dispatch(utils._nearest_segment_distance)(
+                self.s1, self.s2, r[~found], z[~found], tol, True
+            )
+
+        return dists if signed else np.abs(dists)
+
+    def matches(self, s1_list: ArrayLike, s2_list: ArrayLike) -> bool:
+        """Check if the table was built for the given segments."""
+        return np.array_equal(self.s1, s1_list) and np.array_equal(self.s2, s2_list)
+
+    def save(self, filename: str | Path) -> None:
+        """Write the table to a ``.npz`` file."""
+        np.savez(
+            filename,
+            s1=self.s1,
+            s2=self.s2,
+            origin=self.origin,
+            size=self.size,
+            children=self.children,
+            values=self.values,
+            max_error=self.max_error,
+            error_bound=self.error_bound,
+        )
+
+    @classmethod
+    def load(cls, filename: str | Path) -> DistanceTable:
+        """Read a table written with :meth:`save`."""
+        table = cls.__new__(cls)
+
+        with np.load(filename) as data:
+            table.s1 = data["s1"]
+            table.s2 = data["s2"]
+            table.origin = data["origin"]
+            table.size = data["size"]
+            table.children = data["children"]
+            table.values = data["values"]
+            table.max_error = float(data["max_error"])
+            table.error_bound = float(data["error_bound"])
+
+        return table
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-from itertools import pairwise
+from typing import TYPE_CHECKING
 
 import matplotlib.pyplot as plt
 import numpy as np
-from pyg4ometry.visualisation import VtkViewer
 
-from .base import HPGe
+if TYPE_CHECKING:
+    from pyg4ometry.visualisation import VtkViewer
+
+    from .base import HPGe
 
 
 def plot_profile(
@@ -27,7 +29,8 @@ def plot_profile(
 
     """
     # data
-    r, z = hpge.get_profile()
+    profile = hpge.get_profile_segments()
+    r, z = profile.r, profile.z
 
     # set options
     colors = plt.rcParams["axes.prop_cycle"].by_key()["color"]
@@ -51,16 +54,16 @@ def plot_profile(
     default_kwargs |= kwargs
 
     if not split_by_type:
-        x = r + [-x for x in reversed(r)]
-        y = z + list(reversed(z))
+        x = np.concatenate((r, -r[::-1]))
+        y = np.concatenate((z, z[::-1]))
 
         axes.plot(x, y, **default_kwargs)
     else:
         surfaces = np.array(hpge.surfaces)
         unique_surfaces = np.unique(surfaces)
 
-        dr = np.array([np.array([r1, r2]) for r1, r2 in pairwise(r)])
-        dz = np.array([np.array([z1, z2]) for z1, z2 in pairwise(z)])
+        dr = np.column_stack((profile.s1[:, 0], profile.s2[:, 0]))
+        dz = np.column_stack((profile.s1[:, 1], profile.s2[:, 1]))
 
         for idx, u in enumerate(unique_surfaces):
             drs_tmp = dr[surfaces == u]
@@ -89,6 +92,9 @@ def visualize(hpge: HPGe, viewer: VtkViewer = None) -> VtkViewer:
     viewer
         pre-existing VTK viewer.
     """
+    # VTK is slow to import and only needed here
+    from pyg4ometry.visualisation import VtkViewer  # noqa: PLC0415
+
     if viewer is None:
         viewer = VtkViewer()
     viewer.addLogicalVolume(hpge)
@@ -0,0 +1,237 @@
+"""Opt-in instrumentation of the hot paths.
+
+Within :func:`instrument`, the calls of :func:`.make_hpge`,
+:meth:`.HPGe.distance_to_surface` and :meth:`.HPGe.is_inside` and of the
+steps they are made of (coordinate conversion and the numba kernels) are
+timed, and the points processed, the segments evaluated and pruned by the
+distance kernels, the memory allocated and the numba compilations are
+counted. Outside of it the only cost is a check of a global variable.
+
+Examples
+--------
+>>> with instrument(log_level=logging.INFO) as stats:
+...     hpge.distance_to_surface(coords)
+>>> stats["distance_kernel"]["segments_pruned"]
+"""
+
+from __future__ import annotations
+
+import contextlib
+import functools
+import logging
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from typing import Self
+
+from numba.core import event
+
+log = logging.getLogger(__name__)
+
+# the statistics being recorded by instrument, None if disabled
+_stats: dict[str, dict] | None = None
+_trace_memory = False
+_lock = threading.Lock()
+
+# traced memory at the start and peak so far of the nested sections
+_memory_stack: list[list[int]] = []
+
+_NULL_SECTION = contextlib.nullcontext()
+
+
+def enabled() -> bool:
+    """Whether statistics are being recorded, see :func:`instrument`."""
+    return _stats is not None
+
+
+@contextlib.contextmanager
+def instrument(
+    trace_memory: bool = False, log_level: int | None = None
+) -> Iterator[dict]:
+    """Record statistics of the hot paths within a ``with`` block.
+
+    Parameters
+    ----------
+    trace_memory
+        also record the peak memory allocated by each section with
+        :mod:`tracemalloc`, which slows down the allocations. Only reliable
+        if the sections are not run concurrently from several threads.
+    log_level
+        if not ``None``, log the statistics with :func:`format_stats` at this
+        level at the end of the block.
+
+    Yields
+    ------
+        dictionary filled at the end of each section with a dictionary of
+        counters, by section name:
+
+        - ``calls``, ``time_s``: number of calls and total wall time,
+        - ``points``: number of points processed (kernels and conversions),
+        - ``segments_evaluated``, ``segments_pruned``: number of
+          point-segment distances computed, and skipped by the segment grid
+          or the pruning of the ``optimised`` kernel (distance kernels),
+        - ``peak_memory_bytes``: largest memory allocated by a call, with
+          `trace_memory`,
+
+        and the ``numba_compile`` entry with the number (``calls``) and
+        total time of the numba compilations, and the number of compilations
+        of each function (``functions``).
+    """
+    global _stats, _trace_memory
+
+    if _stats is not None:
+        msg = "instrumentation is already enabled"
+        raise RuntimeError(msg)
+
+    stats: dict[str, dict] = {}
+    listener = _CompileListener(stats)
+
+    tracing = trace_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+
+    _stats, _trace_memory = stats, trace_memory
+    try:
+        with event.install_listener("numba:compile", listener):
+            yield stats
+    finally:
+        _stats, _trace_memory = None, False
+        _memory_stack.clear()
+        if tracing:
+            tracemalloc.stop()
+
+    if log_level is not None:
+        log.log(log_level, format_stats(stats))
+
+
+def format_stats(stats: dict) -> str:
+    """Format the statistics recorded by :func:`instrument`, one section per line."""
+    lines = ["instrumentation statistics:"]
+    for name, counters in sorted(stats.items()):
+        values = ", ".join(
+            f"{key}={value:.4g}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in counters.items()
+            if key != "functions"
+        )
+        lines.append(f"  {name}: {values}")
+    return "\n".join(lines)
+
+
+def section(name: str, n_points: int = 0) -> contextlib.AbstractContextManager:
+    """Context manager timing a section of code, if enabled.
+
+    Parameters
+    ----------
+    name
+        name of the section in the statistics.
+    n_points
+        number of points processed by the section.
+    """
+    if _stats is None:
+        return _NULL_SECTION
+    return _Section(_stats, name, n_points)
+
+
+def count(name: str, **counters: int) -> None:
+    """Add to the counters of a section, if enabled."""
+    if _stats is None:
+        return
+    with _lock:
+        entry = _entry(_stats, name)
+        for key, value in counters.items():
+            entry[key] = entry.get(key, 0) + int(value)
+
+
+def instrumented(name: str) -> Callable[[Callable], Callable]:
+    """Decorator timing each call of a function as the section `name`."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _stats is None:
+                return func(*args, **kwargs)
+            with _Section(_stats, name, 0):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _entry(stats: dict[str, dict], name: str) -> dict:
+    if name not in stats:
+        stats[name] = {"calls": 0, "time_s": 0.0}
+    return stats[name]
+
+
+class _Section:
+    __slots__ = ("n_points", "name", "start", "stats")
+
+    def __init__(self, stats: dict[str, dict], name: str, n_points: int) -> None:
+        self.stats = stats
+        self.name = name
+        self.n_points = n_points
+
+    def __enter__(self) -> Self:
+        if _trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if _memory_stack:
+                _memory_stack[-1][1] = max(_memory_stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            _memory_stack.append([current, current])
+
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.start
+
+        peak = None
+        if _trace_memory and _memory_stack:
+            start, running = _memory_stack.pop()
+            peak = max(tracemalloc.get_traced_memory()[1], running)
+            if _memory_stack:
+                _memory_stack[-1][1] = max(_memory_stack[-1][1], peak)
+            peak -= start
+
+        with _lock:
+            entry = _entry(self.stats, self.name)
+            entry["calls"] += 1
+            entry["time_s"] += elapsed
+            if self.n_points:
+                entry["points"] = entry.get("points", 0) + self.n_points
+            if peak is not None:
+                entry["peak_memory_bytes"] = max(
+                    entry.get("peak_memory_bytes", 0), peak
+                )
+
+
+class _CompileListener(event.Listener):
+    """Count the numba compilations, the callees are compiled within their callers."""
+
+    def __init__(self, stats: dict) -> None:
+        self.stats = stats
+        self.depth = 0
+        self.start = 0.0
+
+    def on_start(self, _ev: event.Event) -> None:
+        if self.depth == 0:
+            self.start = time.perf_counter()
+        self.depth += 1
+
+    def on_end(self, ev: event.Event) -> None:
+        self.depth -= 1
+        name = ev.data["dispatcher"].py_func.__qualname__
+
+        with _lock:
+            entry = _entry(self.stats, "numba_compile")
+            functions = entry.setdefault("functions", {})
+            functions[name] = functions.get(name, 0) + 1
+
+            if self.depth == 0:
+                entry["calls"] += 1
+                entry["time_s"] += time.perf_counter() - self.start
+
+        msg = f"compiled {name} for {ev.data['args']}"
+        log.debug(msg)
@@ -3,7 +3,7 @@ from __future__ import annotations
 from dbetto import AttrsDict
 from pyg4ometry import geant4
 
-from . import utils
+from . import instrumentation, utils
 from .bege import BEGe
 from .invcoax import InvertedCoax
 from .materials import make_enriched_germanium
@@ -16,6 +16,7 @@ from .v06649 import V06649
 from .v07646a import V07646A
 
 
+@instrumentation.instrumented("make_hpge")
 def make_hpge(
     metadata: str | dict | AttrsDict,
     registry: geant4.Registry | None,
@@ -0,0 +1,640 @@
+"""Inward offset of the detector profile, for dead layer volumes and cuts.
+
+The region of the :math:`(r, z)` profile farther than given distances from
+some of its edges (the surfaces with a dead layer) is bounded by the other
+edges, by the edges offset inward, which meet at a mitre at the convex
+corners, and by arcs around the vertices where the offset edges do not meet.
+As long as the offset edges do not vanish or cross each other, the position
+of each point of this boundary scales linearly with the distances, and the
+volume of the solid of revolution of the region follows exactly from Green's
+theorem, :math:`V = \\pi \\oint r^2 \\, dz`, which is the frustum formula of
+:attr:`.HPGe.volume` on the straight parts.
+
+Points are classified against the region by :class:`ActiveRegion` in
+logarithmic time, with a binary search of the horizontal band and then of the
+interval of :math:`r` containing them.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import NamedTuple
+
+import numba
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+from . import sampling, utils
+
+
+class OffsetProfile(NamedTuple):
+    """Boundary of the inward offset of a profile, see :func:`offset_profile`.
+
+    The boundary is described for each vertex of the closed and
+    counter-clockwise profile, with the offset distances multiplied by a
+    factor `scale`: it comes from the previous vertex in a straight line to
+    the point ``vertices + scale * start``, follows an arc of radius
+    ``scale * radii`` centred on the vertex from the polar angle
+    ``angles[:, 0]`` to ``angles[:, 1]`` (clockwise, empty if the radius is
+    zero) to the point ``vertices + scale * end`` and then continues in a
+    straight line to the next vertex.
+    """
+
+    vertices: NDArray
+    """`(n_vertices,2)` array of the `(r, z)` coordinates of the vertices."""
+    start: NDArray
+    """`(n_vertices,2)` array of the displacements of the boundary at each
+    vertex."""
+    end: NDArray
+    """same as `start`, at the end of the arcs."""
+    radii: NDArray
+    """radius of the arc around each vertex."""
+    angles: NDArray
+    """`(n_vertices,2)` array of the polar angles of the ends of the arcs."""
+    directions: NDArray
+    """`(n_vertices,2)` array of the unit direction of the edge from each
+    vertex to the next one."""
+    lengths: NDArray
+    """length of the edge from each vertex to the next one."""
+    distances: NDArray
+    """offset distance of the edge from each vertex to the next one."""
+
+
+def offset_profile(r: ArrayLike, z: ArrayLike, distances: ArrayLike) -> OffsetProfile:
+    """Build the inward offset of a polygon.
+
+    Parameters
+    ----------
+    r, z
+        coordinates of the vertices of the polygon, in the half plane
+        :math:`r \\geq 0`. The last vertex is joined to the first one.
+    distances
+        offset distance of each edge, from vertex `i` to `i+1` (the last one
+        closing the polygon), zero for the edges which are not offset.
+    """
+    vertices = np.column_stack(
+        (np.asarray(r, dtype=np.float64), np.asarray(z, dtype=np.float64))
+    )
+    distances = np.asarray(distances, dtype=np.float64)
+
+    # drop the zero-length edges, the previous edge then ends at the next vertex
+    keep = np.any(np.roll(vertices, -1, axis=0) != vertices, axis=1)
+    vertices, distances = vertices[keep], distances[keep]
+
+    # orient the polygon counter-clockwise, its interior is then on the left
+    area = np.sum(vertices[:, 0] * np.roll(vertices[:, 1], -1)) - np.sum(
+        np.roll(vertices[:, 0], -1) * vertices[:, 1]
+    )
+    if area < 0:
+        vertices = vertices[::-1].copy()
+        distances = np.roll(distances[::-1], -1)
+
+    edges = np.roll(vertices, -1, axis=0) - vertices
+    lengths = np.hypot(edges[:, 0], edges[:, 1])
+    directions = edges / lengths[:, np.newaxis]
+    normals = np.column_stack((-directions[:, 1], directions[:, 0]))
+
+    n = len(vertices)
+    start = np.zeros((n, 2))
+    end = np.zeros((n, 2))
+    radii = np.zeros(n)
+    angles = np.zeros((n, 2))
+
+    for i in range(n):
+        t_a, t_b = directions[i - 1], directions[i]
+        d_a, d_b = distances[i - 1], distances[i]
+        if d_a == 0 and d_b == 0:
+            continue
+
+        # the offset edges, relative to the vertex
+        p_a, p_b = d_a * normals[i - 1], d_b * normals[i]
+
+        # they meet at a mitre if they cross before reaching the vertex
+        cross = t_a[0] * t_b[1] - t_a[1] * t_b[0]
+        eps = 1e-12 * (d_a + d_b)
+        if abs(cross) > 1e-12:
+            diff = p_b - p_a
+            mitre = p_a + (diff[0] * t_b[1] - diff[1] * t_b[0]) / cross * t_a
+            if mitre @ t_a <= eps and mitre @ t_b >= -eps:
+                start[i] = end[i] = mitre
+                continue
+        elif t_a @ t_b > 0 and d_a == d_b:
+            start[i] = end[i] = p_a
+            continue
+
+        # else they are joined by an arc around the vertex, which is within
+        # the larger distance of both edges
+        radii[i] = max(d_a, d_b)
+        start[i] = p_a - math.sqrt(radii[i] ** 2 - d_a**2) * t_a
+        end[i] = p_b + math.sqrt(radii[i] ** 2 - d_b**2) * t_b
+
+        angles[i, 0] = math.atan2(start[i, 1], start[i, 0])
+        sweep = (angles[i, 0] - math.atan2(end[i, 1], end[i, 0])) % (2 * math.pi)
+        angles[i, 1] = angles[i, 0] - sweep
+
+    return OffsetProfile(
+        vertices, start, end, radii, angles, directions, lengths, distances
+    )
+
+
+def max_offset(profile: OffsetProfile) -> float:
+    """Largest scale of the distances before a straight part of the boundary vanishes.
+
+    Beyond it, the boundary described by `profile` is not that of the offset
+    region anymore. The parts of the boundary can also cross each other
+    before, see :func:`is_valid_offset`.
+    """
+    # projection of the straight parts on their edge, linear in the scale
+    shrink = np.sum(
+        (np.roll(profile.start, -1, axis=0) - profile.end) * profile.directions,
+        axis=1,
+    )
+    with np.errstate(divide="ignore"):
+        limits = np.where(shrink < 0, profile.lengths / -shrink, np.inf)
+    return float(np.min(limits, initial=np.inf))
+
+
+def offset_volume(profile: OffsetProfile, scale: ArrayLike = 1.0) -> NDArray:
+    """Volume of the solid of revolution of the offset region.
+
+    Parameters
+    ----------
+    profile
+        boundary of the offset region, from :func:`offset_profile`.
+    scale
+        factors of the offset distances, smaller than :func:`max_offset`.
+
+    Returns
+    -------
+        the volume for each factor, in the units of the profile cubed, with
+        the shape of `scale`.
+    """
+    scale = np.asarray(scale, dtype=np.float64)
+    factor = scale.reshape(-1, 1, 1)
+
+    first = profile.vertices + factor * profile.start
+    last = profile.vertices + factor * profile.end
+
+    # straight parts, from the end of each arc to the start of the next one
+    r1, z1 = last[..., 0], last[..., 1]
+    r2, z2 = np.roll(first, -1, axis=1)[..., 0], np.roll(first, -1, axis=1)[..., 1]
+    integral = np.sum((z2 - z1) * (r1 * r1 + r1 * r2 + r2 * r2) / 3, axis=1)
+
+    # arcs, r = c + rho cos(theta) and z = z_c + rho sin(theta)
+    def primitive(theta):
+        c = profile.vertices[:, 0]
+        rho = factor[..., 0] * profile.radii
+        sin = np.sin(theta)
+        return rho * (
+            c * c * sin
+            + c * rho * (theta + sin * np.cos(theta))
+            + rho * rho * (sin - sin**3 / 3)
+        )
+
+    arcs = profile.radii > 0
+    if np.any(arcs):
+        integral += np.sum(
+            (primitive(profile.angles[:, 1]) - primitive(profile.angles[:, 0]))[
+                :, arcs
+            ],
+            axis=1,
+        )
+
+    return (math.pi * integral).reshape(scale.shape)
+
+
+# Gauss-Legendre quadrature of the cross-sections, exact for polynomials of
+# degree 31 between the break points where they are not smooth
+_GAUSS_NODES, _GAUSS_WEIGHTS = np.polynomial.legendre.leggauss(16)
+
+
+def cut_offset_volume(
+    profile: OffsetProfile,
+    normal: NDArray,
+    offset: float,
+    distance: float = 0.0,
+    scale: ArrayLike = 1.0,
+) -> NDArray:
+    r"""Volume of the solid of revolution of the offset region with a cut.
+
+    The half-space :math:`n \cdot x > o - s d` is removed from the solid,
+    with the `normal` :math:`n`, `offset` :math:`o`, `distance` :math:`d` and
+    factor `scale` :math:`s` of the offset distances. The volume is the
+    integral over :math:`z` of the area of the horizontal cross-sections,
+    unions of annuli clipped by a straight line, computed with Gauss-Legendre
+    quadrature between the heights where the area is not smooth: the ends
+    of the parts of the boundary, the extremes of the arcs and where the
+    line is tangent to the circles of the boundary.
+
+    Parameters
+    ----------
+    profile
+        boundary of the offset region, from :func:`offset_profile`.
+    normal
+        unit normal of the plane of the cut, in `(x, y, z)`.
+    offset
+        offset of the plane of the cut along `normal`.
+    distance
+        offset distance of the face of the cut.
+    scale
+        factors of the offset distances, smaller than :func:`max_offset`.
+
+    Returns
+    -------
+        the volume for each factor, in the units of the profile cubed, with
+        the shape of `scale`.
+    """
+    scale = np.asarray(scale, dtype=np.float64)
+    flat = scale.ravel()
+    volumes = np.empty(len(flat))
+
+    # the kept half-space is u.(x, y) <= alpha - beta z, with u the unit
+    # projection of the normal on the horizontal plane
+    horizontal = math.hypot(normal[0], normal[1])
+
+    for k, factor in enumerate(flat):
+        plane = offset - factor * distance
+        first = profile.vertices + factor * profile.start
+        last = profile.vertices + factor * profile.end
+        following = np.roll(first, -1, axis=0)
+
+        arcs = factor * profile.radii > 0
+        centers = profile.vertices[arcs]
+        rho = factor * profile.radii[arcs]
+
+        breaks = [first[:, 1], last[:, 1], centers[:, 1] - rho, centers[:, 1] + rho]
+        if horizontal > 0:
+            alpha, beta = plane / horizontal, normal[2] / horizontal
+            for sign in (1, -1):
+                # the straight parts, r = r1 + m (z - z1)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    slope = (following[:, 0] - last[:, 0]) / (
+                        following[:, 1] - last[:, 1]
+                    )
+                    breaks.append(
+                        (alpha - sign * (last[:, 0] - slope * last[:, 1]))
+                        / (beta + sign * slope)
+                    )
+
+                # the arcs, (r - c)^2 + (z - z_c)^2 = rho^2
+                shift = alpha - beta * centers[:, 1] - sign * centers[:, 0]
+                a, b, c = 1 + beta**2, -2 * shift * beta, shift**2 - rho**2
+                root = np.sqrt(np.maximum(b**2 - 4 * a * c, 0))
+                breaks += [
+                    centers[:, 1] + (-b - root) / (2 * a),
+                    centers[:, 1] + (-b + root) / (2 * a),
+                ]
+        elif normal[2] != 0:
+            breaks.append(np.array([plane / normal[2]]))
+
+        z_min, z_max = np.min(breaks[0]), np.max(breaks[0])
+        if len(rho) > 0:
+            z_min = min(z_min, np.min(breaks[2]))
+            z_max = max(z_max, np.max(breaks[3]))
+
+        levels = np.concatenate(breaks)
+        levels = np.unique(np.clip(levels[np.isfinite(levels)], z_min, z_max))
+
+        half = np.diff(levels)[:, np.newaxis] / 2
+        middle = levels[:-1, np.newaxis] + half
+        z = (middle + half * _GAUSS_NODES).ravel()
+        weights = (half * _GAUSS_WEIGHTS).ravel()
+
+        inner, outer = _cross_sections(profile, factor, z)
+
+        if horizontal > 0:
+            line = (alpha - beta * z)[:, np.newaxis]
+            areas = _clipped_disc_area(outer, line) - _clipped_disc_area(inner, line)
+        else:
+            kept = normal[2] * z <= plane
+            areas = np.where(kept[:, np.newaxis], math.pi * (outer**2 - inner**2), 0)
+
+        volumes[k] = np.sum(weights * np.nansum(areas, axis=1))
+
+    return volumes.reshape(scale.shape)
+
+
+def _cross_sections(
+    profile: OffsetProfile, factor: float, z: NDArray
+) -> tuple[NDArray, NDArray]:
+    """Radii of the intervals of the offset region at heights `z`.
+
+    Returns
+    -------
+        `(len(z), n)` arrays of the inner and outer radius of each interval,
+        padded with ``NaN``. The heights must not be those of the ends of
+        the parts of the boundary.
+    """
+    first = profile.vertices + factor * profile.start
+    last = profile.vertices + factor * profile.end
+    following = np.roll(first, -1, axis=0)
+    height = z[:, np.newaxis]
+
+    # straight parts, from the end of each arc to the start of the next one
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (height - last[:, 1]) / (following[:, 1] - last[:, 1])
+    crossings = [
+        np.where(
+            (height - last[:, 1]) * (height - following[:, 1]) < 0,
+            last[:, 0] + t * (following[:, 0] - last[:, 0]),
+            np.nan,
+        )
+    ]
+
+    # arcs, clockwise from angles[:, 0] to angles[:, 1]
+    arcs = factor * profile.radii > 0
+    centers = profile.vertices[arcs]
+    rho = factor * profile.radii[arcs]
+    start, stop = profile.angles[arcs, 0], profile.angles[arcs, 1]
+
+    sin = (height - centers[:, 1]) / rho
+    within = np.abs(sin) < 1
+    theta = np.arcsin(np.where(within, sin, 0))
+    for angle in (theta, math.pi - theta):
+        on_arc = within & ((start - angle) % (2 * math.pi) < start - stop)
+        crossings.append(np.where(on_arc, centers[:, 0] + rho * np.cos(angle), np.nan))
+
+    radii = np.sort(np.concatenate(crossings, axis=1), axis=1)
+    n = radii.shape[1] // 2
+    return radii[:, 0 : 2 * n : 2], radii[:, 1 : 2 * n : 2]
+
+
+def _clipped_disc_area(radius: NDArray, line: NDArray) -> NDArray:
+    """Area of the discs of `radius` within the half-plane ``x <= line``."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.clip(line / radius, -1, 1)
+    area = radius**2 * np.arccos(-ratio) + line * np.sqrt(
+        np.maximum(radius**2 - line**2, 0)
+    )
+    return np.where(radius > 0, area, 0)
+
+
+def boundary_points(profile: OffsetProfile, scale: ArrayLike = 1.0) -> NDArray:
+    """Points on the boundary of the offset region, to check its validity.
+
+    Returns
+    -------
+        `(len(scale), n_points, 2)` array with, for each vertex, the ends and
+        the middle of its arc and the middle of the following straight part.
+    """
+    factor = np.asarray(scale, dtype=np.float64).reshape(-1, 1, 1)
+
+    middle = np.mean(profile.angles, axis=1)
+    arc = profile.radii[:, np.newaxis] * np.column_stack(
+        (np.cos(middle), np.sin(middle))
+    )
+    arc = np.where((profile.radii > 0)[:, np.newaxis], arc, profile.start)
+
+    first = profile.vertices + factor * profile.start
+    last = profile.vertices + factor * profile.end
+    straight = (last + np.roll(first, -1, axis=1)) / 2
+
+    return np.concatenate(
+        (first, profile.vertices + factor * arc, last, straight), axis=1
+    )
+
+
+def is_valid_offset(
+    profile: OffsetProfile,
+    s1: NDArray,
+    s2: NDArray,
+    distances: NDArray,
+    scale: ArrayLike = 1.0,
+    tol: float = 1e-9,
+) -> NDArray[np.bool_]:
+    """Check that `profile` describes the offset region.
+
+    The parts of the boundary must not vanish (see :func:`max_offset`), and
+    points along them must be inside the polygon and not closer to the
+    offset edges than their distance, which is not the case if they cross
+    each other.
+
+    Parameters
+    ----------
+    profile
+        boundary of the offset region, from :func:`offset_profile`.
+    s1, s2
+        `(n_segments,2)` arrays of the ends of the edges of the polygon.
+    distances
+        offset distance of each edge.
+    scale
+        factors of the offset distances.
+    tol
+        tolerance on the distances.
+
+    Returns
+    -------
+        whether the offset is valid, for each factor.
+    """
+    scale = np.asarray(scale, dtype=np.float64)
+    flat = scale.ravel()
+    points = boundary_points(profile, flat)
+    shape = points.shape[:2]
+    points = points.reshape(-1, 2)
+
+    inside = utils.is_inside_profile(s1, s2, points, tol=tol).reshape(shape)
+    valid = (flat <= max_offset(profile)) & np.all(inside, axis=1)
+
+    for distance in np.unique(distances[distances > 0]):
+        group = distances == distance
+        dists, _ = utils.nearest_segment_distance(
+            s1[group], s2[group], points, tol=0, signed=False
+        )
+        valid &= np.all(
+            dists.reshape(shape) >= distance * flat[:, np.newaxis] - tol, axis=1
+        )
+
+    return valid.reshape(scale.shape)
+
+
+@numba.njit(cache=True)
+def _point_in_region(
+    point_r,
+    point_z,
+    levels,
+    band_offsets,
+    inner,
+    outer,
+    inner_arc,
+    outer_arc,
+    arc_centers,
+    arc_radii,
+):
+    """Whether a point is inside the region, see :class:`ActiveRegion`."""
+    if not levels[0] <= point_z <= levels[-1]:
+        return False
+
+    # band containing the point, the last one includes its upper bound
+    lo, hi = 0, len(levels) - 2
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if levels[mid] <= point_z:
+            lo = mid
+        else:
+            hi = mid - 1
+    band = lo
+    t = (point_z - levels[band]) / (levels[band + 1] - levels[band])
+
+    # first interval of the band whose outer radius is beyond the point
+    lo, hi = band_offsets[band], band_offsets[band + 1]
+    end = hi
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if outer[mid, 0] + t * (outer[mid, 1] - outer[mid, 0]) < point_r:
+            lo = mid + 1
+        else:
+            hi = mid
+
+    # the chords of the arcs cut the circular segments between them and the
+    # arcs, the edges without arc refer to the last one, of zero radius. The
+    # conditions are combined without branches, which are hard to predict
+    k = min(lo, end - 1)
+    a, b = inner_arc[k], outer_arc[k]
+    dr_a, dz_a = point_r - arc_centers[a, 0], point_z - arc_centers[a, 1]
+    dr_b, dz_b = point_r - arc_centers[b, 0], point_z - arc_centers[b, 1]
+
+    return (
+        (lo < end)
+        & (inner[k, 0] + t * (inner[k, 1] - inner[k, 0]) <= point_r)
+        & (dr_a * dr_a + dz_a * dz_a >= arc_radii[a] ** 2)
+        & (dr_b * dr_b + dz_b * dz_b >= arc_radii[b] ** 2)
+    )
+
+
+@utils._kernel
+def _region_contains(
+    points_r,
+    points_z,
+    levels,
+    band_offsets,
+    inner,
+    outer,
+    inner_arc,
+    outer_arc,
+    arc_centers,
+    arc_radii,
+):
+    inside = np.empty(len(points_r), dtype=np.bool_)
+    for i in numba.prange(len(points_r)):
+        inside[i] = _point_in_region(
+            points_r[i],
+            points_z[i],
+            levels,
+            band_offsets,
+            inner,
+            outer,
+            inner_arc,
+            outer_arc,
+            arc_centers,
+            arc_radii,
+        )
+    return inside
+
+
+class ActiveRegion:
+    """Offset region of a profile, for fast point classification.
+
+    The boundary of the region is approximated by a polygon, whose vertices
+    are those of the straight parts and points along the arcs, in which each
+    point is located in logarithmic time: the horizontal band containing it
+    among those delimited by the vertices is found by a binary search, then
+    the interval of :math:`r` between two edges of the band (see
+    :func:`.sampling.volume_slices`). The polygon only differs from the region
+    by the circular segments between the arcs and their chords, which are
+    excluded exactly by checking the distance of the point to the centre of
+    the arc bounding its interval.
+
+    Parameters
+    ----------
+    profile
+        boundary of the offset region, from :func:`offset_profile`.
+    max_angle
+        largest angle of an arc subtended by a chord, in radians.
+    """
+
+    def __init__(self, profile: OffsetProfile, max_angle: float = math.pi / 2) -> None:
+        self.profile = profile
+
+        # vertices of the polygon and index of the arc of the edge to the next one
+        point_list: list[NDArray] = []
+        arc_list: list[int] = []
+        for i, vertex in enumerate(profile.vertices):
+            if profile.radii[i] > 0:
+                theta0, theta1 = profile.angles[i]
+                n_chords = max(math.ceil((theta0 - theta1) / max_angle), 1)
+                theta = np.linspace(theta0, theta1, n_chords + 1)[1:-1]
+                point_list += [
+                    vertex + profile.start[i],
+                    *(
+                        vertex
+                        + profile.radii[i]
+                        * np.column_stack((np.cos(theta), np.sin(theta)))
+                    ),
+                ]
+                arc_list += [i] * n_chords
+            point_list.append(vertex + profile.end[i])
+            arc_list.append(-1)
+
+        all_points = np.asarray(point_list)
+        all_arcs = np.asarray(arc_list)
+
+        # drop the zero-length edges
+        keep = np.any(np.roll(all_points, -1, axis=0) != all_points, axis=1)
+        points, arcs = all_points[keep], all_arcs[keep]
+
+        slices = sampling.volume_slices(points[:, 0], points[:, 1])
+
+        self.levels = np.unique(points[:, 1])
+        self.band_offsets = np.searchsorted(slices.z[:, 0], self.levels)
+        self.inner = slices.r_inner
+        self.outer = slices.r_outer
+        self.inner_arc = arcs[slices.edges[:, 0]]
+        self.outer_arc = arcs[slices.edges[:, 1]]
+        self.arc_centers = np.vstack((profile.vertices, np.zeros((1, 2))))
+        self.arc_radii = np.append(profile.radii, 0.0)
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(n_bands={len(self.levels) - 1}, "
+            f"n_intervals={len(self.inner)})"
+        )
+
+    @property
+    def volume(self) -> float:
+        """Volume of the solid of revolution of the region, see :func:`offset_volume`."""
+        return float(offset_volume(self.profile))
+
+    def contains(self, points: NDArray) -> NDArray[np.bool_]:
+        """Whether each point is inside the region.
+
+        Parameters
+        ----------
+        points
+            `(n_points,2)` array of points, first axis corresponds to the
+            point index and the second to `(r,z)`.
+        """
+        points = np.asarray(points)
+        return self.contains_rz(points[:, 0], points[:, 1])
+
+    def contains_rz(self, r: NDArray, z: NDArray) -> NDArray[np.bool_]:
+        """Whether each point is inside the region, from separate coordinate arrays.
+
+        Parameters
+        ----------
+        r
+            `(n_points,)` array of radial coordinates.
+        z
+            `(n_points,)` array of vertical coordinates.
+        """
+        return utils._dispatch(_region_contains)(
+            r,
+            z,
+            self.levels,
+            self.band_offsets,
+            self.inner,
+            self.outer,
+            self.inner_arc,
+            self.outer_arc,
+            self.arc_centers,
+            self.arc_radii,
+        )
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import math
 
+import numpy as np
+from numpy.typing import NDArray
 from pint import get_application_registry
 from pyg4ometry import geant4
 
@@ -50,6 +52,11 @@ class P00664B(HPGe):
             self.registry,
         )
 
+    def _cut_plane(self) -> tuple[NDArray, float]:
+        # the box removes everything beyond the cut plane
+        crack = self.metadata.geometry.extra.crack
+        return np.array([1.0, 0.0, 0.0]), crack.radius_in_mm
+
     def _decode_polycone_coord(self):
         c = self.metadata.geometry
 
@@ -0,0 +1,176 @@
+"""Ahead-of-time compilation of the numba kernels.
+
+The kernels are compiled on their first call and cached on disk by
+:mod:`numba`, so that only the first process using a given installation (or
+``NUMBA_CACHE_DIR``) pays for the compilation. :func:`precompile` calls
+every kernel once for each supported floating point type and memory layout,
+to populate the cache before starting short-lived jobs or workers. It can
+also be run from the command line:
+
+.. code-block:: console
+
+    $ pygeomhpges-precompile
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from collections.abc import Iterable
+
+import awkward as ak
+import numpy as np
+from numpy.typing import DTypeLike
+from pyg4ometry import geant4
+
+from . import instrumentation, utils
+from .invcoax import InvertedCoax
+from .segment_table import SegmentTable
+from .v02160a import V02160A
+
+log = logging.getLogger(__name__)
+
+# a detector exercising all the profile features and one with a cut
+_ICPC_GEOMETRY = {
+    "height_in_mm": 60,
+    "radius_in_mm": 35,
+    "borehole": {"radius_in_mm": 5, "depth_in_mm": 25},
+    "groove": {"depth_in_mm": 3, "radius_in_mm": {"outer": 15, "inner": 10}},
+    "pp_contact": {"radius_in_mm": 10, "depth_in_mm": 0},
+    "taper": {
+        "top": {"angle_in_deg": 5, "height_in_mm": 15},
+        "bottom": {"angle_in_deg": 0, "height_in_mm": 0},
+        "borehole": {"angle_in_deg": 0, "height_in_mm": 0},
+    },
+}
+_CRACK = {"radius_in_mm": 8, "angle_in_deg": 40, "width_in_mm": 22.27}
+
+
+def _make_detectors() -> tuple[InvertedCoax, V02160A]:
+    icpc = InvertedCoax(
+        {"name": "icpc", "type": "icpc", "geometry": _ICPC_GEOMETRY},
+        registry=geant4.Registry(),
+    )
+    cut = V02160A(
+        {
+            "name": "cut",
+            "type": "icpc",
+            "geometry": _ICPC_GEOMETRY | {"extra": {"crack": _CRACK}},
+        },
+        registry=geant4.Registry(),
+    )
+    return icpc, cut
+
+
+def precompile(dtypes: Iterable[DTypeLike] = (np.float32, np.float64)) -> None:
+    """Compile the numba kernels and write them to the on-disk cache.
+
+    All the distance and containment queries are run on small inputs, both
+    as `(n,3)` arrays (whose columns are strided) and as separate contiguous
+    coordinate arrays, for each floating point type, with the serial kernels
+    and their parallel variants (see :func:`.utils.set_num_threads`).
+
+    Parameters
+    ----------
+    dtypes
+        floating point types of the calculations to compile.
+
+    Note
+    ----
+    Kernels are compiled again for other array types, e.g. read-only
+    arrays. :func:`.utils.diagonal_segment_distance` is a parallel
+    generalized ufunc, which numba can not cache on disk.
+    """
+    start = time.perf_counter()
+
+    icpc, cut = _make_detectors()
+    table = SegmentTable([icpc, cut])
+
+    rng = np.random.default_rng()
+    coords = rng.uniform([-40, -40, -5], [40, 40, 65], size=(100, 3))
+    det_id = rng.integers(0, 2, size=len(coords))
+
+    # the serial and, with more than one thread available, parallel kernels
+    n_threads = utils.get_num_threads()
+    try:
+        for n in sorted({1, utils._MAX_NUM_THREADS}):
+            utils.set_num_threads(n)
+            for dtype in dtypes:
+                points = coords.astype(dtype)
+
+                # columns of an (n,3) array, and contiguous arrays
+                for x, y, z in (points.T, np.ascontiguousarray(points.T)):
+                    for hpge in (icpc, cut):
+                        hpge.distance_to_surface_xyz(x, y, z, signed=True, dtype=dtype)
+                        hpge.is_inside_xyz(x, y, z)
+
+                    icpc.distance_to_surface_xyz(
+                        x, y, z, dtype=dtype, return_indices=True
+                    )
+                    icpc.distance_to_surface_xyz(
+                        x, y, z, surface_indices=np.array([0]), dtype=dtype
+                    )
+                    icpc.distance_to_surface_rz(np.abs(x), z, dtype=dtype)
+                    table.distance_to_surface(det_id, x, y, z, dtype=dtype)
+
+                icpc.distance_to_surface_types(points, dtype=dtype)
+                for model in utils.RESPONSE_MODELS:
+                    icpc.activeness(points, {"nplus": (1, 0.5)}, model=model)
+                icpc.is_active(points, {"nplus": 1})
+                icpc.is_inside_borehole(points)
+    finally:
+        utils.set_num_threads(n_threads)
+
+    # the per-event sums, for a detector and for packed detectors
+    hits = ak.unflatten(
+        ak.zip(
+            {
+                "xloc": coords[:, 0],
+                "yloc": coords[:, 1],
+                "zloc": coords[:, 2],
+                "edep": np.ones(len(coords)),
+                "det_uid": np.zeros(len(coords), dtype=np.int64),
+            }
+        ),
+        [len(coords) // 2, len(coords) - len(coords) // 2],
+    )
+    for model in utils.RESPONSE_MODELS:
+        icpc.active_energy(hits, {"nplus": (1, 0.5)}, model=model)
+        SegmentTable([icpc]).active_energy(hits, {"nplus": (1, 0.5)}, model=model)
+
+    # the counters of the instrumentation
+    with instrumentation.instrument():
+        icpc.distance_to_surface(coords)
+
+    # the interpolation table works in double precision only
+    icpc.distance_to_surface(coords, max_error=1)
+
+    msg = f"compiled the numba kernels in {time.perf_counter() - start:.1f} s"
+    log.info(msg)
+
+
+def main(args: list[str] | None = None) -> None:
+    """Command line interface of :func:`precompile`."""
+    parser = argparse.ArgumentParser(
+        prog="pygeomhpges-precompile",
+        description="Compile the numba kernels of pygeomhpges and cache them on disk.",
+    )
+    parser.add_argument(
+        "--dtypes",
+        nargs="+",
+        default=["float32", "float64"],
+        choices=["float32", "float64"],
+        help="floating point types to compile the kernels for",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress")
+    parsed = parser.parse_args(args)
+
+    if parsed.verbose:
+        logging.basicConfig(level=logging.INFO)
+
+    precompile(parsed.dtypes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Uniform sampling of points in the volume and on the surface of the detectors.
+
+The solid of revolution of the detector profile is decomposed into slices
+bounded by two planes of constant :math:`z` and by two cones (or cylinders,
+or the axis), the inner and outer surfaces of the solid. The slice of a point
+is drawn with probability proportional to its volume, then its :math:`z` by
+inversion of the cumulative distribution, a cubic polynomial as the area of
+the cross-section is quadratic in :math:`z`, and its :math:`r^2` uniformly
+between the inner and outer radii at this :math:`z`.
+
+On the surface, the segment of the profile of a point is drawn with
+probability proportional to its area, then its position along the segment
+such that the area of the surface up to it is uniform.
+"""
+
+from __future__ import annotations
+
+import itertools
+import math
+from typing import NamedTuple
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+
+class VolumeSlices(NamedTuple):
+    """Slices of a solid of revolution, see :func:`volume_slices`."""
+
+    z: NDArray
+    """`(n_slices,2)` array of the lower and upper `z` of each slice."""
+    r_inner: NDArray
+    """`(n_slices,2)` array of the inner radius at the lower and upper `z`."""
+    r_outer: NDArray
+    """outer radius, same format as `r_inner`."""
+    volumes: NDArray
+    """volume of each slice."""
+    edges: NDArray
+    """`(n_slices,2)` array of the indices of the inner and outer edges, the
+    edge `i` going from vertex `i` to `i+1`."""
+
+
+def volume_slices(r: ArrayLike, z: ArrayLike) -> VolumeSlices:
+    """Decompose the solid of revolution of a polygon into slices.
+
+    The volume between two consecutive `z` of the vertices is the union of
+    hollow conical frusta, whose inner and outer surfaces are the edges of the
+    polygon crossing this interval, which do not intersect.
+
+    Parameters
+    ----------
+    r, z
+        coordinates of the vertices of the polygon, in the half plane
+        :math:`r \\geq 0`. The last vertex is joined to the first one.
+    """
+    r1 = np.asarray(r, dtype=np.float64)
+    z1 = np.asarray(z, dtype=np.float64)
+    r2 = np.roll(r1, -1)
+    z2 = np.roll(z1, -1)
+
+    slices = []
+    for z_lo, z_hi in itertools.pairwise(np.unique(z1)):
+        bounds = np.array([z_lo, (z_lo + z_hi) / 2, z_hi])
+        crossing = np.flatnonzero(
+            (np.minimum(z1, z2) < bounds[1]) & (np.maximum(z1, z2) > bounds[1])
+        )
+
+        # radii of the crossing edges at the bounds and in the middle
+        radii = r1[crossing] + (r2 - r1)[crossing] * (
+            (bounds[:, np.newaxis] - z1[crossing]) / (z2 - z1)[crossing]
+        )
+        order = np.argsort(radii[1])
+        radii, crossing = radii[:, order], crossing[order]
+
+        for k in range(0, len(crossing), 2):
+            inner, outer = radii[:, k], radii[:, k + 1]
+            slices.append(
+                (
+                    z_lo,
+                    z_hi,
+                    inner[0],
+                    inner[2],
+                    outer[0],
+                    outer[2],
+                    *crossing[k : k + 2],
+                )
+            )
+
+    z_lo, z_hi, i_lo, i_hi, o_lo, o_hi, i_edge, o_edge = np.array(slices).T
+
+    volumes = (
+        math.pi
+        * (z_hi - z_lo)
+        / 3
+        * ((o_lo**2 + o_lo * o_hi + o_hi**2) - (i_lo**2 + i_lo * i_hi + i_hi**2))
+    )
+
+    return VolumeSlices(
+        np.column_stack((z_lo, z_hi)),
+        np.column_stack((i_lo, i_hi)),
+        np.column_stack((o_lo, o_hi)),
+        volumes,
+        np.column_stack((i_edge, o_edge)).astype(np.int64),
+    )
+
+
+def sample_slices(
+    slices: VolumeSlices, n: int, rng: np.random.Generator
+) -> tuple[NDArray, NDArray]:
+    """Sample points uniformly in the volume of the slices.
+
+    Parameters
+    ----------
+    slices
+        slices from :func:`volume_slices`.
+    n
+        number of points.
+    rng
+        random number generator.
+
+    Returns
+    -------
+        the `r` and `z` coordinates of the points.
+    """
+    cdf = np.cumsum(slices.volumes)
+    idx = np.searchsorted(cdf, rng.random(n) * cdf[-1], side="right")
+    idx = np.minimum(idx, len(cdf) - 1)
+
+    z_lo, z_hi = slices.z[idx].T
+    i_lo, i_hi = slices.r_inner[idx].T
+    o_lo, o_hi = slices.r_outer[idx].T
+
+    # area of the cross-section at t = (z - z_lo) / (z_hi - z_lo), over pi
+    a = o_lo**2 - i_lo**2
+    b = 2 * (o_lo * (o_hi - o_lo) - i_lo * (i_hi - i_lo))
+    c = (o_hi - o_lo) ** 2 - (i_hi - i_lo) ** 2
+
+    t = _inverse_cubic_cdf(a, b, c, rng.random(n))
+
+    inner = i_lo + t * (i_hi - i_lo)
+    outer = o_lo + t * (o_hi - o_lo)
+    r = np.sqrt(inner**2 + rng.random(n) * (outer**2 - inner**2))
+
+    return r, z_lo + t * (z_hi - z_lo)
+
+
+def _inverse_cubic_cdf(
+    a: NDArray, b: NDArray, c: NDArray, u: NDArray, max_iter: int = 60
+) -> NDArray:
+    """Solve ``F(t) = u`` in ``[0, 1]`` for the density ``a + b t + c t^2``.
+
+    Newton iterations, falling back to bisection when they leave the
+    bracket of the root, on all the equations at once.
+    """
+    target = u * (a + b / 2 + c / 3)
+    lo = np.zeros_like(u)
+    hi = np.ones_like(u)
+    t = u.copy()
+
+    for _ in range(max_iter):
+        f = t * (a + t * (b / 2 + t * c / 3)) - target
+        lo = np.where(f <= 0, t, lo)
+        hi = np.where(f >= 0, t, hi)
+
+        density = a + t * (b + t * c)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = t - f / density
+
+        bisection = (lo + hi) / 2
+        t_next = np.where((newton >= lo) & (newton <= hi), newton, bisection)
+        t_next = np.where(f == 0, t, t_next)
+
+        converged = np.max(np.abs(t_next - t), initial=0) < 1e-12
+        t = t_next
+        if converged:
+            break
+
+    return t
+
+
+def sample_segments(
+    s1: NDArray, s2: NDArray, areas: NDArray, n: int, rng: np.random.Generator
+) -> tuple[NDArray, NDArray]:
+    """Sample points uniformly on the surfaces of revolution of segments.
+
+    The segment of a point is drawn with probability proportional to its
+    area, then its radius so that :math:`r^2` is uniform between the radii of
+    the ends of the segment, as the area of the patch (a cone, an annulus or a
+    cylinder) up to a point is proportional to the difference of their
+    squares.
+
+    Parameters
+    ----------
+    s1, s2
+        `(n_segments,2)` arrays of the `(r, z)` coordinates of the ends of the
+        segments.
+    areas
+        area of the surface of each segment, zero to exclude it.
+    n
+        number of points.
+    rng
+        random number generator.
+
+    Returns
+    -------
+        the `r` and `z` coordinates of the points.
+    """
+    cdf = np.cumsum(areas)
+    idx = np.searchsorted(cdf, rng.random(n) * cdf[-1], side="right")
+    idx = np.minimum(idx, len(cdf) - 1)
+
+    # gather the per-segment quantities needed, to limit the temporaries
+    r1, z1 = s1.T
+    r2, z2 = s2.T
+    r1_i = r1[idx]
+
+    u = rng.random(n)
+    r = np.sqrt(r1_i**2 + u * (r2**2 - r1**2)[idx])
+
+    # position along the segment, without cancellation for cylinders
+    denominator = r + r1_i
+    t = np.divide(u * (r1 + r2)[idx], denominator, out=u, where=denominator > 0)
+
+    return r, z1[idx] + t * (z2 - z1)[idx]
@@ -0,0 +1,405 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable, Mapping, Sequence
+from typing import cast
+
+import awkward as ak
+import numba
+import numpy as np
+from numpy.typing import ArrayLike, DTypeLike, NDArray
+from pyg4ometry import geant4
+
+from . import instrumentation, utils
+from .base import (
+    HPGe,
+    _active_energy,
+    _resolve_tol,
+    _response_model,
+    _response_params,
+)
+
+log = logging.getLogger(__name__)
+
+
+@utils._kernel
+def _packed_distance(
+    rows,
+    x,
+    y,
+    z,
+    offsets,
+    s1_list,
+    s2_list,
+    seg_n,
+    seg_length,
+    has_cut,
+    normals,
+    cut_offsets,
+    tol,
+    signed,
+    dists,
+    indices,
+):
+    """Signed distance of each point to the profile of the detector in its row.
+
+    See :func:`_packed_point_distance`.
+    """
+    for i in numba.prange(len(x)):
+        dists[i], indices[i] = _packed_point_distance(
+            rows[i],
+            x[i],
+            y[i],
+            z[i],
+            offsets,
+            s1_list,
+            s2_list,
+            seg_n,
+            seg_length,
+            has_cut,
+            normals,
+            cut_offsets,
+            tol,
+            signed,
+        )
+
+
+@numba.njit(cache=True)
+def _packed_point_distance(
+    row,
+    x,
+    y,
+    z,
+    offsets,
+    s1_list,
+    s2_list,
+    seg_n,
+    seg_length,
+    has_cut,
+    normals,
+    cut_offsets,
+    tol,
+    signed,
+):
+    """Signed distance of a point to the profile of the detector in row `row`.
+
+    The segments of the detector in row ``k`` are
+    ``s1_list[offsets[k]:offsets[k + 1]]``, the closest one is searched as in
+    :func:`.utils._nearest_of_candidates` and for detectors with a cut the
+    distance is corrected with :func:`.utils._cut_point_distance`.
+    """
+    start = offsets[row]
+    stop = offsets[row + 1]
+    r = np.sqrt(x**2 + y**2)
+
+    dist = np.nan
+    idx = -1
+    best = np.inf
+
+    for j in range(start, stop):
+        d = utils._segment_distance(
+            s1_list[j, 0],
+            s1_list[j, 1],
+            s2_list[j, 0],
+            s2_list[j, 1],
+            seg_n[j, 0],
+            seg_n[j, 1],
+            seg_length[j],
+            r,
+            z,
+            tol,
+            True,
+        )
+        # nan are propagated as in numpy.argmin
+        if np.isnan(d):
+            dist = d
+            idx = j
+            break
+        if abs(d) < best:
+            best = abs(d)
+            dist = d
+            idx = j
+
+    if has_cut[row] and not np.isnan(dist):
+        dist = utils._cut_point_distance(
+            s1_list[start:stop],
+            s2_list[start:stop],
+            seg_n[start:stop],
+            seg_length[start:stop],
+            x,
+            y,
+            z,
+            r,
+            dist,
+            idx - start,
+            normals[row],
+            cut_offsets[row],
+            tol,
+        )
+
+    return (dist if signed else abs(dist)), idx
+
+
+class SegmentTable:
+    """Profiles of many detectors packed in a single table.
+
+    The segments of all profiles are stored contiguously in compressed sparse
+    row format: the segments of the detector in row ``k`` (its position in
+    the sorted array of ids ``ids``) are ``s1[offsets[k]:offsets[k + 1]]``,
+    and similarly for ``s2`` and ``surface_codes`` (see
+    :attr:`.HPGe.surface_type_codes`). Distances for points belonging to
+    different detectors, identified by an integer id, are then computed by a
+    single compiled kernel (parallel with :func:`.utils.set_num_threads`),
+    without looping over the detectors or selecting the points of each of
+    them.
+
+    Parameters
+    ----------
+    detectors
+        mapping of the integer detector ids (e.g. the `rawid`) to the
+        detectors, or sequence of detectors whose ids are their positions.
+
+    Examples
+    --------
+    >>> table = SegmentTable({1104000: hpge_a, 1104001: hpge_b})
+    >>> dists = table.distance_to_surface(det_id, x, y, z)
+    """
+
+    def __init__(self, detectors: Mapping[int, HPGe] | Sequence[HPGe]) -> None:
+        if not isinstance(detectors, Mapping):
+            detectors = dict(enumerate(detectors))
+
+        if len(detectors) == 0:
+            msg = "at least one detector is required"
+            raise ValueError(msg)
+
+        # the row of each detector is its position in the sorted ids
+        self.ids = np.array(sorted(detectors), dtype=np.int64)
+        self.offsets = np.zeros(len(self.ids) + 1, dtype=np.int64)
+
+        # half-spaces removed from the detectors with a cut, see HPGe._cut_plane
+        self.has_cut = np.zeros(len(self.ids), dtype=np.bool_)
+        self.normals = np.zeros((len(self.ids), 3))
+        self.cut_offsets = np.zeros(len(self.ids))
+
+        profiles = []
+
+        for row, det_id in enumerate(self.ids):
+            hpge = detectors[det_id]
+
+            cut = hpge._cut_plane()
+            if cut is None and not isinstance(hpge.solid, geant4.solid.GenericPolycone):
+                msg = f"distance_to_surface is not implemented for {type(hpge.solid)}"
+                raise NotImplementedError(msg)
+
+            if cut is not None:
+                self.has_cut[row] = True
+                self.normals[row], self.cut_offsets[row] = cut
+
+            profiles.append(hpge.get_profile_segments())
+            self.offsets[row + 1] = self.offsets[row] + len(profiles[-1].s1)
+
+        self.s1 = np.concatenate([profile.s1 for profile in profiles])
+        self.s2 = np.concatenate([profile.s2 for profile in profiles])
+        self.surface_codes = np.concatenate(
+            [profile.surface_codes for profile in profiles]
+        )
+
+        self._seg_n = np.concatenate([profile.directions for profile in profiles])
+        self._seg_length = np.concatenate([profile.lengths for profile in profiles])
+
+        msg = f"packed {len(self.s1)} segments of {len(self.ids)} detectors"
+        log.debug(msg)
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(n_detectors={len(self.ids)}, "
+            f"n_segments={len(self.s1)})"
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows(self, det_id: ArrayLike) -> NDArray:
+        """Row of the table of each detector id.
+
+        Raises
+        ------
+        ValueError
+            if an id is not in the table.
+        """
+        det_id = np.asarray(det_id)
+        rows = np.searchsorted(self.ids, det_id)
+
+        found = rows < len(self.ids)
+        found[found] = self.ids[rows[found]] == det_id[found]
+        if not np.all(found):
+            msg = f"unknown detector ids {np.unique(det_id[~found])}"
+            raise ValueError(msg)
+
+        return rows
+
+    def distance_to_surface(
+        self,
+        det_id: ArrayLike,
+        x: ArrayLike,
+        y: ArrayLike,
+        z: ArrayLike,
+        tol: float | None = None,
+        signed: bool = False,
+        dtype: DTypeLike = np.float64,
+        return_indices: bool = False,
+    ) -> NDArray | tuple[NDArray, NDArray]:
+        """Compute the distance of each point to the surface of its detector.
+
+        The result is identical to calling :meth:`.HPGe.distance_to_surface`
+        of the detector of each point.
+
+        Parameters
+        ----------
+        det_id
+            1D array with the id of the detector of each point.
+        x, y, z
+            1D arrays with the coordinates of each point, relative to the
+            origin of its detector.
+        tol, signed, dtype
+            see :meth:`.HPGe.distance_to_surface`.
+        return_indices
+            if ``True``, also return the index of the closest segment for each
+            point in the packed table, the surface type of each point can
+            then be obtained with ``table.surface_codes[indices]``. Not
+            supported for points of detectors with a cut, as for
+            :meth:`.HPGe.distance_to_surface`.
+
+        Returns
+        -------
+            the distances, and the indices of the closest segments if
+            `return_indices` is ``True``.
+        """
+        tol, dtype = _resolve_tol(tol, dtype)
+
+        x = np.asarray(x, dtype=dtype)
+        y = np.asarray(y, dtype=dtype)
+        z = np.asarray(z, dtype=dtype)
+        det_id = np.asarray(det_id)
+
+        if not (x.ndim == 1 and x.shape == y.shape == z.shape == det_id.shape):
+            msg = "det_id, x, y and z must be 1D arrays of the same length."
+            raise ValueError(msg)
+
+        dists = np.empty(len(x), dtype=dtype)
+        indices = np.empty(len(x), dtype=np.int64)
+
+        rows = self.rows(det_id)
+
+        if return_indices and np.any(self.has_cut[rows]):
+            msg = "return_indices is not supported for detectors with a cut"
+            raise NotImplementedError(msg)
+
+        with instrumentation.section("segment_table_kernel", len(x)):
+            utils._dispatch(_packed_distance)(
+                rows,
+                x,
+                y,
+                z,
+                self.offsets,
+                self.s1,
+                self.s2,
+                self._seg_n,
+                self._seg_length,
+                self.has_cut,
+                self.normals,
+                self.cut_offsets,
+                tol,
+                signed,
+                dists,
+                indices,
+            )
+
+        if instrumentation.enabled():
+            instrumentation.count(
+                "segment_table_kernel",
+                segments_evaluated=np.diff(self.offsets)[rows].sum(),
+            )
+
+        if return_indices:
+            return dists, indices
+        return dists
+
+    def active_energy(
+        self,
+        hits: ak.Array,
+        fccd: Mapping[str, float | tuple[float, float]]
+        | Mapping[int, Mapping[str, float | tuple[float, float]]],
+        model: str | Callable[[float, float, float], float] = "step",
+        det_id_field: str = "det_uid",
+        energy_field: str = "edep",
+        tol: float | None = None,
+    ) -> NDArray:
+        """Compute the active energy of each event and detector.
+
+        The active energy is the sum of the energy times the activeness of the
+        hits.
+
+        Same as :meth:`.HPGe.active_energy` of the detector of each hit, for
+        hits in many detectors.
+
+        Parameters
+        ----------
+        hits
+            awkward array with a list of hits for each event, with fields
+            `xloc`, `yloc` and `zloc` (coordinates relative to the detector of
+            the hit), `det_id_field` and `energy_field`.
+        fccd
+            FCCD of the surface types (see :meth:`.HPGe.activeness`) common
+            to all detectors, or mapping of the detector ids to them
+            (detectors without an entry are fully active).
+        model, tol
+            see :meth:`.HPGe.activeness`.
+        det_id_field
+            name of the field with the id of the detector of the hits.
+        energy_field
+            name of the field with the energy of the hits.
+
+        Returns
+        -------
+            ``(n_events, n_detectors)`` array of active energies, in the
+            units of `energy_field`. The columns are the detectors in the
+            order of :attr:`ids`.
+        """
+        model_index, response = _response_model(model)
+        tol, _ = _resolve_tol(tol, np.float64)
+
+        if all(isinstance(key, str) for key in fccd):
+            common = _response_params(
+                cast("Mapping[str, float | tuple[float, float]]", fccd)
+            )
+            params = np.broadcast_to(common, (len(self.ids), *common.shape))
+        else:
+            per_detector = cast(
+                "Mapping[int, Mapping[str, float | tuple[float, float]]]", fccd
+            )
+            params = np.array(
+                [_response_params(per_detector.get(det_id, {})) for det_id in self.ids]
+            )
+
+        event_offsets = utils.event_offsets(hits, energy_field)
+        x, y, z, edep, det_id = utils.flatten_columns(
+            hits, ("xloc", "yloc", "zloc", energy_field, det_id_field)
+        )
+
+        return _active_energy(
+            self.rows(det_id),
+            x,
+            y,
+            z,
+            edep,
+            event_offsets,
+            self.offsets,
+            (self.s1, self.s2, self._seg_n, self._seg_length, self.surface_codes),
+            (self.has_cut, self.normals, self.cut_offsets),
+            params,
+            model_index,
+            response,
+            tol,
+        )
@@ -35,6 +35,11 @@ class SemiCoax(HPGe):
             z += [0]
             surfaces += ["pplus"]
 
+        # the borehole opens at the bottom, close it along the bottom face
+        # and reverse to keep clockwise orientation
+        self.borehole_r = [*r, 0][::-1]
+        self.borehole_z = [*z, 0][::-1]
+
         r += [
             c.groove.radius_in_mm.inner,
             c.groove.radius_in_mm.inner,
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
+import functools
 import json
 import logging
+import types
+from collections.abc import Iterable, Iterator
 from pathlib import Path
+from typing import Any, NamedTuple
 
+import awkward as ak
 import numba
 import numpy as np
 import yaml
-from numpy.typing import NDArray
+from numpy.typing import DTypeLike, NDArray
+
+from . import instrumentation
 
 log = logging.getLogger(__name__)
 __file_extensions__ = {"json": [".json"], "yaml": [".yaml", ".yml"]}
@@ -36,6 +43,240 @@ def load_dict(fname: str | Path, ftype: str | None = None) -> dict:
         raise NotImplementedError(msg)
 
 
+def iterate_chunks(
+    coords: NDArray | str | Path | Iterable[NDArray],
+    chunk_size: int = 1_000_000,
+    dtype: DTypeLike = np.float64,
+) -> Iterator[NDArray]:
+    """Iterate over an array of coordinates in chunks of bounded size.
+
+    Parameters
+    ----------
+    coords
+        array of shape `(n,3)` (for example a :class:`numpy.memmap`), name of
+        a ``.npy`` file which is memory-mapped, or iterable of such arrays
+        (for example produced by a file reader).
+    chunk_size
+        maximum number of points in each chunk. Larger chunks in `coords`
+        are split.
+    dtype
+        floating point type of the chunks.
+
+    Yields
+    ------
+        contiguous arrays of at most `chunk_size` points.
+    """
+    if chunk_size < 1:
+        msg = f"chunk_size must be a positive integer, not {chunk_size}"
+        raise ValueError(msg)
+
+    chunks: Iterable[NDArray]
+    if isinstance(coords, str | Path):
+        chunks = (np.load(coords, mmap_mode="r"),)
+    elif isinstance(coords, np.ndarray):
+        chunks = (coords,)
+    else:
+        chunks = coords
+
+    for chunk in chunks:
+        for start in range(0, len(chunk), chunk_size):
+            yield np.ascontiguousarray(chunk[start : start + chunk_size], dtype=dtype)
+
+
+def flatten_coords(
+    coords: ak.Array, fields: tuple[str, ...] = ("xloc", "yloc", "zloc")
+) -> NDArray:
+    """Flatten a (jagged) awkward array of points into an `(n,3)` array.
+
+    The flat content of each field is read with :func:`flatten_columns`, see
+    :func:`unflatten_like` for the inverse operation.
+
+    Parameters
+    ----------
+    coords
+        awkward array of records with `fields`, of any nesting depth.
+    fields
+        names of the fields with the `x`, `y` and `z` coordinates.
+    """
+    columns = flatten_columns(coords, fields)
+
+    flat = np.empty((len(columns[0]), 3))
+    for i, column in enumerate(columns):
+        flat[:, i] = column
+
+    return flat
+
+
+def flatten_columns(
+    coords: ak.Array, fields: tuple[str, ...] = ("xloc", "yloc", "zloc")
+) -> tuple[NDArray, ...]:
+    """Flat content of the coordinate fields of an awkward array.
+
+    The columns are views of the buffers of `coords` if the points are
+    contiguous in them, as after slicing or masking the outermost dimension.
+    Otherwise (e.g. after a selection of the points inside the lists) the
+    points are copied.
+
+    See :func:`flatten_coords` for the description of the parameters.
+    """
+    missing = [field for field in fields if field not in coords.fields]
+    if missing:
+        msg = f"coords must have the fields {fields}, missing {missing}"
+        raise ValueError(msg)
+
+    with instrumentation.section("convert_coords") as timer:
+        columns = tuple(
+            ak.to_numpy(ak.flatten(coords[field], axis=None)) for field in fields
+        )
+
+        if instrumentation.enabled():
+            timer.n_points = len(columns[0])
+
+    return columns
+
+
+def unflatten_like(
+    values: NDArray, template: ak.Array, field: str = "zloc"
+) -> ak.Array:
+    """Give a flat array the jagged structure of an awkward array.
+
+    Parameters
+    ----------
+    values
+        flat array with one value for each point of `template`.
+    template
+        awkward array, as passed to :func:`flatten_coords`.
+    field
+        field of `template` with the structure to reproduce.
+    """
+    template = ak.to_packed(template[field])
+
+    def _replace_content(layout, **_kwargs):
+        if layout.is_numpy:
+            return ak.contents.NumpyArray(values)
+        return None
+
+    return ak.transform(_replace_content, template)
+
+
+# number of threads used by the distance and containment kernels, see
+# set_num_threads
+_num_threads = 1
+
+# number of threads available to numba, fixed when it is imported
+_MAX_NUM_THREADS: int = numba.config.NUMBA_NUM_THREADS  # type: ignore[attr-defined]
+
+
+def set_num_threads(n: int | None = None) -> None:
+    """Set the number of threads used by the compiled kernels.
+
+    With more than one thread :meth:`.HPGe.distance_to_surface`,
+    :meth:`.HPGe.is_inside` (and the related methods) and
+    :meth:`.SegmentTable.distance_to_surface` split the points between threads
+    with :func:`numba.prange`. The results are identical to the serial ones.
+
+    The serial kernels release the GIL, so they can instead be called
+    concurrently from a user thread pool, for example with chunks of points
+    from :func:`iterate_chunks`. The two should not be combined, as the
+    default `workqueue` threading layer of numba does not support concurrent
+    calls of parallel kernels.
+
+    Parameters
+    ----------
+    n
+        number of threads, ``1`` (the default at import) uses the serial
+        kernels and ``None`` all the threads available to numba
+        (:data:`numba.config.NUMBA_NUM_THREADS`, which can be set with the
+        ``NUMBA_NUM_THREADS`` environment variable).
+    """
+    global _num_threads  # noqa: PLW0603
+
+    if n is None:
+        n = _MAX_NUM_THREADS
+
+    if not 1 <= n <= _MAX_NUM_THREADS:
+        msg = f"the number of threads must be between 1 and {_MAX_NUM_THREADS}, not {n}"
+        raise ValueError(msg)
+
+    _num_threads = int(n)
+
+
+def get_num_threads() -> int:
+    """Number of threads used by the compiled kernels, see :func:`set_num_threads`."""
+    return _num_threads
+
+
+# parallel variants of the kernels, see _kernel and _dispatch
+_PARALLEL_KERNELS: dict = {}
+
+
+def _kernel(function=None, *, cache: bool = True):
+    """Compile a kernel and its parallel variant from the same function.
+
+    The loop over the points of `function` must use :func:`numba.prange`,
+    which is the same as :func:`range` in the serial kernel. Both kernels
+    release the GIL. The serial kernel is returned, its parallel variant is
+    registered for :func:`_dispatch`.
+
+    Parameters
+    ----------
+    function
+        Python function to compile.
+    cache
+        whether to cache the compiled kernels on disk (not possible for the
+        kernels taking a user function as argument).
+    """
+    if function is None:
+        return functools.partial(_kernel, cache=cache)
+
+    # a distinct function object, so that the two kernels are cached
+    # separately
+    parallel = types.FunctionType(
+        function.__code__,
+        function.__globals__,
+        f"{function.__name__}_parallel",
+        function.__defaults__,
+        function.__closure__,
+    )
+    parallel.__qualname__ = f"{function.__qualname__}_parallel"
+
+    kernel = numba.njit(cache=cache, nogil=True)(function)
+    _PARALLEL_KERNELS[kernel] = numba.njit(cache=cache, nogil=True, parallel=True)(
+        parallel
+    )
+
+    return kernel
+
+
+def _dispatch(kernel):
+    """The serial `kernel`, or its parallel variant with more than one thread."""
+    if _num_threads == 1:
+        return kernel
+
+    # the number of threads of numba is local to the calling thread
+    numba.set_num_threads(_num_threads)
+    return _PARALLEL_KERNELS[kernel]
+
+
+def radius(x: NDArray, y: NDArray) -> NDArray:
+    """Compute the radial coordinate from separate `x` and `y` arrays.
+
+    Same as the first column of :func:`convert_coords`, without packing the
+    coordinates in a 2D array. The result has the floating point precision
+    of the inputs (``float32`` inputs give a ``float32`` result).
+    """
+    with instrumentation.section("convert_coords", len(x)):
+        r = np.empty(len(x), dtype=np.result_type(x, y, np.float32))
+        _dispatch(_fill_radius)(x, y, r)
+    return r
+
+
+@_kernel
+def _fill_radius(x, y, r):
+    for i in numba.prange(len(x)):
+        r[i] = np.sqrt(x[i] ** 2 + y[i] ** 2)
+
+
 @numba.njit(cache=True)
 def convert_coords(coords: NDArray) -> NDArray:
     """Converts (x,y,z) coordinates into (r,z)
@@ -190,18 +431,37 @@ def shortest_grid_distance(points, s1, s2, axis, signed=True, sign_factor=1):
     return dist_vec, sign_vec_norm
 
 
-@numba.guvectorize(
-    [
-        "void(float32[:], float32[:], float32[:, :], float32, boolean, float32[:], float32[:])",
-        "void(float64[:], float64[:], float64[:, :], float64, boolean, float64[:], float64[:])",
-    ],
-    "(d),(d),(n,d),(),()->(n),(n)",
-    nopython=True,
-    target="parallel",
-)
-def diagonal_segment_distance(s1, s2, points, tol, signed, dist_result, sign_result):
+def __getattr__(name: str) -> Any:
+    # compiling the parallel gufunc diagonal_segment_distance takes about a
+    # second and can not be cached on disk, so do it on first access
+    if name == "diagonal_segment_distance":
+        gufunc = _diagonal_segment_distance_gufunc()
+        globals()[name] = gufunc
+        return gufunc
+
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
+
+
+@functools.cache
+def _diagonal_segment_distance_gufunc() -> np.ufunc:
+    return numba.guvectorize(
+        [
+            "void(float32[:], float32[:], float32[:, :], float32, boolean, float32[:], float32[:])",
+            "void(float64[:], float64[:], float64[:, :], float64, boolean, float64[:], float64[:])",
+        ],
+        "(d),(d),(n,d),(),()->(n),(n)",
+        nopython=True,
+        target="parallel",
+    )(_diagonal_segment_distance)
+
+
+def _diagonal_segment_distance(s1, s2, points, tol, signed, dist_result, sign_result):
     """Calculate distances from points to a diagonal line segment.
 
+    Parallel generalized ufunc, available as ``diagonal_segment_distance``
+    and compiled on first access.
+
     Parameters
     ----------
     s1 : ndarray
@@ -513,8 +773,1196 @@ def shortest_distance(
     return dists
 
 
+@numba.njit(cache=True)
+def _segment_distance(
+    s1_r, s1_z, s2_r, s2_z, n_r, n_z, seg_length, point_r, point_z, tol, signed
+):
+    """Signed distance between one point and one line segment.
+
+    Scalar version of the calculation in :func:`shortest_distance`, the
+    floating point operations are performed in the same order so that the
+    results are identical.
+    """
+    diff_r = s1_r - point_r
+    diff_z = s1_z - point_z
+
+    dot_product = diff_r * n_r + diff_z * n_z
+    proj_dist = -(n_r * (n_r * dot_product) + n_z * (n_z * dot_product))
+
+    if proj_dist < 0:
+        dist_r = diff_r
+        dist_z = diff_z
+    elif proj_dist > seg_length:
+        dist_r = s2_r - point_r
+        dist_z = s2_z - point_z
+    else:
+        dist_r = diff_r - n_r * dot_product
+        dist_z = diff_z - n_z * dot_product
+
+    if signed:
+        sign_vec = n_r * dist_z - n_z * dist_r
+
+        # push points on surface inside
+        if abs(sign_vec) < tol:
+            sign_vec = -tol
+        sign_vec_norm = -sign_vec / abs(sign_vec)
+    else:
+        sign_vec_norm = 1.0
+
+    normed_dist = abs(np.sqrt(dist_r**2 + dist_z**2))
+
+    if normed_dist < tol:
+        return tol
+    return normed_dist * sign_vec_norm
+
+
+@numba.njit(cache=True)
+def _segment_properties(s1_list, s2_list):
+    """Unit direction vectors and lengths of the line segments."""
+    n_segments = len(s1_list)
+    seg_n = np.empty((n_segments, 2))
+    seg_length = np.empty(n_segments)
+
+    for j in range(n_segments):
+        diff_r = s2_list[j, 0] - s1_list[j, 0]
+        diff_z = s2_list[j, 1] - s1_list[j, 1]
+        seg_length[j] = np.sqrt(diff_r**2 + diff_z**2)
+        seg_n[j, 0] = diff_r / seg_length[j]
+        seg_n[j, 1] = diff_z / seg_length[j]
+
+    return seg_n, seg_length
+
+
+@numba.njit(cache=True)
+def _nearest_of_candidates(
+    s1_list, s2_list, seg_n, seg_length, candidates, point_r, point_z, tol, signed
+):
+    """Signed distance to, and index of, the closest of the candidate segments.
+
+    The candidates must be sorted in increasing order so that ties are
+    resolved in favour of the first segment, as in :func:`numpy.argmin`.
+    """
+    dist_min = np.nan
+    idx_min = -1
+    best = np.inf
+
+    for j in candidates:
+        dist = _segment_distance(
+            s1_list[j, 0],
+            s1_list[j, 1],
+            s2_list[j, 0],
+            s2_list[j, 1],
+            seg_n[j, 0],
+            seg_n[j, 1],
+            seg_length[j],
+            point_r,
+            point_z,
+            tol,
+            signed,
+        )
+        # nan are propagated as in numpy.argmin
+        if np.isnan(dist):
+            return dist, j
+        if abs(dist) < best:
+            best = abs(dist)
+            dist_min = dist
+            idx_min = j
+
+    return dist_min, idx_min
+
+
+@numba.njit(cache=True)
+def nearest_segment_distance(
+    s1_list: NDArray,
+    s2_list: NDArray,
+    points: NDArray,
+    tol: float = 1e-11,
+    signed: bool = True,
+) -> tuple[NDArray, NDArray]:
+    """Get the distance between each point and the closest line segment.
+
+    Equivalent to taking, for each point, the entry of
+    :func:`shortest_distance` with the smallest absolute value, but computed
+    in a single pass over the segments keeping a running minimum. The memory
+    usage is therefore proportional to the number of points only and the
+    ``(n_points, n_segments)`` matrix is never allocated. The result is
+    identical to the one of the reference calculation, including the choice
+    of the first segment in case of ties.
+
+    Parameters
+    ----------
+    s1_list
+        `(n_segments,2)` np.array of the first points in the line segment, for
+        the second axis indices `0,1` correspond to `r,z`.
+    s2_list
+        second points, same format as `s1_list`.
+    points
+        `(n_points,2)` array of points to compare, first axis corresponds to
+        the point index and the second to `(r,z)`.
+    tol
+        tolerance when computing sign, points within this distance to the
+        surface are pushed inside.
+    signed
+        boolean flag to attach a sign to the distance (positive if inside).
+
+    Returns
+    -------
+        tuple of two ``(n_points,)`` arrays, the distance to the closest
+        segment and the index of this segment.
+    """
+    return _nearest_segment_distance(
+        s1_list, s2_list, points[:, 0], points[:, 1], tol, signed
+    )
+
+
+@_kernel
+def _nearest_segment_distance(s1_list, s2_list, points_r, points_z, tol, signed):
+    n_points = len(points_r)
+
+    dists = np.full(n_points, np.nan, dtype=points_r.dtype)
+    indices = np.full(n_points, -1, dtype=np.int64)
+
+    seg_n, seg_length = _segment_properties(s1_list, s2_list)
+    candidates = np.arange(len(s1_list))
+
+    for i in numba.prange(n_points):
+        dists[i], indices[i] = _nearest_of_candidates(
+            s1_list,
+            s2_list,
+            seg_n,
+            seg_length,
+            candidates,
+            points_r[i],
+            points_z[i],
+            tol,
+            signed,
+        )
+
+    return dists, indices
+
+
+def nearest_segment_distance_by_group(
+    s1_list: NDArray,
+    s2_list: NDArray,
+    groups: NDArray,
+    points: NDArray,
+    tol: float = 1e-11,
+    signed: bool = True,
+) -> NDArray:
+    """Get the distance between each point and the closest segment of each group.
+
+    The segments are partitioned in groups (for example by surface type) and
+    the running minimum of each group is kept in a single pass over the
+    segments. Each column of the result is identical to the output of
+    :func:`nearest_segment_distance` for the segments of the group.
+
+    Parameters
+    ----------
+    s1_list
+        `(n_segments,2)` np.array of the first points in the line segment, for
+        the second axis indices `0,1` correspond to `r,z`.
+    s2_list
+        second points, same format as `s1_list`.
+    groups
+        `(n_segments,)` array with the index of the group of each segment,
+        negative for segments to ignore.
+    points
+        `(n_points,2)` array of points to compare, first axis corresponds to
+        the point index and the second to `(r,z)`.
+    tol
+        tolerance when computing sign, points within this distance to the
+        surface are pushed inside.
+    signed
+        boolean flag to attach a sign to the distance (positive if inside).
+
+    Returns
+    -------
+        ``(n_points, n_groups)`` array of distances, with ``n_groups`` the
+        largest group index plus one. Groups without segments are ``NaN``.
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    n_groups = max(groups.max(initial=-1) + 1, 0)
+
+    return _nearest_segment_distance_by_group(
+        s1_list, s2_list, groups, n_groups, points[:, 0], points[:, 1], tol, signed
+    )
+
+
+@_kernel
+def _nearest_segment_distance_by_group(
+    s1_list, s2_list, groups, n_groups, points_r, points_z, tol, signed
+):
+    n_points = len(points_r)
+
+    dists = np.full((n_points, n_groups), np.nan, dtype=points_r.dtype)
+
+    seg_n, seg_length = _segment_properties(s1_list, s2_list)
+
+    # segments of each group, in increasing order so that ties are resolved
+    # as in nearest_segment_distance
+    members = np.argsort(groups, kind="mergesort")
+    group_offsets = np.searchsorted(groups[members], np.arange(n_groups + 1))
+
+    for i in numba.prange(n_points):
+        for group in range(n_groups):
+            dists[i, group], _ = _nearest_of_candidates(
+                s1_list,
+                s2_list,
+                seg_n,
+                seg_length,
+                members[group_offsets[group] : group_offsets[group + 1]],
+                points_r[i],
+                points_z[i],
+                tol,
+                signed,
+            )
+
+    return dists
+
+
+@numba.njit(cache=True)
+def is_inside_profile(
+    s1_list: NDArray,
+    s2_list: NDArray,
+    points: NDArray,
+    tol: float = 1e-11,
+) -> NDArray:
+    """Check whether each point is inside the polygon formed by the line segments.
+
+    Points inside the polygon or at a distance of at most `tol` from a
+    segment are inside. With a `tol` of the order of the numerical precision
+    this is the same as the sign of the output of
+    :func:`nearest_segment_distance`, but no distance is computed for most
+    points. Points outside the bounding box of the segments are
+    rejected first, the others are classified with a crossing number test
+    (see :func:`_point_in_polygon`). Only points found outside are compared
+    to `tol`, stopping at the first segment closer than it.
+
+    Parameters
+    ----------
+    s1_list
+        `(n_segments,2)` np.array of the first points in the line segment, for
+        the second axis indices `0,1` correspond to `r,z`.
+    s2_list
+        second points, same format as `s1_list`.
+    points
+        `(n_points,2)` array of points to check, first axis corresponds to
+        the point index and the second to `(r,z)`.
+    tol
+        points outside the polygon within this distance to a segment are
+        considered inside.
+
+    Returns
+    -------
+        boolean array of shape ``(n_points,)``.
+    """
+    return _is_inside_profile(s1_list, s2_list, points[:, 0], points[:, 1], tol)
+
+
+@_kernel
+def _is_inside_profile(s1_list, s2_list, points_r, points_z, tol):
+    inside = np.empty(len(points_r), dtype=np.bool_)
+    r_max, z_min, z_max = _profile_bounds(s1_list, s2_list, tol)
+
+    for i in numba.prange(len(points_r)):
+        inside[i] = _point_inside_profile(
+            s1_list, s2_list, points_r[i], points_z[i], r_max, z_min, z_max, tol
+        )
+
+    return inside
+
+
+@numba.njit(cache=True)
+def _profile_bounds(s1_list, s2_list, tol):
+    """Bounding cylinder of the solid, enlarged by `tol`."""
+    r_max = max(s1_list[:, 0].max(), s2_list[:, 0].max()) + tol
+    z_min = min(s1_list[:, 1].min(), s2_list[:, 1].min()) - tol
+    z_max = max(s1_list[:, 1].max(), s2_list[:, 1].max()) + tol
+
+    return r_max, z_min, z_max
+
+
+@numba.njit(cache=True)
+def _point_inside_profile(s1_list, s2_list, point_r, point_z, r_max, z_min, z_max, tol):
+    """Check if one point is inside the polygon, see :func:`is_inside_profile`."""
+    if point_r > r_max or point_z < z_min or point_z > z_max:
+        return False
+
+    if _point_in_polygon(s1_list, s2_list, point_r, point_z):
+        return True
+
+    for j in range(len(s1_list)):
+        if (
+            _point_segment_distance(
+                point_r,
+                point_z,
+                s1_list[j, 0],
+                s1_list[j, 1],
+                s2_list[j, 0],
+                s2_list[j, 1],
+            )
+            < tol
+        ):
+            return True
+
+    return False
+
+
+@numba.njit(cache=True)
+def _clipped_meridian_distance_sq(
+    s1_list, s2_list, point_r, point_z, phi, phi_point, normal, offset
+):
+    """Squared distance to the part of the meridian at angle `phi` in the half-space.
+
+    The meridian is the profile rotated to the azimuthal angle `phi`, only the
+    points with :math:`n \\cdot x \\le d` are considered.
+    """
+    delta = phi - phi_point
+    u = point_r * np.cos(delta)
+    perp_sq = (point_r * np.sin(delta)) ** 2
+
+    coef_r = normal[0] * np.cos(phi) + normal[1] * np.sin(phi)
+    coef_z = normal[2]
+
+    best = np.inf
+    for j in range(len(s1_list)):
+        a_r, a_z = s1_list[j, 0], s1_list[j, 1]
+        b_r, b_z = s2_list[j, 0], s2_list[j, 1]
+
+        # part of the segment inside the half-space
+        level_a = coef_r * a_r + coef_z * a_z - offset
+        level_b = coef_r * b_r + coef_z * b_z - offset
+
+        t_lo = 0.0
+        t_hi = 1.0
+        if level_a > 0 and level_b > 0:
+            continue
+        if level_a > 0:
+            t_lo = level_a / (level_a - level_b)
+        elif level_b > 0:
+            t_hi = level_a / (level_a - level_b)
+
+        diff_r = b_r - a_r
+        diff_z = b_z - a_z
+        t = ((u - a_r) * diff_r + (point_z - a_z) * diff_z) / (diff_r**2 + diff_z**2)
+        t = min(max(t, t_lo), t_hi)
+
+        best = min(
+            best, (a_r + t * diff_r - u) ** 2 + (a_z + t * diff_z - point_z) ** 2
+        )
+
+    return best + perp_sq
+
+
+@numba.njit(cache=True)
+def _rim_point_distance_sq(
+    a_r, a_z, b_r, b_z, t, side, point, normal, offset, e_x, e_y, n_xy
+):
+    """Squared distance to the point of the rim at position `t` along a segment.
+
+    The circle swept by the profile point at `t` crosses the plane in two
+    points, `side` (+1 or -1) selects one of them.
+    """
+    ring_r = a_r + t * (b_r - a_r)
+    ring_z = a_z + t * (b_z - a_z)
+
+    # distance of the intersection line from the axis, in the xy plane
+    rho = (offset - normal[2] * ring_z) / n_xy
+    half_chord = side * np.sqrt(max(ring_r**2 - rho**2, 0.0))
+
+    return (
+        (rho * e_x - half_chord * e_y - point[0]) ** 2
+        + (rho * e_y + half_chord * e_x - point[1]) ** 2
+        + (ring_z - point[2]) ** 2
+    )
+
+
+@numba.njit(cache=True)
+def _rim_distance(s1_list, s2_list, point, normal, offset):
+    """Distance to the intersection of the surface of revolution with the plane.
+
+    The rim is parametrised by the position along each segment, the distance
+    is minimised on a scan refined with a golden-section search.
+    """
+    n_xy = np.sqrt(normal[0] ** 2 + normal[1] ** 2)
+    e_x = normal[0] / n_xy
+    e_y = normal[1] / n_xy
+
+    n_samples = 32
+    ratio = (np.sqrt(5) - 1) / 2
+    samples = np.empty(n_samples)
+
+    best = np.inf
+    for j in range(len(s1_list)):
+        a_r, a_z = s1_list[j, 0], s1_list[j, 1]
+        b_r, b_z = s2_list[j, 0], s2_list[j, 1]
+
+        rho_a = (offset - normal[2] * a_z) / n_xy
+        rho_b = (offset - normal[2] * b_z) / n_xy
+
+        # the circle reaches the plane if its radius is larger than |rho|,
+        # both are linear functions of the position along the segment
+        t_lo = 0.0
+        t_hi = 1.0
+        for level_a, level_b in (
+            (a_r - rho_a, b_r - rho_b),
+            (a_r + rho_a, b_r + rho_b),
+        ):
+            if level_a < 0 and level_b < 0:
+                t_lo = 1.0
+                t_hi = 0.0
+            elif level_a < 0:
+                t_lo = max(t_lo, level_a / (level_a - level_b))
+            elif level_b < 0:
+                t_hi = min(t_hi, level_a / (level_a - level_b))
+        if t_lo > t_hi:
+            continue
+
+        step = (t_hi - t_lo) / (n_samples - 1)
+
+        for side in (-1.0, 1.0):
+            for k in range(n_samples):
+                samples[k] = _rim_point_distance_sq(
+                    a_r,
+                    a_z,
+                    b_r,
+                    b_z,
+                    t_lo + k * step,
+                    side,
+                    point,
+                    normal,
+                    offset,
+                    e_x,
+                    e_y,
+                    n_xy,
+                )
+
+            for k in range(n_samples):
+                if (k > 0 and samples[k] > samples[k - 1]) or (
+                    k < n_samples - 1 and samples[k] > samples[k + 1]
+                ):
+                    continue
+
+                best = min(best, samples[k])
+                if step == 0:
+                    continue
+
+                lo = max(t_lo + (k - 1) * step, t_lo)
+                hi = min(t_lo + (k + 1) * step, t_hi)
+                for _ in range(60):
+                    mid_lo = hi - ratio * (hi - lo)
+                    mid_hi = lo + ratio * (hi - lo)
+                    if _rim_point_distance_sq(
+                        a_r,
+                        a_z,
+                        b_r,
+                        b_z,
+                        mid_lo,
+                        side,
+                        point,
+                        normal,
+                        offset,
+                        e_x,
+                        e_y,
+                        n_xy,
+                    ) < _rim_point_distance_sq(
+                        a_r,
+                        a_z,
+                        b_r,
+                        b_z,
+                        mid_hi,
+                        side,
+                        point,
+                        normal,
+                        offset,
+                        e_x,
+                        e_y,
+                        n_xy,
+                    ):
+                        hi = mid_hi
+                    else:
+                        lo = mid_lo
+
+                best = min(
+                    best,
+                    _rim_point_distance_sq(
+                        a_r,
+                        a_z,
+                        b_r,
+                        b_z,
+                        0.5 * (lo + hi),
+                        side,
+                        point,
+                        normal,
+                        offset,
+                        e_x,
+                        e_y,
+                        n_xy,
+                    ),
+                )
+
+    return np.sqrt(best)
+
+
+@numba.njit(cache=True)
+def _clipped_surface_distance(
+    s1_list, s2_list, point_r, point_z, phi_point, normal, offset
+):
+    """Distance to the surface of revolution of the profile, restricted to a half-space.
+
+    The distance to each meridian is minimised over the azimuthal angle: a
+    scan is refined with a golden-section search around each local minimum.
+    The distance to a meridian is discontinuous where a segment parallel to
+    the plane leaves the half-space, minima there lie on the rim, which is
+    treated separately by :func:`_rim_distance`.
+    """
+    point = np.array(
+        [point_r * np.cos(phi_point), point_r * np.sin(phi_point), point_z]
+    )
+    rim = _rim_distance(s1_list, s2_list, point, normal, offset)
+
+    n_samples = 120
+    step = 2 * np.pi / n_samples
+
+    samples = np.empty(n_samples)
+    for k in range(n_samples):
+        samples[k] = _clipped_meridian_distance_sq(
+            s1_list,
+            s2_list,
+            point_r,
+            point_z,
+            phi_point + k * step,
+            phi_point,
+            normal,
+            offset,
+        )
+
+    best = min(samples.min(), rim**2)
+    ratio = (np.sqrt(5) - 1) / 2
+
+    # the distance changes at most by the largest radius times the angle
+    max_change = max(s1_list[:, 0].max(), s2_list[:, 0].max()) * step
+
+    for k in range(n_samples):
+        if (
+            samples[k] == np.inf
+            or samples[k] > samples[k - 1]
+            or samples[k] > samples[(k + 1) % n_samples]
+            or np.sqrt(samples[k]) - max_change > np.sqrt(best)
+        ):
+            continue
+
+        lo = phi_point + (k - 1) * step
+        hi = phi_point + (k + 1) * step
+        for _ in range(60):
+            mid_lo = hi - ratio * (hi - lo)
+            mid_hi = lo + ratio * (hi - lo)
+            if _clipped_meridian_distance_sq(
+                s1_list, s2_list, point_r, point_z, mid_lo, phi_point, normal, offset
+            ) < _clipped_meridian_distance_sq(
+                s1_list, s2_list, point_r, point_z, mid_hi, phi_point, normal, offset
+            ):
+                hi = mid_hi
+            else:
+                lo = mid_lo
+
+        best = min(
+            best,
+            _clipped_meridian_distance_sq(
+                s1_list,
+                s2_list,
+                point_r,
+                point_z,
+                0.5 * (lo + hi),
+                phi_point,
+                normal,
+                offset,
+            ),
+        )
+
+    return np.sqrt(best)
+
+
+@_kernel
+def _cut_distance(s1_list, s2_list, x, y, z, r, dists, indices, normal, offset, tol):
+    """Signed distance to a polycone from which a half-space is removed.
+
+    `dists` and `indices` are the signed distances to the polycone and the
+    indices of the closest segments, `dists` is updated in place, see
+    :func:`_cut_point_distance`.
+    """
+    seg_n, seg_length = _segment_properties(s1_list, s2_list)
+
+    for i in numba.prange(len(x)):
+        dists[i] = _cut_point_distance(
+            s1_list,
+            s2_list,
+            seg_n,
+            seg_length,
+            x[i],
+            y[i],
+            z[i],
+            r[i],
+            dists[i],
+            indices[i],
+            normal,
+            offset,
+            tol,
+        )
+
+
+@numba.njit(cache=True)
+def _cut_point_distance(
+    s1_list,
+    s2_list,
+    seg_n,
+    seg_length,
+    x,
+    y,
+    z,
+    r,
+    dist,
+    index,
+    normal,
+    offset,
+    tol,
+):
+    """Signed distance of one point to a polycone from which a half-space is removed.
+
+    `dist` and `index` are the signed distance to the polycone and the index
+    of the closest segment. The distance is the smallest of the distances to
+    the polycone and to the plane for points inside. Outside it is exact if
+    the closest point of the polycone, or the projection on the plane, is
+    inside the solid, else it is minimised numerically with
+    :func:`_clipped_surface_distance`.
+    """
+    height = offset - (normal[0] * x + normal[1] * y + normal[2] * z)
+    phi = np.arctan2(y, x)
+
+    if dist >= 0 and height >= -tol:
+        return min(dist, max(height, tol))
+
+    if height >= 0:
+        # closest point of the polycone, in the meridian of the point
+        diff_r = s2_list[index, 0] - s1_list[index, 0]
+        diff_z = s2_list[index, 1] - s1_list[index, 1]
+        t = ((r - s1_list[index, 0]) * diff_r + (z - s1_list[index, 1]) * diff_z) / (
+            diff_r**2 + diff_z**2
+        )
+        t = min(max(t, 0.0), 1.0)
+        q_r = s1_list[index, 0] + t * diff_r
+        q_z = s1_list[index, 1] + t * diff_z
+
+        if (
+            normal[0] * q_r * np.cos(phi)
+            + normal[1] * q_r * np.sin(phi)
+            + normal[2] * q_z
+            <= offset
+        ):
+            return dist
+    else:
+        # projection on the plane
+        proj_x = x + height * normal[0]
+        proj_y = y + height * normal[1]
+        proj_z = z + height * normal[2]
+
+        proj_dist, _ = _nearest_of_candidates(
+            s1_list,
+            s2_list,
+            seg_n,
+            seg_length,
+            np.arange(len(s1_list)),
+            np.sqrt(proj_x**2 + proj_y**2),
+            proj_z,
+            tol,
+            True,
+        )
+        if proj_dist >= 0:
+            return height if height < -tol else tol
+
+    dist = _clipped_surface_distance(s1_list, s2_list, r, z, phi, normal, offset)
+    return -dist if dist >= tol else tol
+
+
+class ProfileSegments(NamedTuple):
+    """Line segments of a detector profile, as read-only contiguous arrays.
+
+    See :meth:`.HPGe.get_profile_segments`.
+    """
+
+    r: NDArray
+    """radial coordinates of the vertices of the profile."""
+    z: NDArray
+    """vertical coordinates of the vertices of the profile."""
+    s1: NDArray
+    """`(n_segments,2)` array of the first points of the segments."""
+    s2: NDArray
+    """second points of the segments."""
+    directions: NDArray
+    """`(n_segments,2)` array of the unit direction vectors of the segments."""
+    lengths: NDArray
+    """lengths of the segments."""
+    surface_codes: NDArray
+    """type of each segment, see :attr:`.HPGe.surface_type_codes`."""
+
+
+class SegmentGrid(NamedTuple):
+    """Uniform grid in `(r,z)` used to accelerate the nearest segment search.
+
+    For each cell the indices of the segments which can be the closest one
+    to any point inside the cell are stored in compressed sparse row format:
+    the candidates of cell ``i_r * shape[1] + i_z`` are
+    ``segments[offsets[cell]:offsets[cell + 1]]``.
+    """
+
+    origin: NDArray
+    """`(r,z)` coordinates of the lower corner of the grid."""
+    cell_size: NDArray
+    """size of the cells along `r` and `z`."""
+    shape: NDArray
+    """number of cells along `r` and `z`."""
+    offsets: NDArray
+    """start of the candidate list of each cell in `segments`."""
+    segments: NDArray
+    """flat array of candidate segment indices."""
+
+
+@numba.njit(cache=True)
+def _point_segment_distance(point_r, point_z, a_r, a_z, b_r, b_z):
+    """Unsigned distance between a point and the segment `a-b`."""
+    diff_r = b_r - a_r
+    diff_z = b_z - a_z
+    t = ((point_r - a_r) * diff_r + (point_z - a_z) * diff_z) / (diff_r**2 + diff_z**2)
+    t = min(max(t, 0.0), 1.0)
+
+    return np.sqrt(
+        (a_r + t * diff_r - point_r) ** 2 + (a_z + t * diff_z - point_z) ** 2
+    )
+
+
+@numba.njit(cache=True)
+def _point_box_distance(point_r, point_z, r_lo, r_hi, z_lo, z_hi):
+    """Unsigned distance between a point and an axis-aligned box."""
+    dr = max(r_lo - point_r, 0.0, point_r - r_hi)
+    dz = max(z_lo - point_z, 0.0, point_z - z_hi)
+
+    return np.sqrt(dr**2 + dz**2)
+
+
+@numba.njit(cache=True)
+def _segment_intersects_box(a_r, a_z, b_r, b_z, r_lo, r_hi, z_lo, z_hi):
+    """Check if the segment `a-b` intersects an axis-aligned box (Liang-Barsky)."""
+    diff_r = b_r - a_r
+    diff_z = b_z - a_z
+
+    t0 = 0.0
+    t1 = 1.0
+    for p, q in (
+        (-diff_r, a_r - r_lo),
+        (diff_r, r_hi - a_r),
+        (-diff_z, a_z - z_lo),
+        (diff_z, z_hi - a_z),
+    ):
+        if p == 0:
+            if q < 0:
+                return False
+        else:
+            t = q / p
+            if p < 0:
+                t0 = max(t0, t)
+            else:
+                t1 = min(t1, t)
+            if t0 > t1:
+                return False
+
+    return True
+
+
+@numba.njit(cache=True)
+def _box_segment_distance(a_r, a_z, b_r, b_z, r_lo, r_hi, z_lo, z_hi):
+    """Unsigned distance between the segment `a-b` and an axis-aligned box."""
+    if _segment_intersects_box(a_r, a_z, b_r, b_z, r_lo, r_hi, z_lo, z_hi):
+        return 0.0
+
+    min_dist = min(
+        _point_box_distance(a_r, a_z, r_lo, r_hi, z_lo, z_hi),
+        _point_box_distance(b_r, b_z, r_lo, r_hi, z_lo, z_hi),
+    )
+    for corner_r, corner_z in (
+        (r_lo, z_lo),
+        (r_lo, z_hi),
+        (r_hi, z_lo),
+        (r_hi, z_hi),
+    ):
+        min_dist = min(
+            min_dist,
+            _point_segment_distance(corner_r, corner_z, a_r, a_z, b_r, b_z),
+        )
+
+    return min_dist
+
+
+@numba.njit(cache=True)
+def _point_in_polygon(s1_list, s2_list, point_r, point_z):
+    """Check if a point is inside the polygon formed by the line segments.
+
+    Uses the crossing number of a ray in the direction of increasing `r`. The
+    polygon is closed by the segment from the last to the first vertex (the
+    symmetry axis for a detector profile).
+    """
+    n_segments = len(s1_list)
+    inside = False
+
+    for j in range(n_segments + 1):
+        if j < n_segments:
+            a_r, a_z = s1_list[j, 0], s1_list[j, 1]
+            b_r, b_z = s2_list[j, 0], s2_list[j, 1]
+        else:
+            a_r, a_z = s2_list[-1, 0], s2_list[-1, 1]
+            b_r, b_z = s1_list[0, 0], s1_list[0, 1]
+
+        if (a_z > point_z) != (b_z > point_z):
+            cross_r = a_r + (point_z - a_z) * (b_r - a_r) / (b_z - a_z)
+            if point_r < cross_r:
+                inside = not inside
+
+    return inside
+
+
+@numba.njit(cache=True)
+def _box_candidates(s1_list, s2_list, r_lo, r_hi, z_lo, z_hi, pad, is_candidate):
+    """Flag the segments which can be the closest to a point inside a box.
+
+    The distance to a segment is a convex function, so its maximum over the
+    box is reached at one of the corners: the smallest of these maxima is an
+    upper bound on the distance to the closest segment. Segments closer to the
+    box than this bound (plus `pad`) are flagged in `is_candidate`.
+    """
+    n_segments = len(s1_list)
+
+    upper = np.inf
+    for j in range(n_segments):
+        max_dist = 0.0
+        for corner_r, corner_z in (
+            (r_lo, z_lo),
+            (r_lo, z_hi),
+            (r_hi, z_lo),
+            (r_hi, z_hi),
+        ):
+            max_dist = max(
+                max_dist,
+                _point_segment_distance(
+                    corner_r,
+                    corner_z,
+                    s1_list[j, 0],
+                    s1_list[j, 1],
+                    s2_list[j, 0],
+                    s2_list[j, 1],
+                ),
+            )
+        upper = min(upper, max_dist)
+
+    upper += pad
+
+    for j in range(n_segments):
+        is_candidate[j] = (
+            _box_segment_distance(
+                s1_list[j, 0],
+                s1_list[j, 1],
+                s2_list[j, 0],
+                s2_list[j, 1],
+                r_lo,
+                r_hi,
+                z_lo,
+                z_hi,
+            )
+            <= upper
+        )
+
+
+@numba.njit(cache=True)
+def _fill_segment_grid(s1_list, s2_list, origin, cell_size, shape, pad):
+    n_segments = len(s1_list)
+    n_cells = shape[0] * shape[1]
+
+    is_candidate = np.zeros((n_cells, n_segments), dtype=np.bool_)
+
+    for i_r in range(shape[0]):
+        r_lo = origin[0] + i_r * cell_size[0]
+        r_hi = origin[0] + (i_r + 1) * cell_size[0]
+
+        for i_z in range(shape[1]):
+            z_lo = origin[1] + i_z * cell_size[1]
+            z_hi = origin[1] + (i_z + 1) * cell_size[1]
+
+            _box_candidates(
+                s1_list,
+                s2_list,
+                r_lo,
+                r_hi,
+                z_lo,
+                z_hi,
+                pad,
+                is_candidate[i_r * shape[1] + i_z],
+            )
+
+    offsets = np.zeros(n_cells + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(is_candidate.sum(axis=1))
+    segments = np.empty(offsets[-1], dtype=np.int64)
+    k = 0
+    for cell in range(n_cells):
+        for j in range(n_segments):
+            if is_candidate[cell, j]:
+                segments[k] = j
+                k += 1
+
+    return offsets, segments
+
+
+def _segments_bounds(
+    s1_list: NDArray, s2_list: NDArray, margin: float
+) -> tuple[NDArray, NDArray]:
+    """Lower and upper `(r,z)` corners of the bounding box of the segments.
+
+    The box is enlarged on each side by `margin` times its largest extent,
+    without extending to negative radii.
+    """
+    vertices = np.vstack((s1_list, s2_list))
+    lo = vertices.min(axis=0)
+    hi = vertices.max(axis=0)
+
+    pad = margin * max(hi - lo)
+    lo = np.array([max(lo[0] - pad, min(lo[0], 0)), lo[1] - pad])
+
+    return lo, hi + pad
+
+
+def build_segment_grid(
+    s1_list: NDArray,
+    s2_list: NDArray,
+    n_cells: int = 4096,
+    margin: float = 0.1,
+) -> SegmentGrid:
+    """Build a uniform grid in `(r,z)` of candidate closest segments.
+
+    For each cell an upper bound on the distance to the closest segment is
+    obtained from the distances of the cell corners. Only the segments whose
+    distance to the cell is below this bound are stored as candidates, so that
+    the closest segment to any point in the cell is guaranteed to be one of
+    them.
+
+    Parameters
+    ----------
+    s1_list
+        `(n_segments,2)` np.array of the first points in the line segment, for
+        the second axis indices `0,1` correspond to `r,z`.
+    s2_list
+        second points, same format as `s1_list`.
+    n_cells
+        approximate total number of cells of the grid.
+    margin
+        fraction of the largest extent of the segments by which the grid is
+        enlarged on each side. Points outside of the grid are compared to all
+        segments.
+    """
+    s1_list = np.asarray(s1_list, dtype=np.float64)
+    s2_list = np.asarray(s2_list, dtype=np.float64)
+
+    if len(s1_list) == 0:
+        msg = "cannot build a grid without segments"
+        raise ValueError(msg)
+
+    if np.any(np.all(s1_list == s2_list, axis=1)):
+        msg = "cannot build a grid with segments of zero length"
+        raise ValueError(msg)
+
+    lo, hi = _segments_bounds(s1_list, s2_list, margin)
+
+    cell = np.sqrt(np.prod(hi - lo) / n_cells)
+    shape = np.maximum(np.ceil((hi - lo) / cell), 1).astype(np.int64)
+    cell_size = (hi - lo) / shape
+
+    # protect the candidate selection against rounding errors
+    rounding = 1e-9 * max(hi - lo)
+
+    offsets, segments = _fill_segment_grid(
+        s1_list, s2_list, lo, cell_size, shape, rounding
+    )
+
+    return SegmentGrid(lo, cell_size, shape, offsets, segments)
+
+
+@_kernel
+def _nearest_segment_distance_grid(
+    s1_list,
+    s2_list,
+    points_r,
+    points_z,
+    origin,
+    cell_size,
+    shape,
+    offsets,
+    segments,
+    tol,
+    signed,
+):
+    n_points = len(points_r)
+
+    dists = np.full(n_points, np.nan, dtype=points_r.dtype)
+    indices = np.full(n_points, -1, dtype=np.int64)
+
+    seg_n, seg_length = _segment_properties(s1_list, s2_list)
+    all_segments = np.arange(len(s1_list))
+
+    for i in numba.prange(n_points):
+        dists[i], indices[i] = _nearest_of_candidates(
+            s1_list,
+            s2_list,
+            seg_n,
+            seg_length,
+            _grid_candidates(
+                points_r[i],
+                points_z[i],
+                origin,
+                cell_size,
+                shape,
+                offsets,
+                segments,
+                all_segments,
+            ),
+            points_r[i],
+            points_z[i],
+            tol,
+            signed,
+        )
+
+    return dists, indices
+
+
+@numba.njit(cache=True)
+def _grid_candidate_count(
+    points_r, points_z, origin, cell_size, shape, offsets, segments, n_segments
+):
+    """Total number of candidate segments of the points, see :func:`_grid_candidates`."""
+    all_segments = np.arange(n_segments)
+    total = 0
+
+    for i in range(len(points_r)):
+        total += len(
+            _grid_candidates(
+                points_r[i],
+                points_z[i],
+                origin,
+                cell_size,
+                shape,
+                offsets,
+                segments,
+                all_segments,
+            )
+        )
+
+    return total
+
+
+@numba.njit(cache=True)
+def _grid_candidates(
+    point_r, point_z, origin, cell_size, shape, offsets, segments, all_segments
+):
+    """Candidate segments of the grid cell containing a point, all outside the grid."""
+    f_r = (point_r - origin[0]) / cell_size[0]
+    f_z = (point_z - origin[1]) / cell_size[1]
+
+    if 0 <= f_r < shape[0] and 0 <= f_z < shape[1]:
+        cell = int(f_r) * shape[1] + int(f_z)
+        return segments[offsets[cell] : offsets[cell + 1]]
+
+    return all_segments
+
+
+def nearest_segment_distance_grid(
+    s1_list: NDArray,
+    s2_list: NDArray,
+    points: NDArray,
+    grid: SegmentGrid,
+    tol: float = 1e-11,
+    signed: bool = True,
+) -> tuple[NDArray, NDArray]:
+    """Get the distance between each point and the closest line segment.
+
+    Same as :func:`nearest_segment_distance` but only the candidate segments
+    stored in `grid` for the cell containing each point are considered, so
+    that the cost per point does not scale with the number of segments. The
+    result is identical to the one of :func:`nearest_segment_distance`.
+
+    Parameters
+    ----------
+    s1_list
+        `(n_segments,2)` np.array of the first points in the line segment, for
+        the second axis indices `0,1` correspond to `r,z`.
+    s2_list
+        second points, same format as `s1_list`.
+    points
+        `(n_points,2)` array of points to compare, first axis corresponds to
+        the point index and the second to `(r,z)`.
+    grid
+        grid built from the same segments with :func:`build_segment_grid`.
+    tol
+        tolerance when computing sign, points within this distance to the
+        surface are pushed inside.
+    signed
+        boolean flag to attach a sign to the distance (positive if inside).
+
+    Returns
+    -------
+        tuple of two ``(n_points,)`` arrays, the distance to the closest
+        segment and the index of this segment.
+    """
+    return _dispatch(_nearest_segment_distance_grid)(
+        s1_list,
+        s2_list,
+        points[:, 0],
+        points[:, 1],
+        grid.origin,
+        grid.cell_size,
+        grid.shape,
+        grid.offsets,
+        grid.segments,
+        tol,
+        signed,
+    )
+
+
 @numba.njit(cache=True)
 def iterate_segments(s1, s2, coords_rz, tol, signed):
+    return _iterate_segments(
+        s1, s2, coords_rz, tol, signed, np.zeros(1, dtype=np.int64), 1
+    )
+
+
+@_kernel
+def _iterate_segments(s1, s2, coords_rz, tol, signed, n_evaluated, n_chunks):
+    """See :func:`iterate_segments`, counts the point-segment distances in `n_evaluated`.
+
+    The points are split in `n_chunks` chunks, which are independent.
+    """
+    dists = np.empty(len(coords_rz))
+    counts = np.zeros(n_chunks, dtype=np.int64)
+    bounds = np.linspace(0, len(coords_rz), n_chunks + 1).astype(np.int64)
+
+    for k in numba.prange(n_chunks):
+        dists[bounds[k] : bounds[k + 1]], counts[k] = _iterate_segments_chunk(
+            s1, s2, coords_rz[bounds[k] : bounds[k + 1]], tol, signed
+        )
+
+    n_evaluated[0] += counts.sum()
+    return dists
+
+
+@numba.njit(cache=True, nogil=True)
+def _iterate_segments_chunk(s1, s2, coords_rz, tol, signed):
+    """Distances of a chunk of points, and number of point-segment distances."""
+    n_evaluated = 0
+
     # first sort by lengths longest first
     segment_lengths = np.sum((s1 - s2) ** 2, axis=1)
     sort_indices = np.argsort(segment_lengths)[::-1]
@@ -543,6 +1991,7 @@ def iterate_segments(s1, s2, coords_rz, tol, signed):
                 # in both dimensions to s1/s2 < current min
                 # candidates = np.where(between | close)[0]
 
+            n_evaluated += len(candidates)
             if len(candidates) > 0:
                 start_array = np.ascontiguousarray(start).reshape(1, -1)
                 end_array = np.ascontiguousarray(end).reshape(1, -1)
@@ -585,6 +2034,7 @@ def iterate_segments(s1, s2, coords_rz, tol, signed):
                 | (dist_to_end_sq < threshold_dist_sq)
             )[0]
 
+            n_evaluated += len(candidates)
             if len(candidates) > 0:
                 dist_candidates = shortest_distance(
                     np.ascontiguousarray(start).reshape(1, -1),
@@ -595,4 +2045,407 @@ def iterate_segments(s1, s2, coords_rz, tol, signed):
                 ).flatten()
                 mask = np.abs(dist_candidates) < np.abs(dists[candidates])
                 dists[candidates[mask]] = dist_candidates[mask]
-    return dists
+    return dists, n_evaluated
+
+
+@numba.njit(cache=True)
+def step_response(distance: float, fccd: float, transition: float) -> float:  # noqa: ARG001
+    """Step response: inactive within the FCCD, fully active beyond.
+
+    Parameters
+    ----------
+    distance
+        distance of the point to a surface.
+    fccd
+        full charge collection depth of the surface.
+    transition
+        thickness of the transition layer, unused.
+    """
+    return 1.0 if distance >= fccd else 0.0
+
+
+@numba.njit(cache=True)
+def linear_response(distance: float, fccd: float, transition: float) -> float:
+    """Linear response in a transition layer.
+
+    Inactive up to a depth of ``fccd - transition``, the activeness then
+    increases linearly to one at the FCCD, see :func:`step_response` for the
+    parameters. Same as :func:`step_response` for a transition layer of zero
+    thickness.
+    """
+    if distance >= fccd:
+        return 1.0
+    if distance <= fccd - transition:
+        return 0.0
+    return (distance - fccd + transition) / transition
+
+
+# the built-in response models of the activeness
+RESPONSE_MODELS = ("step", "linear")
+
+# surface code (see SURFACE_TYPES) of the faces of the cuts, which are passive
+_CUT_SURFACE_CODE = 2
+
+
+# not cached, see _point_activeness
+@numba.njit
+def _surface_response(distance, fccd, transition, model, response):
+    """Response at `distance` from a surface, see :func:`_point_activeness`."""
+    # the branches are pruned at compile time
+    if response is not None:
+        return response(distance, fccd, transition)
+    if model == 0:
+        return step_response(distance, fccd, transition)
+    return linear_response(distance, fccd, transition)
+
+
+# not cached, as a specialization is compiled for each user response function,
+# it is compiled in the cached kernels of the built-in models
+@numba.njit
+def _point_activeness(
+    s1_list,
+    s2_list,
+    seg_n,
+    seg_length,
+    codes,
+    params,
+    model,
+    response,
+    point_r,
+    point_z,
+    height,
+    r_max,
+    z_min,
+    z_max,
+    tol,
+):
+    """Activeness of a point, the smallest response of all the segments.
+
+    Each segment contributes the response to its distance with the parameters
+    of its surface type, those with a zero FCCD are skipped (fully active).
+    The response is the function `response`, or if ``None`` the built-in
+    model of index `model` in :data:`RESPONSE_MODELS`. The point is outside,
+    with zero activeness, if the signed distance to the closest segment (as
+    in :func:`_nearest_of_candidates`) is negative.
+
+    `height` is the distance of the point below the plane of a cut (infinite
+    without a cut). As in :func:`_cut_point_distance`, points beyond the
+    plane are outside and the face of the cut is a passive surface.
+    """
+    if np.isnan(point_r) or np.isnan(point_z):
+        return np.nan
+
+    if point_r > r_max or point_z < z_min or point_z > z_max or height < -tol:
+        return 0.0
+
+    nearest = np.inf
+    inside = True
+    activeness = 1.0
+
+    fccd = params[_CUT_SURFACE_CODE, 0]
+    if fccd > 0 and height < np.inf:
+        activeness = _surface_response(
+            max(height, tol), fccd, params[_CUT_SURFACE_CODE, 1], model, response
+        )
+
+    for j in range(len(s1_list)):
+        dist = _segment_distance(
+            s1_list[j, 0],
+            s1_list[j, 1],
+            s2_list[j, 0],
+            s2_list[j, 1],
+            seg_n[j, 0],
+            seg_n[j, 1],
+            seg_length[j],
+            point_r,
+            point_z,
+            tol,
+            True,
+        )
+
+        if abs(dist) < nearest:
+            nearest = abs(dist)
+            inside = dist >= 0
+
+        fccd = params[codes[j], 0]
+        if activeness == 0 or fccd == 0:
+            continue
+
+        activeness = min(
+            activeness,
+            _surface_response(abs(dist), fccd, params[codes[j], 1], model, response),
+        )
+
+    return activeness if inside else 0.0
+
+
+@_kernel
+def _activeness(
+    s1_list,
+    s2_list,
+    seg_n,
+    seg_length,
+    codes,
+    params,
+    model,
+    points_r,
+    points_z,
+    heights,
+    tol,
+):
+    """Activeness of each point, see :func:`_point_activeness`.
+
+    `heights` are the distances of the points below the plane of the cut, or
+    ``None`` for a detector without a cut.
+    """
+    activeness = np.empty(len(points_r))
+    r_max, z_min, z_max = _profile_bounds(s1_list, s2_list, tol)
+
+    for i in numba.prange(len(points_r)):
+        activeness[i] = _point_activeness(
+            s1_list,
+            s2_list,
+            seg_n,
+            seg_length,
+            codes,
+            params,
+            model,
+            None,
+            points_r[i],
+            points_z[i],
+            np.inf if heights is None else heights[i],
+            r_max,
+            z_min,
+            z_max,
+            tol,
+        )
+
+    return activeness
+
+
+# kernels specialized for a user response function, which can not be cached
+# on disk as the type of the function is specific to the process
+@_kernel(cache=False)
+def _activeness_user(
+    s1_list,
+    s2_list,
+    seg_n,
+    seg_length,
+    codes,
+    params,
+    response,
+    points_r,
+    points_z,
+    heights,
+    tol,
+):
+    activeness = np.empty(len(points_r))
+    r_max, z_min, z_max = _profile_bounds(s1_list, s2_list, tol)
+
+    for i in numba.prange(len(points_r)):
+        activeness[i] = _point_activeness(
+            s1_list,
+            s2_list,
+            seg_n,
+            seg_length,
+            codes,
+            params,
+            -1,
+            response,
+            points_r[i],
+            points_z[i],
+            np.inf if heights is None else heights[i],
+            r_max,
+            z_min,
+            z_max,
+            tol,
+        )
+
+    return activeness
+
+
+def event_offsets(hits: ak.Array, field: str = "edep") -> NDArray:
+    """Offsets of the events of jagged hits in the flat content of their fields.
+
+    The hits of event ``k`` are ``flat[offsets[k]:offsets[k + 1]]``, where
+    ``flat`` is the flat content of a field (see :func:`flatten_columns`).
+
+    Parameters
+    ----------
+    hits
+        awkward array with a list of hits for each event.
+    field
+        a field of the hits.
+    """
+    values = hits[field]
+    if values.ndim != 2:
+        msg = f"hits must be a list of hits for each event, not {values.type}"
+        raise ValueError(msg)
+
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(ak.to_numpy(ak.num(values, axis=1)), out=offsets[1:])
+    return offsets
+
+
+# not cached, see _point_activeness
+@numba.njit
+def _event_active_energy(
+    rows,
+    x,
+    y,
+    z,
+    edep,
+    start,
+    stop,
+    seg_offsets,
+    s1_list,
+    s2_list,
+    seg_n,
+    seg_length,
+    codes,
+    params,
+    bounds,
+    has_cut,
+    normals,
+    cut_offsets,
+    model,
+    response,
+    tol,
+    energy,
+):
+    """Add the active energy of the hits ``start:stop`` of an event to `energy`.
+
+    The hit ``i`` belongs to the detector in row ``rows[i]`` of the packed
+    segments and cuts (see :class:`.SegmentTable`), its energy times its
+    activeness (see :func:`_point_activeness`) is added to the entry of this
+    row.
+    """
+    for i in range(start, stop):
+        row = rows[i]
+        lo = seg_offsets[row]
+        hi = seg_offsets[row + 1]
+
+        height = np.inf
+        if has_cut[row]:
+            height = cut_offsets[row] - (
+                normals[row, 0] * x[i] + normals[row, 1] * y[i] + normals[row, 2] * z[i]
+            )
+
+        activeness = _point_activeness(
+            s1_list[lo:hi],
+            s2_list[lo:hi],
+            seg_n[lo:hi],
+            seg_length[lo:hi],
+            codes[lo:hi],
+            params[row],
+            model,
+            response,
+            np.sqrt(x[i] ** 2 + y[i] ** 2),
+            z[i],
+            height,
+            bounds[row, 0],
+            bounds[row, 1],
+            bounds[row, 2],
+            tol,
+        )
+        energy[row] += edep[i] * activeness
+
+
+@_kernel
+def _active_energy(
+    rows,
+    x,
+    y,
+    z,
+    edep,
+    event_offsets,
+    seg_offsets,
+    s1_list,
+    s2_list,
+    seg_n,
+    seg_length,
+    codes,
+    params,
+    bounds,
+    has_cut,
+    normals,
+    cut_offsets,
+    model,
+    tol,
+    energy,
+):
+    for k in numba.prange(len(event_offsets) - 1):
+        _event_active_energy(
+            rows,
+            x,
+            y,
+            z,
+            edep,
+            event_offsets[k],
+            event_offsets[k + 1],
+            seg_offsets,
+            s1_list,
+            s2_list,
+            seg_n,
+            seg_length,
+            codes,
+            params,
+            bounds,
+            has_cut,
+            normals,
+            cut_offsets,
+            model,
+            None,
+            tol,
+            energy[k],
+        )
+
+
+@_kernel(cache=False)
+def _active_energy_user(
+    rows,
+    x,
+    y,
+    z,
+    edep,
+    event_offsets,
+    seg_offsets,
+    s1_list,
+    s2_list,
+    seg_n,
+    seg_length,
+    codes,
+    params,
+    bounds,
+    has_cut,
+    normals,
+    cut_offsets,
+    response,
+    tol,
+    energy,
+):
+    for k in numba.prange(len(event_offsets) - 1):
+        _event_active_energy(
+            rows,
+            x,
+            y,
+            z,
+            edep,
+            event_offsets[k],
+            event_offsets[k + 1],
+            seg_offsets,
+            s1_list,
+            s2_list,
+            seg_n,
+            seg_length,
+            codes,
+            params,
+            bounds,
+            has_cut,
+            normals,
+            cut_offsets,
+            -1,
+            response,
+            tol,
+            energy[k],
+        )
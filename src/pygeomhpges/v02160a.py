@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import math
 
+import numpy as np
+from numpy.typing import NDArray
 from pint import get_application_registry
 from pyg4ometry import geant4
 
@@ -55,6 +57,18 @@ class V02160A(HPGe):
             self.registry,
         )
 
+    def _cut_plane(self) -> tuple[NDArray, float]:
+        c = self.metadata.geometry
+
+        # the face of the rotated box, it crosses the bottom face at
+        # x = radius - crack radius and rises towards the outer edge
+        angle_cp = c.extra.crack.angle_in_deg * math.pi / 180
+        normal = np.array([math.cos(angle_cp), 0.0, -math.sin(angle_cp)])
+
+        return normal, (c.radius_in_mm - c.extra.crack.radius_in_mm) * math.cos(
+            angle_cp
+        )
+
     def _decode_polycone_coord(self) -> tuple[list[float], list[float]]:
         c = self.metadata.geometry
 
@@ -106,6 +120,9 @@ class V02160A(HPGe):
             z += [c.height_in_mm]
             surfaces += ["nplus"]
 
+        # the borehole starts here
+        n_outer = len(r)
+
         if c.taper.borehole.height_in_mm > 0:
             r += [
                 c.borehole.radius_in_mm
@@ -143,6 +160,11 @@ class V02160A(HPGe):
 
         self.surfaces = surfaces
 
+        # save the borehole coordinates for future reference, reverse to keep
+        # clockwise orientation
+        self.borehole_r = [0, *r[n_outer:]][::-1]
+        self.borehole_z = [c.height_in_mm, *z[n_outer:]][::-1]
+
         return r, z
 
     @property
@@ -58,7 +58,9 @@ class V02162B(HPGe):
             r += [c.radius_in_mm]
             z += [c.height_in_mm]
             surfaces += ["nplus"]
-        # top groove
+        # top groove, counted as part of the borehole
+        n_outer = len(r)
+
         r += [c.extra.topgroove.radius_in_mm, c.extra.topgroove.radius_in_mm]
 
         z += [c.height_in_mm, c.height_in_mm - c.extra.topgroove.depth_in_mm]
@@ -77,4 +79,9 @@ class V02162B(HPGe):
 
         self.surfaces = surfaces
 
+        # save the borehole coordinates for future reference, reverse to keep
+        # clockwise orientation
+        self.borehole_r = [0, *r[n_outer:]][::-1]
+        self.borehole_z = [c.height_in_mm, *z[n_outer:]][::-1]
+
         return r, z
@@ -67,6 +67,9 @@ class V07646A(HPGe):
             z += [c.height_in_mm]
             surfaces += ["nplus"]
 
+        # the borehole starts here
+        n_outer = len(r)
+
         if c.taper.borehole.height_in_mm > 0:
             r += [
                 c.borehole.radius_in_mm
@@ -103,4 +106,9 @@ class V07646A(HPGe):
 
         self.surfaces = surfaces
 
+        # save the borehole coordinates for future reference, reverse to keep
+        # clockwise orientation
+        self.borehole_r = [0, *r[n_outer:]][::-1]
+        self.borehole_z = [c.height_in_mm, *z[n_outer:]][::-1]
+
         return r, z
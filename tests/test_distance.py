@@ -1,14 +1,24 @@
 from __future__ import annotations
 
 import pathlib
+from concurrent.futures import ThreadPoolExecutor
 
+import awkward as ak
+import numba
 import numpy as np
 import pytest
 from dbetto import TextDB
 from legendtestdata import LegendTestData
 from pyg4ometry import geant4
 
-from pygeomhpges import make_hpge
+from pygeomhpges import (
+    SURFACE_TYPES,
+    DistanceTable,
+    InvertedCoax,
+    SegmentTable,
+    make_hpge,
+    utils,
+)
 from pygeomhpges.utils import shortest_grid_distance
 
 configs = TextDB(pathlib.Path(__file__).parent.resolve() / "configs")
@@ -30,7 +40,10 @@ def test_not_implemented(reg):
     ppc = make_hpge(configs.P00664B, registry=reg)
 
     with pytest.raises(NotImplementedError):
-        ppc.distance_to_surface([[1, 0, 0]])
+        ppc.distance_to_surface([[1, 0, 0]], surface_indices=[0])
+
+    with pytest.raises(NotImplementedError):
+        ppc.distance_to_surface_rz([1], [0])
 
 
 def test_bad_dimensions(test_data_configs, reg):
@@ -53,13 +66,6 @@ def test_output(test_data_configs, reg):
     assert np.all(dist_indices >= dist)
 
 
-def test_inside_not_implemented(reg):
-    ppc = make_hpge(configs.P00664B, registry=reg)
-
-    with pytest.raises(NotImplementedError):
-        ppc.is_inside([[1, 0, 0]])
-
-
 def test_inside_bad_dimensions(test_data_configs, reg):
     gedet = make_hpge(test_data_configs + "/C99000A.json", registry=reg)
 
@@ -195,3 +201,690 @@ def test_is_in_borehole(test_data_configs):
     )  # outside
 
     assert np.all(is_in == [False, True, False])
+
+
+def test_distance_grid(reg):
+    gedet = make_hpge(configs.V07646A, registry=reg)
+
+    rng = np.random.default_rng(3)
+    coords = np.column_stack(
+        [
+            rng.uniform(-50, 50, 5000),
+            rng.uniform(-50, 50, 5000),
+            rng.uniform(-20, 140, 5000),
+        ]
+    )
+
+    r, z = gedet.get_profile()
+    s1, s2 = utils.get_line_segments(np.array(r), np.array(z))
+
+    for signed in (True, False):
+        ref, _ = utils.nearest_segment_distance(
+            s1, s2, utils.convert_coords(coords), 1e-11, signed
+        )
+        assert np.array_equal(gedet.distance_to_surface(coords, signed=signed), ref)
+
+    # the grid is cached on the detector
+    grid = gedet._segment_grid
+    gedet.distance_to_surface(coords)
+    assert gedet._segment_grid is grid
+
+
+def test_distance_table(tmp_path):
+    gedet = make_hpge(configs.V07646A, registry=None)
+
+    rng = np.random.default_rng(5)
+    coords = np.column_stack(
+        [
+            rng.uniform(-50, 50, 20000),
+            rng.uniform(-50, 50, 20000),
+            rng.uniform(-20, 100, 20000),
+        ]
+    )
+
+    exact = gedet.distance_to_surface(coords, signed=True)
+    approx = gedet.distance_to_surface(coords, signed=True, max_error=0.01)
+    assert np.all(np.abs(approx - exact) <= 0.01)
+
+    table = gedet.get_distance_table(0.01)
+    assert table.error_bound <= 0.01
+
+    # tabulated points within tol of the surface are pushed inside
+    approx_tol = gedet.distance_to_surface(coords, signed=True, max_error=0.01, tol=0.5)
+    rz = utils.convert_coords(coords)
+    tabulated = np.all((rz >= table.origin) & (rz <= table.origin + table.size), axis=1)
+    near = np.abs(approx) < 0.5
+    assert np.any(near & tabulated)
+    assert np.all(approx_tol[near & tabulated] == 0.5)
+    assert np.array_equal(approx_tol[~near & tabulated], approx[~near & tabulated])
+
+    # the tolerance is also used outside of the tabulated region
+    far = np.array([[0.0, 1e4], [1e4, 0.0]])
+    for tol in (1e-11, 0.5):
+        ref, _ = utils.nearest_segment_distance(table.s1, table.s2, far, tol, True)
+        assert np.array_equal(table.evaluate(far, tol=tol), ref)
+
+    # cached, unless a smaller error is requested
+    assert gedet.get_distance_table(0.1) is table
+    assert gedet.get_distance_table(0.005) is not table
+
+    table.save(tmp_path / "table.npz")
+    loaded = DistanceTable.load(tmp_path / "table.npz")
+    assert np.array_equal(loaded.evaluate(coords[:, 1:]), table.evaluate(coords[:, 1:]))
+
+    gedet.set_distance_table(loaded)
+    assert gedet.get_distance_table(0.01) is loaded
+
+    other = make_hpge(configs.V02162B, registry=None)
+    with pytest.raises(ValueError):
+        other.set_distance_table(loaded)
+
+    with pytest.raises(ValueError):
+        gedet.distance_to_surface(coords, surface_indices=[0, 1], max_error=0.01)
+
+
+def test_iter_distance_to_surface(tmp_path):
+    gedet = make_hpge(configs.V07646A, registry=None)
+
+    rng = np.random.default_rng(7)
+    coords = rng.uniform(-50, 100, size=(1050, 3))
+    np.save(tmp_path / "coords.npy", coords)
+
+    dists = gedet.distance_to_surface(coords, signed=True)
+
+    for source in (coords, tmp_path / "coords.npy", [coords[:500], coords[500:]]):
+        chunks = list(
+            gedet.iter_distance_to_surface(source, chunk_size=100, signed=True)
+        )
+        assert max(len(c) for c in chunks) == 100
+        assert np.array_equal(np.concatenate(chunks), dists)
+
+    inside = np.concatenate(list(gedet.iter_is_inside(coords, chunk_size=300)))
+    assert np.array_equal(inside, gedet.is_inside(coords))
+
+
+def test_jagged_input():
+    gedet = InvertedCoax(configs.V07646A, registry=geant4.Registry())
+
+    rng = np.random.default_rng(11)
+    counts = rng.integers(0, 5, size=50)
+    flat = rng.uniform(-50, 100, size=(counts.sum(), 3))
+
+    hits = ak.Array(
+        {
+            "xloc": ak.unflatten(flat[:, 0], counts),
+            "yloc": ak.unflatten(flat[:, 1], counts),
+            "zloc": ak.unflatten(flat[:, 2], counts),
+        }
+    )[1:]
+    flat = flat[counts[0] :]
+
+    dists = gedet.distance_to_surface(hits, signed=True)
+    assert ak.all(ak.num(dists) == ak.num(hits.zloc))
+    assert np.array_equal(
+        ak.flatten(dists).to_numpy(), gedet.distance_to_surface(flat, signed=True)
+    )
+
+    for method in (gedet.is_inside, gedet.is_inside_borehole):
+        res = method(hits)
+        assert ak.all(ak.num(res) == ak.num(hits.zloc))
+        assert np.array_equal(ak.flatten(res).to_numpy(), method(flat))
+
+    with pytest.raises(ValueError):
+        gedet.distance_to_surface(hits[["xloc", "yloc"]])
+
+
+def test_distance_columns():
+    gedet = make_hpge(configs.V07646A, registry=None)
+
+    rng = np.random.default_rng(13)
+    coords = rng.uniform(-50, 100, size=(1000, 3))
+    x, y, z = (np.ascontiguousarray(c) for c in coords.T)
+
+    for kwargs in ({"signed": True}, {"surface_indices": [0, 3]}):
+        dists = gedet.distance_to_surface(coords, **kwargs)
+        assert np.array_equal(gedet.distance_to_surface_xyz(x, y, z, **kwargs), dists)
+        assert np.array_equal(
+            gedet.distance_to_surface_rz(np.sqrt(x**2 + y**2), z, **kwargs), dists
+        )
+
+    # columns can have a different precision
+    dists = gedet.distance_to_surface(coords.astype(np.float32))
+    assert np.array_equal(
+        gedet.distance_to_surface_xyz(
+            x.astype(np.float32), y.astype(np.float32), z.astype(np.float32)
+        ),
+        dists,
+    )
+
+    with pytest.raises(ValueError):
+        gedet.distance_to_surface_rz(x, z[:-1])
+
+
+def test_distance_float32():
+    gedet = make_hpge(configs.V07646A, registry=None)
+
+    rng = np.random.default_rng(17)
+    coords = rng.uniform(-50, 100, size=(5000, 3))
+
+    ref = gedet.distance_to_surface(coords, signed=True)
+
+    for kwargs in ({}, {"surface_indices": [1, 2, 5]}, {"max_error": 0.01}):
+        dists = gedet.distance_to_surface(
+            coords.astype(np.float32), signed=True, dtype=np.float32, **kwargs
+        )
+        assert dists.dtype == np.float32
+        if not kwargs:
+            assert np.allclose(dists, ref, rtol=0, atol=1e-4)
+
+    x, y, z = coords.astype(np.float32).T
+    dists = gedet.distance_to_surface_xyz(x, y, z, signed=True, dtype="float32")
+    assert dists.dtype == np.float32
+    assert np.allclose(dists, ref, rtol=0, atol=1e-4)
+
+    with pytest.raises(ValueError):
+        gedet.distance_to_surface(coords, dtype=np.int32)
+
+
+def test_distance_indices():
+    gedet = make_hpge(configs.V07646A, registry=None)
+
+    rng = np.random.default_rng(19)
+    coords = rng.uniform(-50, 100, size=(2000, 3))
+
+    dists, indices = gedet.distance_to_surface(coords, return_indices=True)
+    assert np.array_equal(dists, gedet.distance_to_surface(coords))
+
+    # the closest surface is at the same distance
+    for idx in np.unique(indices):
+        assert np.array_equal(
+            gedet.distance_to_surface(coords[indices == idx], surface_indices=[idx]),
+            dists[indices == idx],
+        )
+
+    # indices refer to the full list of surfaces
+    subset = [2, 5, 7]
+    _, sub_indices = gedet.distance_to_surface(
+        coords, surface_indices=subset, return_indices=True
+    )
+    assert set(np.unique(sub_indices)) <= set(subset)
+
+    codes = gedet.surface_type_codes
+    assert len(codes) == len(gedet.surfaces)
+    assert [SURFACE_TYPES[c] for c in codes] == gedet.surfaces
+
+    with pytest.raises(ValueError):
+        gedet.distance_to_surface(coords, max_error=0.1, return_indices=True)
+
+
+def test_distance_to_surface_types():
+    gedet = make_hpge(configs.V07646A, registry=None)
+
+    rng = np.random.default_rng(23)
+    coords = rng.uniform(-50, 100, size=(2000, 3))
+
+    dists = gedet.distance_to_surface_types(coords, signed=True)
+    assert dists.shape == (len(coords), len(SURFACE_TYPES))
+
+    surfaces = np.array(gedet.surfaces)
+    for i, name in enumerate(SURFACE_TYPES):
+        indices = np.flatnonzero(surfaces == name)
+        if len(indices) == 0:
+            assert np.all(np.isnan(dists[:, i]))
+        else:
+            assert np.array_equal(
+                dists[:, i],
+                gedet.distance_to_surface(coords, surface_indices=indices, signed=True),
+            )
+
+    # the overall closest surface
+    assert np.array_equal(
+        np.nanmin(np.abs(dists), axis=1), gedet.distance_to_surface(coords)
+    )
+
+    hits = ak.Array(
+        {
+            "xloc": ak.unflatten(coords[:, 0], [500, 1500]),
+            "yloc": ak.unflatten(coords[:, 1], [500, 1500]),
+            "zloc": ak.unflatten(coords[:, 2], [500, 1500]),
+        }
+    )
+    jagged = gedet.distance_to_surface_types(hits, surface_types=["pplus"])
+    assert ak.to_list(ak.num(jagged)) == [500, 1500]
+    assert np.array_equal(
+        ak.to_numpy(ak.flatten(jagged))[:, 0],
+        gedet.distance_to_surface_types(coords, surface_types=["pplus"])[:, 0],
+    )
+
+    cut = make_hpge(configs.V02160A, registry=None)
+    with pytest.raises(NotImplementedError):
+        cut.distance_to_surface_types(coords)
+
+
+@pytest.mark.parametrize("name", ["P00664B", "V02160A"])
+def test_distance_cut(name):
+    gedet = make_hpge(configs[name], registry=geant4.Registry())
+    normal, offset = gedet._cut_plane()
+
+    rng = np.random.default_rng(0)
+    radius = gedet.metadata.geometry.radius_in_mm
+    height = gedet.metadata.geometry.height_in_mm
+    coords = rng.uniform(
+        [-radius - 5, -radius - 5, -5], [radius + 5, radius + 5, height + 5], (2000, 3)
+    )
+
+    dists = gedet.distance_to_surface(coords, signed=True)
+    r = np.hypot(coords[:, 0], coords[:, 1])
+    polycone = gedet._profile_distance(r, coords[:, 2], signed=True)
+    height_plane = offset - coords @ normal
+
+    # inside: closest of the polycone surface and the cut plane
+    inside = (polycone > 0) & (height_plane > 0)
+    assert np.any(inside)
+    assert np.any(~inside)
+    assert np.allclose(dists[inside], np.minimum(polycone, height_plane)[inside])
+    assert np.all(dists[~inside] < 0)
+    assert np.array_equal(gedet.is_inside(coords), dists >= 0)
+
+    # outside: not closer than the polycone or the removed half-space
+    outside = polycone < 0
+    assert np.all(-dists[outside] >= -polycone[outside] - 1e-9)
+    removed = height_plane < 0
+    assert np.all(-dists[removed] >= -height_plane[removed] - 1e-9)
+
+    # compare to a sampling of the surface of the solid
+    profile_r, profile_z = gedet.get_profile()
+    phi = np.linspace(0, 2 * np.pi, 720, endpoint=False)
+    surface = []
+    for i in range(len(profile_r) - 1):
+        t = np.linspace(0, 1, 50)[:, None]
+        seg_r = profile_r[i] + t * (profile_r[i + 1] - profile_r[i])
+        seg_z = profile_z[i] + t * (profile_z[i + 1] - profile_z[i])
+        points = np.stack(
+            np.broadcast_arrays(seg_r * np.cos(phi), seg_r * np.sin(phi), seg_z), -1
+        ).reshape(-1, 3)
+        surface.append(points[points @ normal <= offset])
+
+    u = np.cross(normal, [0, 1, 0])
+    u /= np.linalg.norm(u)
+    v = np.cross(normal, u)
+    a, b = np.meshgrid(*2 * [np.arange(-100, 100, 0.5)])
+    points = offset * normal + a.reshape(-1, 1) * u + b.reshape(-1, 1) * v
+    keep = (
+        gedet._profile_distance(
+            np.hypot(points[:, 0], points[:, 1]), points[:, 2], signed=True
+        )
+        > 0
+    )
+    surface = np.concatenate([*surface, points[keep]])
+
+    for i in rng.choice(np.flatnonzero(removed & (polycone < 0)), 20):
+        brute = np.min(np.linalg.norm(surface - coords[i], axis=1))
+        assert -dists[i] <= brute + 1e-9
+        assert -dists[i] == pytest.approx(brute, abs=0.5)
+
+
+@pytest.mark.parametrize("name", ["V02162B", "V06649M", "V07646A"])
+def test_is_inside_profile(name):
+    gedet = make_hpge(configs[name], registry=geant4.Registry())
+
+    rng = np.random.default_rng(0)
+    radius = gedet.metadata.geometry.radius_in_mm
+    height = gedet.metadata.geometry.height_in_mm
+    coords = rng.uniform(
+        [-radius - 5, -radius - 5, -5], [radius + 5, radius + 5, height + 5], (5000, 3)
+    )
+
+    # points on the profile vertices are inside within the tolerance
+    profile_r, profile_z = gedet.get_profile()
+    coords = np.vstack([coords, np.c_[profile_r, np.zeros(len(profile_r)), profile_z]])
+
+    inside = gedet.is_inside(coords)
+    assert np.array_equal(inside, gedet.distance_to_surface(coords, signed=True) >= 0)
+    assert np.all(inside[-len(profile_r) :])
+
+    s1, s2 = utils.get_line_segments(np.array(profile_r), np.array(profile_z))
+    rz = np.c_[np.hypot(coords[:, 0], coords[:, 1]), coords[:, 2]]
+    assert np.array_equal(utils.is_inside_profile(s1, s2, rz), inside)
+
+    # just outside the surface
+    assert not gedet.is_inside([[radius + 1e-6, 0, height / 2]])[0]
+    assert gedet.is_inside([[radius + 1e-6, 0, height / 2]], tol=1e-5)[0]
+
+
+def test_is_inside_tol():
+    gedet = make_hpge(configs.V07646A, registry=geant4.Registry())
+
+    rng = np.random.default_rng(1)
+    coords = rng.uniform([-50, -50, -10], [50, 50, 90], (20000, 3))
+    dists = gedet.distance_to_surface(coords, signed=True)
+    for tol in (1e-11, 1e-3, 0.5):
+        assert np.array_equal(gedet.is_inside(coords, tol=tol), dists >= -tol)
+
+    # 5 mm below the outer corner of the groove, 0.4 mm below it and in the groove
+    coords = np.array([[15, 0, -5], [15, 0, -0.4], [12.5, 0, 1]])
+    assert np.array_equal(gedet.is_inside(coords, tol=0.5), [False, True, False])
+
+    # the sign of the distance with the same tol is positive for the first point
+    assert gedet.distance_to_surface(coords[:1], tol=0.5, signed=True)[0] == 5
+
+
+def _semicoax_metadata():
+    metadata = configs.V02162B.copy()
+    metadata["type"] = "coax"
+    metadata["geometry"] = {
+        "height_in_mm": 80,
+        "radius_in_mm": 35,
+        "borehole": {"radius_in_mm": 5, "depth_in_mm": 60},
+        "groove": {"depth_in_mm": 2, "radius_in_mm": {"outer": 20, "inner": 15}},
+        "taper": {
+            "top": {"angle_in_deg": 45, "height_in_mm": 5},
+            "bottom": {"angle_in_deg": 0, "height_in_mm": 0},
+            "borehole": {"angle_in_deg": 10, "height_in_mm": 10},
+        },
+    }
+    return metadata
+
+
+@pytest.mark.parametrize(
+    "name", ["SemiCoax", "V02160A", "V02162B", "V06649M", "V07646A"]
+)
+def test_is_inside_borehole(name):
+    metadata = _semicoax_metadata() if name == "SemiCoax" else configs[name]
+    gedet = make_hpge(metadata, registry=geant4.Registry())
+
+    rng = np.random.default_rng(0)
+    radius = gedet.metadata.geometry.radius_in_mm
+    height = gedet.metadata.geometry.height_in_mm
+    coords = rng.uniform(
+        [-radius - 5, -radius - 5, -5], [radius + 5, radius + 5, height + 5], (5000, 3)
+    )
+
+    # the borehole is the empty region within its bounding cylinder
+    r = np.hypot(coords[:, 0], coords[:, 1])
+    in_cylinder = (
+        (r < max(gedet.borehole_r))
+        & (coords[:, 2] > min(gedet.borehole_z))
+        & (coords[:, 2] < max(gedet.borehole_z))
+    )
+    inside = gedet.is_inside_borehole(coords)
+    assert np.any(inside)
+    assert np.array_equal(inside, in_cylinder & ~gedet.is_inside(coords))
+
+    # points on the surface are inside
+    assert np.all(
+        gedet.is_inside_borehole(
+            np.c_[gedet.borehole_r, np.zeros(len(gedet.borehole_r)), gedet.borehole_z]
+        )
+    )
+
+    hits = ak.Array(
+        {"xloc": [coords[:2, 0]], "yloc": [coords[:2, 1]], "zloc": [coords[:2, 2]]}
+    )
+    assert ak.to_list(gedet.is_inside_borehole(hits)) == [inside[:2].tolist()]
+
+
+def test_no_borehole():
+    gedet = make_hpge(configs.P00664B, registry=geant4.Registry())
+
+    with pytest.raises(NotImplementedError):
+        gedet.is_inside_borehole([[0, 0, 0]])
+
+
+def test_segment_table():
+    names = ["P00664B", "V02160A", "V02162B", "V06649M", "V07646A"]
+    detectors = {
+        1104000 + i: make_hpge(configs[name], registry=geant4.Registry())
+        for i, name in enumerate(names)
+    }
+    table = SegmentTable(detectors)
+
+    assert len(table) == 5
+    assert table.offsets[-1] == len(table.s1) == len(table.surface_codes)
+
+    rng = np.random.default_rng(0)
+    det_id = rng.choice(list(detectors), 2000)
+    coords = rng.uniform([-45, -45, -5], [45, 45, 95], (2000, 3))
+
+    for dtype in (np.float64, np.float32):
+        dists = table.distance_to_surface(det_id, *coords.T, signed=True, dtype=dtype)
+        assert dists.dtype == dtype
+
+        for key, gedet in detectors.items():
+            mask = det_id == key
+            assert np.array_equal(
+                dists[mask],
+                gedet.distance_to_surface(coords[mask], signed=True, dtype=dtype),
+            )
+
+    # the closest segments are only defined for detectors without a cut
+    uncut = ~table.has_cut[table.rows(det_id)]
+    _, indices = table.distance_to_surface(
+        det_id[uncut], *coords[uncut].T, return_indices=True
+    )
+    for key, gedet in detectors.items():
+        mask = det_id[uncut] == key
+        row = table.rows([key])[0]
+        assert np.all(indices[mask] >= table.offsets[row])
+        assert np.all(indices[mask] < table.offsets[row + 1])
+
+        if np.any(mask):
+            _, expected = gedet.distance_to_surface(
+                coords[uncut][mask], return_indices=True
+            )
+            assert np.array_equal(
+                table.surface_codes[indices[mask]], gedet.surface_type_codes[expected]
+            )
+
+    with pytest.raises(NotImplementedError):
+        table.distance_to_surface(det_id, *coords.T, return_indices=True)
+
+    assert np.all(table.distance_to_surface(det_id, *coords.T) >= 0)
+
+    # sequences are numbered from zero
+    table = SegmentTable(list(detectors.values()))
+    assert np.array_equal(table.ids, np.arange(5))
+
+    with pytest.raises(ValueError):
+        table.distance_to_surface([7], [0], [0], [0])
+
+    with pytest.raises(ValueError):
+        table.distance_to_surface([0, 1], [0], [0], [0])
+
+
+def test_profile_segments_cache():
+    gedet = make_hpge(configs.V07646A, registry=geant4.Registry())
+
+    profile = gedet.get_profile_segments()
+    assert gedet.get_profile_segments() is profile
+    assert not profile.s1.flags.writeable
+    assert np.array_equal(profile.surface_codes, gedet.surface_type_codes)
+    assert np.allclose(profile.lengths, np.linalg.norm(profile.s2 - profile.s1, axis=1))
+
+    coords = np.array([[0, 0, 1], [0, 0, -5]])
+    dists = gedet.distance_to_surface(coords)
+
+    # changing the profile invalidates the cache
+    gedet.solid.pZ[:] = [z + 1 for z in gedet.solid.pZ]
+    assert gedet.get_profile_segments() is not profile
+    assert np.allclose(gedet.distance_to_surface(coords), dists + np.array([-1.0, 1.0]))
+    assert np.array_equal(gedet.is_inside([[0, 0, 0.5], [0, 0, 1.5]]), [False, True])
+
+    gedet.surfaces[0] = "passive"
+    assert gedet.surface_type_codes[0] == SURFACE_TYPES.index("passive")
+
+
+def test_num_threads(monkeypatch):
+    assert utils.get_num_threads() == 1
+
+    with pytest.raises(ValueError):
+        utils.set_num_threads(0)
+    with pytest.raises(ValueError):
+        utils.set_num_threads(numba.config.NUMBA_NUM_THREADS + 1)
+
+    names = ["P00664B", "V02160A", "V07646A"]
+    detectors = [make_hpge(configs[name], registry=geant4.Registry()) for name in names]
+    table = SegmentTable(detectors)
+
+    rng = np.random.default_rng(0)
+    coords = rng.uniform([-45, -45, -5], [45, 45, 95], (2000, 3))
+    det_id = rng.integers(0, 3, 2000)
+
+    def evaluate():
+        return [
+            *(gedet.distance_to_surface(coords, signed=True) for gedet in detectors),
+            detectors[2].distance_to_surface(coords, signed=True, optimised=True),
+            detectors[2].distance_to_surface_types(coords, signed=True),
+            *(gedet.is_inside(coords) for gedet in detectors),
+            *(gedet.is_inside_borehole(coords) for gedet in detectors[1:]),
+            table.distance_to_surface(det_id, *coords.T, signed=True),
+            table.distance_to_surface(
+                det_id[det_id == 2], *coords[det_id == 2].T, return_indices=True
+            )[1],
+            utils.radius(*coords[:, :2].T),
+            detectors[2].activeness(coords, {"nplus": (1, 0.5)}, model="linear"),
+            detectors[2].is_active(coords, {"nplus": 1, "pplus": 0.5}),
+        ]
+
+    serial = evaluate()
+
+    # the serial kernels release the GIL and can be called from a thread pool
+    with ThreadPoolExecutor(2) as pool:
+        chunks = list(
+            pool.map(detectors[2].distance_to_surface, np.array_split(coords, 4))
+        )
+    assert np.array_equal(np.concatenate(chunks), np.abs(serial[2]))
+
+    # force the parallel kernels, also on machines with a single core
+    monkeypatch.setattr(utils, "_num_threads", 2)
+    monkeypatch.setattr(numba, "set_num_threads", lambda _: None)
+    assert (
+        utils._dispatch(utils._is_inside_profile)
+        is utils._PARALLEL_KERNELS[utils._is_inside_profile]
+    )
+
+    for expected, result in zip(serial, evaluate(), strict=True):
+        assert np.array_equal(expected, result)
+
+
+def test_activeness():
+    gedet = make_hpge(configs.V07646A, registry=geant4.Registry())
+
+    rng = np.random.default_rng(0)
+    coords = rng.uniform([-45, -45, -5], [45, 45, 85], (5000, 3))
+
+    # reference from the distances to each surface type
+    dists = gedet.distance_to_surface_types(coords)
+    inside = gedet.is_inside(coords)
+
+    step = gedet.activeness(coords, {"nplus": 1})
+    assert np.array_equal(step, inside & (dists[:, 0] >= 1))
+
+    linear = gedet.activeness(
+        coords, {"nplus": (1, 0.5), "pplus": (0.2, 0.1)}, model="linear"
+    )
+    expected = np.minimum(
+        np.clip((dists[:, 0] - 0.5) / 0.5, 0, 1),
+        np.clip((dists[:, 1] - 0.1) / 0.1, 0, 1),
+    )
+    assert np.allclose(linear, np.where(inside, expected, 0), rtol=0, atol=1e-12)
+    assert np.any((linear > 0) & (linear < 1))
+
+    # no dead layer
+    assert np.array_equal(gedet.activeness(coords, {}), inside)
+
+    @numba.njit
+    def quadratic(distance, fccd, _transition):
+        return min((distance / fccd) ** 2, 1.0)
+
+    user = gedet.activeness(coords, {"nplus": 2}, model=quadratic)
+    assert np.allclose(
+        user, np.where(inside, np.minimum((dists[:, 0] / 2) ** 2, 1), 0), atol=1e-12
+    )
+
+    hits = ak.Array(
+        {"xloc": [coords[:2, 0]], "yloc": [coords[:2, 1]], "zloc": [coords[:2, 2]]}
+    )
+    assert ak.to_list(gedet.activeness(hits, {"nplus": 1})) == [step[:2].tolist()]
+
+    with pytest.raises(ValueError):
+        gedet.activeness(coords, {"bulk": 1})
+    with pytest.raises(ValueError):
+        gedet.activeness(coords, {"nplus": (1, 2)})
+    with pytest.raises(ValueError):
+        gedet.activeness(coords, {"nplus": 1}, model="exponential")
+    with pytest.raises(TypeError):
+        gedet.activeness(coords, {"nplus": 1}, model=lambda d, f, t: d)  # noqa: ARG005
+
+    # the face of the cut is a passive surface, as for the distances
+    cut = make_hpge(configs.V02160A, registry=geant4.Registry())
+    dists = cut.distance_to_surface(coords, signed=True)
+    assert np.array_equal(
+        cut.activeness(coords, dict.fromkeys(SURFACE_TYPES, 1)), dists >= 1
+    )
+    assert np.array_equal(cut.activeness(coords, {}), cut.is_inside(coords))
+
+
+def test_active_energy():
+    gedet = make_hpge(configs.V07646A, registry=geant4.Registry())
+    other = make_hpge(configs.V02162B, registry=geant4.Registry())
+
+    rng = np.random.default_rng(0)
+    n_hits = 3000
+    coords = rng.uniform([-45, -45, -5], [45, 45, 85], (n_hits, 3))
+    counts = np.diff(np.r_[0, np.sort(rng.integers(0, n_hits, 499)), n_hits])
+    hits = ak.unflatten(
+        ak.Array(
+            {
+                "xloc": coords[:, 0],
+                "yloc": coords[:, 1],
+                "zloc": coords[:, 2],
+                "edep": rng.uniform(0, 100, n_hits),
+                "det_uid": rng.choice([7, 9], n_hits),
+            }
+        ),
+        counts,
+    )
+    assert np.any(counts == 0)
+
+    fccd = {"nplus": (1, 0.5), "passive": 0.1}
+    energy = gedet.active_energy(hits, fccd, model="linear")
+    expected = ak.sum(hits.edep * gedet.activeness(hits, fccd, model="linear"), axis=1)
+    assert energy.shape == (500,)
+    assert np.allclose(energy, expected, rtol=1e-12, atol=0)
+
+    # each hit in its detector, with a different dead layer
+    table = SegmentTable({7: gedet, 9: other})
+    fccds = {7: fccd, 9: {"nplus": 2}}
+    energy = table.active_energy(hits, fccds, model="linear")
+    assert energy.shape == (500, 2)
+
+    for col, (det_id, hpge) in enumerate([(7, gedet), (9, other)]):
+        selected = hits[hits.det_uid == det_id]
+        activeness = hpge.activeness(selected, fccds[det_id], model="linear")
+        assert np.allclose(
+            energy[:, col], ak.sum(selected.edep * activeness, axis=1), rtol=1e-12
+        )
+
+    # a dead layer common to all the detectors
+    assert np.array_equal(
+        table.active_energy(hits, {"nplus": 1})[:, 0],
+        table.active_energy(hits, {7: {"nplus": 1}, 9: {"nplus": 1}})[:, 0],
+    )
+
+    with pytest.raises(ValueError):
+        gedet.active_energy(ak.flatten(hits), fccd)
+    with pytest.raises(ValueError):
+        SegmentTable({7: gedet}).active_energy(hits, fccd)
+
+    # detectors with a cut
+    cut = make_hpge(configs.V02160A, registry=geant4.Registry())
+    energy = SegmentTable({7: gedet, 9: cut}).active_energy(hits, fccd, model="linear")
+    selected = hits[hits.det_uid == 9]
+    expected = ak.sum(
+        selected.edep * cut.activeness(selected, fccd, model="linear"), axis=1
+    )
+    assert np.allclose(energy[:, 1], expected, rtol=1e-12)
+    assert np.allclose(
+        cut.active_energy(selected, fccd, model="linear"), expected, rtol=1e-12
+    )
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+import pygeomhpges
+
+# budget for `import pygeomhpges`, in seconds. It takes about 10 ms, the
+# detector classes (with pyg4ometry, numba and awkward) take seconds
+IMPORT_TIME_BUDGET = 0.5
+
+HEAVY_MODULES = ("awkward", "matplotlib", "numba", "pint", "pyg4ometry", "vtk")
+
+
+def test_import_time():
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import pygeomhpges\n"
+        "print(time.perf_counter() - start)\n"
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])\n"
+    )
+    # the best of a few runs, to be robust against a busy machine
+    times = []
+    for _ in range(3):
+        out = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout.splitlines()
+        times.append(float(out[0]))
+        assert out[1] == "[]"
+
+    assert min(times) < IMPORT_TIME_BUDGET
+
+
+def test_lazy_attributes():
+    assert set(pygeomhpges.__all__) <= set(dir(pygeomhpges))
+
+    for name in pygeomhpges.__all__:
+        assert getattr(pygeomhpges, name) is not None
+
+    assert callable(pygeomhpges.make_hpge)
+    assert pygeomhpges.HPGe.__name__ == "HPGe"
+
+    with pytest.raises(AttributeError):
+        pygeomhpges.Unknown  # noqa: B018
+
+
+@pytest.mark.parametrize(
+    "statement",
+    ["import pygeomhpges.make_hpge", "from pygeomhpges.make_hpge import make_hpge"],
+)
+def test_make_hpge_submodule(statement):
+    # the submodule imported first does not shadow the function
+    code = (
+        f"{statement}\n"
+        "import pygeomhpges\n"
+        "from pygeomhpges import make_hpge\n"
+        "assert callable(make_hpge)\n"
+        "assert pygeomhpges.make_hpge is make_hpge\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
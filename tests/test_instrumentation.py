@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import logging
+import pathlib
+
+import awkward as ak
+import numba
+import numpy as np
+import pytest
+from dbetto import TextDB
+from pyg4ometry import geant4
+
+from pygeomhpges import SegmentTable, instrument, instrumentation, make_hpge
+
+configs = TextDB(pathlib.Path(__file__).parent.resolve() / "configs")
+
+
+def test_instrument(caplog):
+    assert not instrumentation.enabled()
+
+    with instrument(trace_memory=True, log_level=logging.INFO) as stats:
+        assert instrumentation.enabled()
+
+        gedet = make_hpge(configs.V07646A, registry=geant4.Registry())
+
+        rng = np.random.default_rng(0)
+        coords = rng.uniform([-45, -45, -5], [45, 45, 85], (1000, 3))
+        dists = gedet.distance_to_surface(coords)
+        gedet.distance_to_surface(coords, surface_indices=[0, 1])
+        gedet.is_inside(coords)
+
+    assert not instrumentation.enabled()
+
+    for name in ("make_hpge", "distance_to_surface", "is_inside"):
+        assert stats[name]["calls"] == (2 if name == "distance_to_surface" else 1)
+        assert stats[name]["time_s"] > 0
+        assert stats[name]["peak_memory_bytes"] > 0
+
+    # the sections record the points and the nested sections
+    kernel = stats["distance_kernel"]
+    assert kernel["calls"] == 2
+    assert kernel["points"] == 2000
+    assert stats["inside_kernel"]["points"] == 1000
+    assert stats["convert_coords"]["points"] == 3000
+    assert (
+        stats["distance_to_surface"]["peak_memory_bytes"] >= kernel["peak_memory_bytes"]
+    )
+
+    # the grid prunes most of the segments
+    n_segments = len(gedet.get_profile_segments().s1)
+    assert kernel["segments_evaluated"] + kernel["segments_pruned"] == 1000 * (
+        n_segments + 2
+    )
+    assert kernel["segments_pruned"] > kernel["segments_evaluated"]
+
+    assert "instrumentation statistics" in caplog.text
+    assert "distance_kernel: calls=2" in caplog.text
+
+    # nothing is recorded outside of the block, the results do not change
+    gedet.distance_to_surface(coords)
+    assert stats["distance_to_surface"]["calls"] == 2
+    assert np.array_equal(dists, gedet.distance_to_surface(coords))
+
+    with instrument() as stats, pytest.raises(RuntimeError), instrument():
+        pass
+
+    assert not instrumentation.enabled()
+
+
+def test_instrument_kernels():
+    gedet = make_hpge(configs.V02162B, registry=geant4.Registry())
+    cut = make_hpge(configs.V02160A, registry=geant4.Registry())
+
+    rng = np.random.default_rng(0)
+    coords = rng.uniform([-45, -45, -5], [45, 45, 85], (1000, 3))
+    hits = ak.Array({"xloc": coords[:, 0], "yloc": coords[:, 1], "zloc": coords[:, 2]})
+
+    with instrument() as stats:
+        gedet.distance_to_surface(coords, optimised=True)
+        cut.distance_to_surface(hits)
+        SegmentTable([gedet, cut]).distance_to_surface(
+            np.repeat([0, 1], 500), *coords.T
+        )
+
+    # the optimised kernel prunes the segments by distance
+    kernel = stats["distance_kernel"]
+    n_segments = len(gedet.get_profile_segments().s1)
+    assert 0 < kernel["segments_evaluated"] < 1000 * n_segments
+
+    assert stats["cut_kernel"]["points"] == 1000
+    assert stats["segment_table_kernel"]["points"] == 1000
+    assert stats["segment_table_kernel"]["segments_evaluated"] == 500 * (
+        n_segments + len(cut.get_profile_segments().s1)
+    )
+
+
+def test_instrument_compile():
+    @numba.njit
+    def double(x):
+        return 2 * x
+
+    with instrument() as stats:
+        double(1)
+        double(1.0)
+        double(1)
+
+    assert stats["numba_compile"]["calls"] == 2
+    assert stats["numba_compile"]["time_s"] > 0
+    assert stats["numba_compile"]["functions"] == {
+        "test_instrument_compile.<locals>.double": 2
+    }
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import math
+import pathlib
+
+import awkward as ak
+import numpy as np
+import pytest
+from dbetto import TextDB
+from pyg4ometry import geant4
+
+from pygeomhpges import make_hpge
+from pygeomhpges.offset import (
+    cut_offset_volume,
+    max_offset,
+    offset_profile,
+    offset_volume,
+)
+
+configs = TextDB(pathlib.Path(__file__).parent.resolve() / "configs")
+
+
+def test_offset_volume():
+    radius, height = 10, 20
+    d = np.array([0, 0.5, 1, 2])
+
+    # all the surfaces of a cylinder, in both orientations
+    expected = math.pi * (radius - d) ** 2 * (height - 2 * d)
+    for r, z, offset in (
+        ([0, radius, radius, 0], [0, 0, height, height], [1, 1, 1, 0]),
+        ([0, radius, radius, 0][::-1], [0, 0, height, height][::-1], [1, 1, 1, 0]),
+    ):
+        assert np.allclose(offset_volume(offset_profile(r, z, offset), d), expected)
+
+    # half of the bottom face, the dead layer ends with a quarter of torus
+    profile = offset_profile(
+        [0, radius / 2, radius, radius, 0], [0, 0, 0, height, height], [1, 0, 0, 0, 0]
+    )
+    c = radius / 2
+    expected = math.pi * radius**2 * height - (
+        math.pi * c**2 * d + 2 * math.pi * (c * math.pi * d**2 / 4 + d**3 / 3)
+    )
+    assert np.allclose(offset_volume(profile, d), expected)
+
+    # borehole, with an arc around the reflex corner at its bottom
+    b, h = 3, 8
+    profile = offset_profile(
+        [0, radius, radius, b, b, 0],
+        [0, 0, height, height, height - h, height - h],
+        [1, 1, 1, 1, 1, 0],
+    )
+    expected = (
+        math.pi * (radius - d) ** 2 * (height - h - 2 * d)
+        + math.pi * ((radius - d) ** 2 - (b + d) ** 2) * h
+        + 2 * math.pi * ((b + d / 2) * d**2 - b * math.pi * d**2 / 4 - d**3 / 3)
+    )
+    assert np.allclose(offset_volume(profile, d), expected)
+    assert max_offset(profile) == pytest.approx((radius - b) / 2)
+
+    # cylinder cut by the planes x = c and z = c, offset with the other faces
+    profile = offset_profile(
+        [0, radius, radius, 0], [0, 0, height, height], [1, 1, 1, 0]
+    )
+    c = 4
+    expected = (height - 2 * d) * (
+        (radius - d) ** 2 * np.arccos(-(c - d) / (radius - d))
+        + (c - d) * np.sqrt((radius - d) ** 2 - (c - d) ** 2)
+    )
+    volume = cut_offset_volume(profile, np.array([1.0, 0, 0]), c, 1, d)
+    assert np.allclose(volume, expected)
+
+    expected = math.pi * (radius - d) ** 2 * (c - 2 * d)
+    volume = cut_offset_volume(profile, np.array([0, 0, 1.0]), c, 1, d)
+    assert np.allclose(volume, expected)
+
+
+def test_active_volume():
+    gedet = make_hpge(configs.V07646A, registry=geant4.Registry())
+
+    fccd = np.array([[0, 0.5], [1, 2]])
+    volume, mass = gedet.active_volume(fccd)
+    assert volume.shape == (2, 2)
+    assert volume[0, 0].m_as("mm**3") == pytest.approx(gedet.volume.m_as("mm**3"))
+    assert mass[0, 0].m_as("g") == pytest.approx(gedet.mass.m_as("g"))
+    assert np.all(np.diff(volume.m.ravel()) < 0)
+
+    # fraction of the points of the volume farther than the FCCD from the surfaces
+    coords = gedet.sample_volume(200_000, rng=0)
+    dists = gedet.distance_to_surface_types(coords)
+    for surface_types, columns in ((["nplus"], [0]), (["nplus", "pplus"], [0, 1])):
+        volume, _ = gedet.active_volume(fccd.ravel(), surface_types)
+        fraction = [
+            np.mean(np.all(dists[:, columns] >= d, axis=1)) for d in fccd.ravel()
+        ]
+        assert np.allclose(volume / gedet.volume, fraction, rtol=0, atol=2e-3)
+
+    with pytest.raises(ValueError):
+        gedet.active_volume(10)
+    with pytest.raises(ValueError):
+        gedet.active_volume(-1)
+    with pytest.raises(ValueError):
+        gedet.active_volume(1, "bulk")
+
+    # the face of the cut is a passive surface
+    gedet = make_hpge(configs.V02160A, registry=geant4.Registry())
+    coords = gedet.sample_volume(200_000, rng=0)
+    for surface_types in (["nplus"], ["nplus", "passive"]):
+        volume, _ = gedet.active_volume(fccd.ravel(), surface_types)
+        fraction = [
+            np.mean(gedet.is_active(coords, dict.fromkeys(surface_types, d)))
+            for d in fccd.ravel()
+        ]
+        assert np.allclose(volume / volume[0], fraction, rtol=0, atol=2e-3)
+
+
+def test_is_active():
+    gedet = make_hpge(configs.V07646A, registry=geant4.Registry())
+
+    rng = np.random.default_rng(0)
+    coords = rng.uniform([-45, -45, -5], [45, 45, 85], (100_000, 3))
+
+    for fccd in ({"nplus": 1}, {"nplus": (2, 1), "pplus": 0.3, "passive": 0.5}, {}):
+        active = gedet.is_active(coords, fccd)
+        assert np.array_equal(active, gedet.activeness(coords, fccd) == 1)
+
+    # the region is cached for the last FCCD
+    region = gedet.get_active_region({"nplus": 1, "pplus": 0.5})
+    assert gedet.get_active_region({"nplus": 1, "pplus": 0.5}) is region
+    assert gedet.get_active_region({"nplus": 1}) is not region
+
+    # its volume is that of the sampled points in it
+    coords = gedet.sample_volume(100_000, rng=1)
+    fraction = np.mean(gedet.is_active(coords, {"nplus": 1, "pplus": 0.5}))
+    assert region.volume / gedet.volume.m_as("mm**3") == pytest.approx(
+        fraction, abs=3e-3
+    )
+    assert gedet.get_active_region({"nplus": 2}).volume == pytest.approx(
+        gedet.active_volume(2)[0].m_as("mm**3")
+    )
+
+    hits = ak.Array(
+        {"xloc": [[0, 20], [39.5]], "yloc": [[0, 0], [0]], "zloc": [[10, 1.5], [50]]}
+    )
+    assert gedet.is_active(hits, {"nplus": 1}).tolist() == [[True, True], [False]]
+
+    with pytest.raises(ValueError):
+        gedet.is_active(coords, {"nplus": 10})
+
+    # the face of the cut is a passive surface
+    gedet = make_hpge(configs.V02160A, registry=geant4.Registry())
+    coords = rng.uniform([-45, -45, -5], [45, 45, 85], (100_000, 3))
+    for fccd in ({"nplus": 1}, {"nplus": 1, "passive": 0.5}):
+        active = gedet.is_active(coords, fccd)
+        assert np.array_equal(active, gedet.activeness(coords, fccd) == 1)
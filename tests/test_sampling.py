@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import math
+import pathlib
+
+import numpy as np
+import pytest
+from dbetto import TextDB
+from pyg4ometry import geant4
+
+from pygeomhpges import SURFACE_TYPES, make_hpge
+from pygeomhpges.sampling import sample_segments, sample_slices, volume_slices
+
+configs = TextDB(pathlib.Path(__file__).parent.resolve() / "configs")
+
+
+def test_volume_slices():
+    # hollow cylinder on top of a cone
+    slices = volume_slices([0, 10, 10, 2, 2, 0], [0, 10, 20, 20, 10, 10])
+
+    assert np.allclose(slices.z, [[0, 10], [10, 20]])
+    assert np.allclose(slices.r_inner, [[0, 0], [2, 2]])
+    assert np.allclose(slices.r_outer, [[0, 10], [10, 10]])
+    assert np.allclose(slices.volumes, [math.pi * 1000 / 3, math.pi * 960])
+
+    # the density of z in a cone increases as z^2
+    rng = np.random.default_rng(0)
+    r, z = sample_slices(volume_slices([0, 10, 0], [0, 10, 10]), 100_000, rng)
+    assert np.all(r <= z + 1e-12)
+    assert np.isclose(np.mean(z), 7.5, atol=0.02)
+
+
+@pytest.mark.parametrize("name", ["V07646A", "V02162B", "P00664B", "V02160A"])
+def test_sample_volume(name):
+    gedet = make_hpge(configs[name], registry=geant4.Registry())
+
+    coords = gedet.sample_volume(20_000, rng=np.random.default_rng(1))
+    assert coords.shape == (20_000, 3)
+    assert np.all(gedet.is_inside(coords))
+
+    # seeded generators give the same points
+    assert np.array_equal(coords, gedet.sample_volume(20_000, rng=1))
+    assert not np.array_equal(coords, gedet.sample_volume(20_000, rng=2))
+
+    if gedet._cut_plane() is None:
+        slices = gedet._get_volume_slices()
+        assert np.isclose(slices.volumes.sum(), gedet.volume.m_as("mm**3"))
+
+    # same distribution as the points of a box inside the detector
+    r, z = gedet.get_profile()
+    r_max = max(r)
+    rng = np.random.default_rng(2)
+    box = rng.uniform([-r_max, -r_max, min(z)], [r_max, r_max, max(z)], (200_000, 3))
+    box = box[gedet.is_inside(box)]
+
+    n = len(box)
+    coords = gedet.sample_volume(n, rng=3)
+    for axis, bins in (
+        (0, np.linspace(-r_max, r_max, 11)),
+        (2, np.linspace(min(z), max(z), 11)),
+    ):
+        expected = np.histogram(box[:, axis], bins)[0] / n
+        observed = np.histogram(coords[:, axis], bins)[0] / n
+        assert np.allclose(observed, expected, atol=0.01)
+
+
+def test_sample_segments():
+    # lateral surface of a cone and its base, of areas sqrt(2) pi R^2 and pi R^2
+    s1 = np.array([[0.0, 0.0], [10.0, 10.0]])
+    s2 = np.array([[10.0, 10.0], [0.0, 10.0]])
+    areas = np.pi * 100 * np.array([math.sqrt(2), 1])
+
+    rng = np.random.default_rng(0)
+    r, z = sample_segments(s1, s2, areas, 100_000, rng)
+
+    on_base = z == 10
+    assert np.allclose(r[~on_base], z[~on_base])
+    assert np.isclose(np.mean(on_base), 1 / (1 + math.sqrt(2)), atol=0.005)
+    assert np.isclose(np.mean(r[on_base]), 20 / 3, atol=0.05)
+    assert np.isclose(np.mean(r[~on_base]), 20 / 3, atol=0.05)
+
+
+@pytest.mark.parametrize("name", ["V07646A", "P00664B", "V02160A"])
+def test_sample_surface(name):
+    gedet = make_hpge(configs[name], registry=geant4.Registry())
+
+    coords = gedet.sample_surface(10_000, rng=np.random.default_rng(1))
+    assert coords.shape == (10_000, 3)
+    assert np.all(gedet.distance_to_surface(coords) < 1e-9)
+    assert np.array_equal(coords, gedet.sample_surface(10_000, rng=1))
+
+    if gedet._cut_plane() is None:
+        profile = gedet.get_profile_segments()
+        for code, surface_type in enumerate(SURFACE_TYPES):
+            indices = np.flatnonzero(profile.surface_codes == code)
+            coords = gedet.sample_surface(1000, surface_type, rng=2)
+            dists = gedet.distance_to_surface(coords, surface_indices=indices)
+            assert np.all(dists < 1e-9)
+    else:
+        normal, offset = gedet._cut_plane()
+        assert np.all(coords @ normal <= offset)
+
+    with pytest.raises(ValueError):
+        gedet.sample_surface(10, "bulk")
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import awkward as ak
 import numpy as np
+import pytest
 
-from pygeomhpges import utils
+from pygeomhpges import precompilation, utils
 
 
 def test_distances():
@@ -156,3 +158,127 @@ def test_plane_distance_constrained():
         np.array([np.nan, 1, np.nan, 0.1]),
         equal_nan=True,
     )
+
+
+def test_nearest_segment_distance():
+    # closed profile with horizontal, vertical and tapered segments
+    r = np.array([0, 10, 10, 30, 40, 40, 5, 5, 0])
+    z = np.array([0, 0, 2, 2, 10, 80, 80, 50, 50])
+    s1, s2 = utils.get_line_segments(r, z)
+
+    rng = np.random.default_rng(42)
+    points = np.column_stack([rng.uniform(-5, 50, 10000), rng.uniform(-10, 90, 10000)])
+
+    # include the vertices, where several segments are equally close
+    points = np.vstack([points, np.column_stack([r, z])])
+
+    for signed in (True, False):
+        ref = utils.shortest_distance(s1, s2, points, signed=signed)
+        ref_idx = np.abs(ref).argmin(axis=1)
+
+        dists, idx = utils.nearest_segment_distance(s1, s2, points, 1e-11, signed)
+
+        assert dists.shape == (len(points),)
+        assert np.array_equal(dists, ref[np.arange(len(points)), ref_idx])
+        assert np.array_equal(idx, ref_idx)
+
+
+def test_segment_grid():
+    # detailed profile with many segments
+    t = np.linspace(0, 1, 100)[1:]
+    r = np.concatenate([[0], 40 * t, 40 + 0.5 * np.sin(t * 30), 40 * (1 - t)])
+    z = np.concatenate([[0], np.zeros(99), 80 * t, np.full(99, 80)])
+    s1, s2 = utils.get_line_segments(r, z)
+
+    grid = utils.build_segment_grid(s1, s2, n_cells=256)
+    assert len(grid.offsets) == np.prod(grid.shape) + 1
+    assert grid.offsets[-1] == len(grid.segments)
+
+    # far fewer candidates than segments per cell
+    assert len(grid.segments) < 0.2 * len(s1) * np.prod(grid.shape)
+
+    rng = np.random.default_rng(7)
+    points = np.column_stack([rng.uniform(0, 80, 10000), rng.uniform(-40, 120, 10000)])
+    points = np.vstack([points, np.column_stack([r, z])])
+
+    for signed in (True, False):
+        ref_dists, ref_idx = utils.nearest_segment_distance(
+            s1, s2, points, 1e-11, signed
+        )
+        dists, idx = utils.nearest_segment_distance_grid(
+            s1, s2, points, grid, signed=signed
+        )
+
+        assert np.array_equal(dists, ref_dists)
+        assert np.array_equal(idx, ref_idx)
+
+    with pytest.raises(ValueError):
+        utils.build_segment_grid(np.array([[0, 0]]), np.array([[0, 0]]))
+
+
+def test_iterate_chunks():
+    coords = np.arange(30, dtype=np.int32).reshape(10, 3)
+
+    chunks = list(utils.iterate_chunks(coords, chunk_size=4))
+    assert [len(c) for c in chunks] == [4, 4, 2]
+    assert all(c.dtype == np.float64 for c in chunks)
+    assert np.array_equal(np.concatenate(chunks), coords)
+
+    chunks = list(utils.iterate_chunks([coords[:5], coords[5:]], chunk_size=4))
+    assert [len(c) for c in chunks] == [4, 1, 4, 1]
+
+    with pytest.raises(ValueError):
+        next(utils.iterate_chunks(coords, chunk_size=0))
+
+
+def test_precompile():
+    precompilation.main(["--dtypes", "float64"])
+
+    dists, signs = utils.diagonal_segment_distance(
+        np.array([0.0, 0.0]), np.array([1.0, 1.0]), np.array([[0, 1.0]]), 1e-11, True
+    )
+    assert dists == pytest.approx([np.sqrt(0.5)])
+    assert signs == pytest.approx([1])
+
+    # the generalized ufunc itself, compiled on first access
+    gufunc = utils.diagonal_segment_distance
+    assert isinstance(gufunc, np.ufunc)
+    assert gufunc.signature == "(d),(d),(n,d),(),()->(n),(n)"
+
+
+def test_flatten_columns():
+    flat = np.arange(30, dtype=np.float64).reshape(10, 3)
+    hits = ak.Array(
+        {
+            field: ak.unflatten(flat[:, i], [3, 0, 7])
+            for i, field in enumerate(("xloc", "yloc", "zloc"))
+        }
+    )
+
+    # views of the buffers, also after a selection of the events
+    for selected, rows in (
+        (hits, slice(None)),
+        (hits[[False, True, True]], slice(3, None)),
+    ):
+        columns = utils.flatten_columns(selected)
+        for i, column in enumerate(columns):
+            assert np.array_equal(column, flat[rows, i])
+            assert np.shares_memory(column, flat)
+
+    # copies after a selection inside the lists
+    columns = utils.flatten_columns(hits[:, 1:])
+    assert np.array_equal(columns[2], flat[[1, 2, 4, 5, 6, 7, 8, 9], 2])
+    assert not np.shares_memory(columns[2], flat)
+
+    assert np.array_equal(utils.flatten_coords(hits), flat)
+    assert ak.array_equal(utils.unflatten_like(flat[:, 2], hits), hits.zloc)
+
+
+def test_parallel_kernels():
+    assert utils._PARALLEL_KERNELS
+
+    # both variants are compiled from the same function
+    for kernel, parallel in utils._PARALLEL_KERNELS.items():
+        assert parallel.py_func.__code__ is kernel.py_func.__code__
+        assert parallel.targetoptions["parallel"]
+        assert "parallel" not in kernel.targetoptions